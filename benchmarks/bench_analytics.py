@@ -0,0 +1,122 @@
+"""
+BENCHMARK - Attendance analytics over a year of logs
+Synthetic school year: every student enters in the morning and leaves in the
+afternoon of every school day (20k students x 250 days = 10M rows). Times
+the first update() over the whole log, a report, and the incremental
+update() after one more day is appended.
+
+Usage: python benchmarks/bench_analytics.py [--students 20000] [--days 250] [--backend csv sqlite]
+"""
+
+import argparse
+import datetime
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ultra_analytics import AttendanceAnalytics  # noqa: E402
+from ultra_store import ATTENDANCE_HEADER, COLUMNS, SCHEMA, CsvSink, SqliteSink  # noqa: E402
+
+CLOCKS = [f"{s // 3600:02d}:{s % 3600 // 60:02d}:{s % 60:02d}" for s in range(86400)]
+
+
+def school_days(count, start=datetime.date(2024, 9, 2)):
+    days, day = [], start
+    while len(days) < count:
+        if day.weekday() < 5:
+            days.append(day.isoformat())
+        day += datetime.timedelta(days=1)
+    return days
+
+
+def day_rows(students, date, rng):
+    """One day of rows in time order: everyone enters 07:00-09:30, leaves 14:00-17:00"""
+    count = len(students)
+    seconds = np.concatenate([rng.integers(7 * 3600, 9 * 3600 + 1800, count),
+                              rng.integers(14 * 3600, 17 * 3600, count)])
+    order = np.argsort(seconds, kind='stable')
+    kinds = ("ENTRY", "EXIT")
+    return [(students[i % count][0], students[i % count][1], date, CLOCKS[seconds[i]], kinds[i // count],
+             "0.8123", "Facenet") for i in order.tolist()]
+
+
+def write_csv(path, students, dates, rng):
+    with open(path, 'w', newline='') as f:
+        f.write(",".join(ATTENDANCE_HEADER) + "\r\n")
+        for date in dates:
+            f.write("".join(",".join(row) + "\r\n" for row in day_rows(students, date, rng)))
+
+
+def write_sqlite(path, students, dates, rng):
+    connection = sqlite3.connect(path)
+    connection.executescript(SCHEMA)
+    with connection:
+        for date in dates:
+            connection.executemany(f"INSERT INTO attendance ({COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                   day_rows(students, date, rng))
+    connection.close()
+
+
+def run(backend, students, dates, workdir):
+    rng = np.random.default_rng(0)
+    started = time.perf_counter()
+    if backend == "csv":
+        path = os.path.join(workdir, "attendance_log.csv")
+        write_csv(path, students, dates[:-1], rng)
+        store = CsvSink(path)
+    else:
+        path = os.path.join(workdir, "attendance.db")
+        write_sqlite(path, students, dates[:-1], rng)
+        store = SqliteSink(path)
+    rows = len(students) * 2 * (len(dates) - 1)
+    print(f"\n  {backend}: {rows:,} rows, {os.path.getsize(path) / 1e6:.0f} MB "
+          f"(generated in {time.perf_counter() - started:.0f} s)")
+
+    cache = os.path.join(workdir, f"analytics_{backend}")
+    analytics = AttendanceAnalytics(store, cache_path=cache)
+    analytics.update()
+    print(f"    first update      {analytics.update_seconds:>7.2f} s  "
+          f"{analytics.update_seconds / analytics.rows_read * 1e6:>6.2f} µs/row  ({analytics.rows_read:,} rows)")
+
+    started = time.perf_counter()
+    report = AttendanceAnalytics(store, cache_path=cache).student_report(dates[0], dates[-1])
+    print(f"    student report    {time.perf_counter() - started:>7.2f} s  ({len(report):,} students)")
+
+    if backend == "csv":
+        store.write(day_rows(students, dates[-1], rng))
+    else:
+        write_sqlite(path, students, dates[-1:], rng)
+    analytics = AttendanceAnalytics(store, cache_path=cache)
+    analytics.update()
+    print(f"    one more day      {analytics.update_seconds:>7.2f} s  ({analytics.rows_read:,} rows)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, default=20000)
+    parser.add_argument("--days", type=int, default=250)
+    parser.add_argument("--backend", nargs="+", choices=["csv", "sqlite"], default=["csv", "sqlite"])
+    args = parser.parse_args()
+
+    students = [(f"S{i:05d}", f"Student {i:05d}") for i in range(args.students)]
+    dates = school_days(args.days)
+    print("=" * 70)
+    print(f"ANALYTICS REPORT ({args.students:,} students, {args.days} school days)")
+    print("=" * 70)
+    for backend in args.backend:
+        workdir = tempfile.mkdtemp(prefix="bench_analytics_")
+        try:
+            run(backend, students, dates, workdir)
+        finally:
+            shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
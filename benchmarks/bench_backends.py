@@ -0,0 +1,111 @@
+"""
+BENCHMARK - Embedding backends side by side (DeepFace/TensorFlow vs ONNX Runtime)
+Every backend and thread setting runs in a fresh process on the same crops:
+cold start (import + model load), single-face latency and batched
+throughput. Backends producing the same embedding size are also compared
+crop by crop (L2 distance between their embeddings; the match threshold
+is 0.35).
+
+Crops are the registered sample_*.jpg files, or random images if there are none.
+
+Usage: python benchmarks/bench_backends.py [--backends deepface onnx] [--threads 0 1 4]
+       [--batches 1 4 16] [--crops 64]
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ultra_embedder import embed_faces, get_model, BACKENDS, MODEL_NAME, FACE_SIZE  # noqa: E402
+
+
+def load_crops(database_path, count):
+    paths = sorted(glob.glob(os.path.join(database_path, "*", "sample_*.jpg")))[:count]
+    crops = [crop for crop in (cv2.imread(path) for path in paths) if crop is not None]
+    if crops:
+        return crops, f"{len(crops)} crops from {database_path}/"
+    rng = np.random.default_rng(0)
+    crops = [rng.integers(0, 256, (FACE_SIZE[1], FACE_SIZE[0], 3), dtype=np.uint8) for _ in range(count)]
+    return crops, f"{count} random crops"
+
+
+def run_backend(backend, model_name, threads, crops, batch_sizes, repeats):
+    """One configuration in a fresh process (runs in a worker process)"""
+    start = time.perf_counter()
+    get_model(model_name, backend, intra_threads=threads, inter_threads=1 if threads else 0)
+    embeddings = embed_faces(crops, model_name, backend=backend)  # Also the warm-up
+    load_seconds = time.perf_counter() - start
+
+    single = []
+    for crop in crops[:max(1, repeats * 4)]:
+        begin = time.perf_counter()
+        embed_faces([crop], model_name, backend=backend)
+        single.append((time.perf_counter() - begin) * 1000)
+
+    throughput = {}
+    for batch_size in batch_sizes:
+        best = float('inf')
+        for _ in range(repeats):
+            begin = time.perf_counter()
+            embed_faces(crops, model_name, max_batch_size=batch_size, backend=backend)
+            best = min(best, time.perf_counter() - begin)
+        throughput[batch_size] = len(crops) / best
+    return {'load_s': load_seconds, 'p50_ms': float(np.percentile(single, 50)),
+            'p95_ms': float(np.percentile(single, 95)), 'throughput': throughput, 'embeddings': embeddings}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=list(BACKENDS))
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--threads", type=int, nargs="+", default=[0], help="intra-op threads (0 = library default)")
+    parser.add_argument("--batches", type=int, nargs="+", default=[1, 4, 16], help="max batch sizes")
+    parser.add_argument("--crops", type=int, default=64)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--database", default="face_database")
+    args = parser.parse_args()
+
+    crops, source = load_crops(args.database, args.crops)
+    print("=" * 70)
+    print(f"EMBEDDING BACKENDS ({args.model}, {source}, {os.cpu_count()} CPU cores)")
+    print("=" * 70)
+    header = "".join(f"{f'faces/s b={b}':>13}" for b in args.batches)
+    print(f"  {'backend':<9}{'threads':>8}{'load s':>8}{'p50 ms':>8}{'p95 ms':>8}{header}")
+
+    results = {}
+    for backend in args.backends:
+        for threads in args.threads:
+            with ProcessPoolExecutor(max_workers=1) as pool:  # Fresh process: cold start + thread settings
+                try:
+                    result = pool.submit(run_backend, backend, args.model, threads, crops,
+                                         args.batches, args.repeats).result()
+                except Exception as e:
+                    print(f"  {backend:<9}unavailable: {type(e).__name__}: {e}")
+                    break
+            results[backend] = result
+            rates = "".join(f"{result['throughput'][b]:>13.1f}" for b in args.batches)
+            print(f"  {backend:<9}{threads or 'auto':>8}{result['load_s']:>8.1f}{result['p50_ms']:>8.1f}"
+                  f"{result['p95_ms']:>8.1f}{rates}")
+
+    names = list(results)
+    for i, first in enumerate(names):
+        for second in names[i + 1:]:
+            a, b = results[first]['embeddings'], results[second]['embeddings']
+            if a.shape != b.shape:
+                print(f"\n  {first} vs {second}: different embedding sizes ({a.shape[1]} vs {b.shape[1]})")
+                continue
+            distances = np.linalg.norm(a - b, axis=1)
+            print(f"\n  {first} vs {second} on the same crops: L2 distance mean {distances.mean():.5f}, "
+                  f"max {distances.max():.5f}")
+
+
+if __name__ == "__main__":
+    main()
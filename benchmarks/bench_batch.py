@@ -0,0 +1,54 @@
+"""
+BENCHMARK - Batched vs one-by-one embedding throughput
+Simulates a group of N faces in one frame.
+
+Usage: python benchmarks/bench_batch.py [--groups 1 5 10] [--repeats 5]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ultra_embedder import embed_face, embed_faces, MODEL_NAME, FACE_SIZE  # noqa: E402
+
+
+def best_time(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--groups", type=int, nargs="+", default=[1, 5, 10], help="faces per frame")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    crops = [rng.integers(0, 256, (FACE_SIZE[1], FACE_SIZE[0], 3), dtype=np.uint8)
+             for _ in range(max(args.groups))]
+    embed_faces(crops[:1])  # Warm-up (model load)
+
+    print("=" * 70)
+    print(f"BATCHED EMBEDDING THROUGHPUT ({MODEL_NAME})")
+    print("=" * 70)
+    single = best_time(lambda: embed_face(crops[0]), args.repeats)
+    print(f"  Single-face latency: {single * 1000:.1f} ms\n")
+    print(f"  {'faces':>5}  {'one-by-one':>12}  {'batched':>12}  {'faces/sec':>10}  {'vs N x single':>14}")
+    for n in args.groups:
+        sequential = best_time(lambda: [embed_face(c) for c in crops[:n]], args.repeats)
+        batched = best_time(lambda: embed_faces(crops[:n]), args.repeats)
+        print(f"  {n:>5}  {sequential * 1000:>9.1f} ms  {batched * 1000:>9.1f} ms  "
+              f"{n / batched:>10.1f}  {batched / (n * single):>13.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+BENCHMARK - Gallery compression (PCA dimensions x float32/float16/int8)
+Builds each compressed gallery with the real save/load code and compares
+its match decisions with the full-precision float32 gallery:
+  same id     best match is the same person
+  same dec.   same accept/reject decision (and the same person when accepted)
+  new acc.    queries accepted only by the compressed gallery
+  imp. acc.   impostors accepted (false accepts; the baseline's count is in the first row)
+  d best      change of the best distance (mean / max)
+  d margin    change of the best/second-best margin (mean / max)
+
+Queries are held-out registration samples (one per student, the rest form
+the gallery) plus impostors: students left out of the gallery entirely.
+Uses face_database/ when it exists, otherwise synthetic low-rank embeddings.
+
+Usage: python benchmarks/bench_compression.py [--dims 0 512 256 128] [--dtypes float32 float16 int8]
+       [--synthetic 2000] [--impostors 0.2]
+"""
+
+import argparse
+import glob
+import os
+import pickle
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ultra_gallery import save_gallery, load_gallery  # noqa: E402
+from ultra_matcher import GalleryMatcher, is_confident_match  # noqa: E402
+from ultra_recognition import SIMILARITY_THRESHOLD, CONFIDENCE_MARGIN  # noqa: E402
+
+SAMPLES_PER_PERSON = 10
+
+
+def database_samples(database_path):
+    """Sample embeddings per person from face_database/*/embeddings.pkl"""
+    people = []
+    for embedding_file in sorted(glob.glob(os.path.join(database_path, "*", "embeddings.pkl"))):
+        with open(embedding_file, 'rb') as f:
+            data = pickle.load(f)
+        embeddings = data.get('embeddings', [])
+        samples = np.asarray(embeddings, dtype=np.float32).reshape(len(embeddings), -1)
+        if len(samples) >= 2:
+            people.append(samples)
+    return people
+
+
+def synthetic_samples(persons, dim, rank, rng):
+    """
+    Unit-length embeddings: identities share a common face direction and
+    differ within a rank-limited subspace; each person's samples scatter by
+    a different amount, so some land near the threshold.
+    """
+    basis = rng.normal(size=(rank, dim)).astype(np.float32) / np.sqrt(rank)
+    shared = rng.normal(size=dim).astype(np.float32) * 3.0
+    people = []
+    for _ in range(persons):
+        centre = shared + rng.normal(size=rank).astype(np.float32) @ basis
+        centre /= np.linalg.norm(centre)
+        spread = rng.uniform(0.2, 0.4) / np.sqrt(dim)
+        samples = centre + rng.normal(scale=spread, size=(SAMPLES_PER_PERSON, dim)).astype(np.float32)
+        people.append(samples / np.linalg.norm(samples, axis=1, keepdims=True))
+    return people
+
+
+def split(people, impostor_share, rng):
+    """Gallery rows (mean of all but one sample), genuine and impostor queries"""
+    order = rng.permutation(len(people))
+    impostors = set(order[:int(len(people) * impostor_share)].tolist())
+    ids, rows, queries, truth = [], [], [], []
+    for person, samples in enumerate(people):
+        if person in impostors:
+            queries.append(samples[0])
+            truth.append(None)
+        else:
+            ids.append(str(person))
+            rows.append(samples[1:].mean(axis=0))
+            queries.append(samples[0])
+            truth.append(str(person))
+    return ids, np.stack(rows), np.stack(queries), truth
+
+
+def evaluate(matcher, queries, threshold, margin):
+    start = time.perf_counter()
+    results = matcher.match(queries)
+    ms = (time.perf_counter() - start) / len(queries) * 1000
+    best_ids = np.array([best_id for best_id, _, _ in results], dtype=object)
+    best = np.array([best_distance for _, best_distance, _ in results])
+    second = np.array([second_distance for _, _, second_distance in results])
+    accepted = np.array([is_confident_match(b, s, threshold, margin) for b, s in zip(best, second)])
+    return {'ids': best_ids, 'best': best, 'margin': second - best, 'accepted': accepted, 'ms': ms}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database", default="face_database")
+    parser.add_argument("--synthetic", type=int, default=0, help="use N synthetic persons instead of the database")
+    parser.add_argument("--dim", type=int, default=4096, help="synthetic embedding size (VGG-Face: 4096)")
+    parser.add_argument("--rank", type=int, default=256, help="synthetic identity subspace")
+    parser.add_argument("--dims", type=int, nargs="+", default=[0, 512, 256, 128], help="0 = no PCA")
+    parser.add_argument("--dtypes", nargs="+", default=["float32", "float16", "int8"],
+                        choices=["float32", "float16", "int8"])
+    parser.add_argument("--impostors", type=float, default=0.2, help="share of persons left out of the gallery")
+    parser.add_argument("--threshold", type=float, default=SIMILARITY_THRESHOLD)
+    parser.add_argument("--margin", type=float, default=CONFIDENCE_MARGIN)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    people = [] if args.synthetic else database_samples(args.database)
+    if people:
+        source = f"{args.database}/"
+    else:
+        people = synthetic_samples(args.synthetic or 2000, args.dim, args.rank, rng)
+        source = f"synthetic, rank {args.rank}"
+    ids, rows, queries, truth = split(people, args.impostors, rng)
+    names = {person_id: person_id for person_id in ids}
+    genuine = np.array([person_id is not None for person_id in truth])
+
+    print("=" * 110)
+    print(f"GALLERY COMPRESSION ({len(ids)} persons, {rows.shape[1]}-d, {len(queries)} queries "
+          f"incl. {int((~genuine).sum())} impostors; {source}; threshold {args.threshold}, margin {args.margin})")
+    print("=" * 110)
+    print(f"  {'dims':>5}  {'dtype':<7}  {'var kept':>8}  {'B/row':>6}  {'ms/q':>6}  {'same id':>7}  "
+          f"{'same dec.':>9}  {'new acc.':>8}  {'imp. acc.':>9}  {'d best mean/max':>16}  {'d margin mean/max':>18}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "gallery_baseline")
+        save_gallery(ids, list(names.values()), rows, "benchmark", path=path, dtype="float32", pca_dim=None)
+        baseline = evaluate(GalleryMatcher.from_gallery(load_gallery(path)), queries, args.threshold, args.margin)
+
+        for dims in args.dims:
+            for dtype in args.dtypes:
+                path = os.path.join(tmp, f"gallery_{dims}_{dtype}")
+                header = save_gallery(ids, list(names.values()), rows, "benchmark", path=path, dtype=dtype,
+                                      pca_dim=dims or None)
+                gallery = load_gallery(path)
+                matcher = GalleryMatcher.from_gallery(gallery)
+                result = evaluate(matcher, queries, args.threshold, args.margin)
+                same_id = np.mean(result['ids'] == baseline['ids'])
+                same_decision = (result['accepted'] == baseline['accepted']) & \
+                    (~result['accepted'] | (result['ids'] == baseline['ids']))
+                new_accepts = int(np.sum(result['accepted'] & ~baseline['accepted']))
+                impostor_accepts = int(np.sum(result['accepted'] & ~genuine))
+                d_best = np.abs(result['best'] - baseline['best'])
+                d_margin = np.abs(result['margin'] - baseline['margin'])
+                kept = header['projection']['explained_variance'] if header['projection'] else 1.0
+                row_bytes = gallery.embeddings.nbytes / max(len(gallery.embeddings), 1)
+                label = dims or rows.shape[1]
+                print(f"  {label:>5}  {dtype:<7}  {kept:>8.4f}  {row_bytes:>6.0f}  {result['ms']:>6.3f}  "
+                      f"{same_id:>7.3f}  {np.mean(same_decision):>9.3f}  {new_accepts:>8}  {impostor_accepts:>9}  "
+                      f"{d_best.mean():>7.4f}/{d_best.max():<8.4f}  {d_margin.mean():>8.4f}/{d_margin.max():<9.4f}")
+                del gallery, matcher
+
+    accepted = baseline['accepted']
+    print(f"\nFull precision: {np.mean(accepted[genuine] & (baseline['ids'][genuine] == np.array(truth)[genuine])):.3f}"
+          f" of genuine queries accepted correctly, {np.mean(accepted[~genuine]) if (~genuine).any() else 0:.3f}"
+          f" of impostors accepted")
+    print("PCA drops the part of each embedding outside the kept subspace, so distances shrink; pick the")
+    print("smallest gallery whose 'same dec.' is ~1.000 with no new accepts, then set GALLERY_PCA_DIM /")
+    print("GALLERY_DTYPE in ultra_gallery.py and run: python ultra_train.py")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+BENCHMARK - Face detection latency and recall per backend and detection width
+Runs every detector backend over recorded frames (videos are sampled
+evenly, image folders read as-is) at several detection widths.
+
+Recall and precision (IoU >= 0.5) are measured against hand labels if
+given (CSV: frame,x,y,w,h with frame = image file name or video.mp4#index),
+otherwise against the reference backend at full resolution. With --roi,
+only faces whose centre lies inside the region count.
+
+Usage: python benchmarks/bench_detectors.py recordings/ [--backends haar dnn] [--widths 0 960 640 480]
+       [--roi 0.25 0 0.5 1] [--labels labels.csv] [--frames 200]
+"""
+
+import argparse
+import csv
+import os
+import sys
+import time
+from collections import defaultdict
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ultra_detector import create_detector, BACKENDS, MIN_FACE_SIZE  # noqa: E402
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.m4v', '.webm')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+def load_frames(sources, limit):
+    """[(frame name, BGR frame)]: images as-is, videos sampled evenly"""
+    paths = []
+    for source in sources:
+        if os.path.isdir(source):
+            paths.extend(sorted(os.path.join(root, name) for root, _, names in os.walk(source) for name in names))
+        else:
+            paths.append(source)
+    videos = [path for path in paths if path.lower().endswith(VIDEO_EXTENSIONS)]
+    images = [path for path in paths if path.lower().endswith(IMAGE_EXTENSIONS)]
+
+    frames = []
+    for path in images[:limit]:
+        frame = cv2.imread(path)
+        if frame is not None:
+            frames.append((os.path.basename(path), frame))
+    per_video = max(1, (limit - len(frames)) // max(1, len(videos)))
+    for path in videos:
+        cam = cv2.VideoCapture(path)
+        count = int(cam.get(cv2.CAP_PROP_FRAME_COUNT))
+        for index in np.linspace(0, max(0, count - 1), min(per_video, max(count, 1))).astype(int):
+            cam.set(cv2.CAP_PROP_POS_FRAMES, int(index))
+            ok, frame = cam.read()
+            if ok:
+                frames.append((f"{os.path.basename(path)}#{index}", frame))
+        cam.release()
+    return frames[:limit]
+
+
+def load_labels(path):
+    labels = defaultdict(list)
+    with open(path, newline='') as f:
+        for row in csv.reader(f):
+            if len(row) >= 5 and row[0] != 'frame':
+                labels[row[0]].append(tuple(int(float(v)) for v in row[1:5]))
+    return labels
+
+
+def iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    w = min(ax + aw, bx + bw) - max(ax, bx)
+    h = min(ay + ah, by + bh) - max(ay, by)
+    if w <= 0 or h <= 0:
+        return 0.0
+    inter = w * h
+    return inter / (aw * ah + bw * bh - inter)
+
+
+def count_matches(truth, found, threshold):
+    """Greedy one-to-one matching of detections to true faces"""
+    matched, used = 0, set()
+    for true_box in truth:
+        scores = [(iou(true_box, box), i) for i, box in enumerate(found) if i not in used]
+        best = max(scores, default=(0.0, None))
+        if best[0] >= threshold:
+            matched += 1
+            used.add(best[1])
+    return matched
+
+
+def in_roi(box, frame, roi):
+    if roi is None:
+        return True
+    height, width = frame.shape[:2]
+    cx, cy = (box[0] + box[2] / 2) / width, (box[1] + box[3] / 2) / height
+    return roi[0] <= cx <= roi[0] + roi[2] and roi[1] <= cy <= roi[1] + roi[3]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("sources", nargs="+", help="video files and/or image folders")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=list(BACKENDS))
+    parser.add_argument("--widths", type=int, nargs="+", default=[0, 960, 640, 480], help="0 = full resolution")
+    parser.add_argument("--roi", type=float, nargs=4, metavar=("X", "Y", "W", "H"), help="fractions of the frame")
+    parser.add_argument("--labels", help="CSV frame,x,y,w,h (default: reference backend at full resolution)")
+    parser.add_argument("--reference", default="haar", choices=list(BACKENDS))
+    parser.add_argument("--min-face", type=int, default=MIN_FACE_SIZE)
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--iou", type=float, default=0.5)
+    args = parser.parse_args()
+
+    frames = load_frames(args.sources, args.frames)
+    if not frames:
+        print("✗ No frames found.")
+        return
+    roi = tuple(args.roi) if args.roi else None
+
+    if args.labels:
+        labels = load_labels(args.labels)
+        truth_name = os.path.basename(args.labels)
+    else:
+        reference = create_detector(args.reference, detect_width=0, roi=None, min_face_size=args.min_face)
+        labels = {name: reference(frame) for name, frame in frames}
+        truth_name = f"{args.reference} at full resolution"
+    truth = {name: [box for box in labels.get(name, []) if in_roi(box, frame, roi)] for name, frame in frames}
+    true_faces = sum(len(boxes) for boxes in truth.values())
+
+    height, width = frames[0][1].shape[:2]
+    print("=" * 70)
+    print(f"DETECTOR REPORT ({len(frames)} frames, first {width}x{height}, {true_faces} faces "
+          f"per {truth_name}{', ROI ' + str(roi) if roi else ''})")
+    print("=" * 70)
+    print(f"  {'backend':<8}  {'width':>6}  {'ms mean':>8}  {'ms p95':>8}  {'recall':>7}  {'precision':>9}")
+
+    for backend in args.backends:
+        for detect_width in args.widths:
+            try:
+                detector = create_detector(backend, detect_width=detect_width, roi=roi, min_face_size=args.min_face)
+            except (FileNotFoundError, ValueError, cv2.error, AttributeError) as e:
+                print(f"  {backend:<8}  unavailable: {e}")
+                break
+            detector(frames[0][1])  # Warm-up
+
+            timings, found_total, matched = [], 0, 0
+            for name, frame in frames:
+                start = time.perf_counter()
+                boxes = detector(frame)
+                timings.append((time.perf_counter() - start) * 1000)
+                found_total += len(boxes)
+                matched += count_matches(truth[name], boxes, args.iou)
+
+            recall = matched / true_faces if true_faces else float('nan')
+            precision = matched / found_total if found_total else float('nan')
+            label = "full" if not detect_width else str(detect_width)
+            print(f"  {backend:<8}  {label:>6}  {np.mean(timings):>8.2f}  {np.percentile(timings, 95):>8.2f}  "
+                  f"{recall:>7.3f}  {precision:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+BENCHMARK - Per-face embedding latency
+Old path: temp JPEG + DeepFace re-detection
+New path: in-memory crop, detection/alignment skipped
+
+Also compares the embeddings of both paths (norm and cosine distance), so a
+preprocessing change that rescales the model input shows up here.
+
+Usage: python benchmarks/bench_embed_path.py [--faces 20]
+"""
+
+import argparse
+import glob
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ultra_embedder import embed_face, MODEL_NAME, FACE_SIZE  # noqa: E402
+
+
+def load_crops(count):
+    """Registered sample crops if available, otherwise synthetic noise crops"""
+    files = sorted(glob.glob(os.path.join("face_database", "*", "sample_*.jpg")))[:count]
+    crops = [cv2.imread(f) for f in files]
+    crops = [c for c in crops if c is not None]
+    rng = np.random.default_rng(0)
+    while len(crops) < count:
+        crops.append(rng.integers(0, 256, (FACE_SIZE[1], FACE_SIZE[0], 3), dtype=np.uint8))
+    return crops
+
+
+def old_path(face_img):
+    """The previous implementation: temp JPEG, re-read, re-detected"""
+    from deepface import DeepFace
+
+    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.jpg')
+    temp_file.close()
+    cv2.imwrite(temp_file.name, face_img)
+    try:
+        return DeepFace.represent(img_path=temp_file.name, model_name=MODEL_NAME,
+                                  enforce_detection=False)[0]["embedding"]
+    finally:
+        os.unlink(temp_file.name)
+
+
+def time_path(name, fn, crops):
+    fn(crops[0])  # Warm-up (model load)
+    timings, embeddings = [], []
+    for crop in crops:
+        start = time.perf_counter()
+        embeddings.append(np.asarray(fn(crop), dtype=np.float32))
+        timings.append((time.perf_counter() - start) * 1000)
+    timings = np.array(timings)
+    print(f"  {name:<28} mean {timings.mean():8.1f} ms   "
+          f"p50 {np.percentile(timings, 50):8.1f} ms   p95 {np.percentile(timings, 95):8.1f} ms")
+    return timings.mean(), np.stack(embeddings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--faces", type=int, default=20, help="number of crops to embed")
+    args = parser.parse_args()
+
+    crops = load_crops(args.faces)
+    print("=" * 70)
+    print(f"EMBEDDING LATENCY PER FACE ({MODEL_NAME}, {len(crops)} crops)")
+    print("=" * 70)
+    before, old = time_path("temp JPEG + re-detection", old_path, crops)
+    after, new = time_path("in-memory, detection skipped", embed_face, crops)
+    print(f"\n  Speed-up: {before / after:.2f}x")
+
+    old_norm, new_norm = np.linalg.norm(old, axis=1), np.linalg.norm(new, axis=1)
+    cosine = 1 - np.sum(old * new, axis=1) / np.maximum(old_norm * new_norm, 1e-12)
+    print(f"  Embedding norm: old {old_norm.mean():.4f}, new {new_norm.mean():.4f} "
+          f"(a large ratio means the input scaling differs)")
+    print(f"  Cosine distance old vs new: mean {cosine.mean():.4f}, max {cosine.max():.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+BENCHMARK - Approximate (IVF) vs exact gallery search
+Synthetic identities, queries = enrolled embedding + noise.
+Reports latency per query and recall against the exact scan.
+
+Usage: python benchmarks/bench_index.py [--sizes 1000 10000 100000] [--dim 4096] [--probes 4 8 16]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ultra_index import ExactIndex, IVFIndex  # noqa: E402
+
+
+def synthetic_gallery(count, dim, rng, num_groups=64):
+    """Identities scattered around a few population clusters (faces are not uniform)"""
+    groups = rng.normal(size=(num_groups, dim)).astype(np.float32)
+    members = rng.integers(0, num_groups, count)
+    gallery = groups[members] + rng.normal(scale=0.6, size=(count, dim)).astype(np.float32)
+    return np.ascontiguousarray(gallery)
+
+
+def run_queries(index, queries, k=2):
+    start = time.perf_counter()
+    rows, distances = index.search(queries, k)
+    return rows, distances, (time.perf_counter() - start) / len(queries) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--dim", type=int, default=4096)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--probes", type=int, nargs="+", default=[4, 8, 16])
+    parser.add_argument("--noise", type=float, default=0.3, help="query noise relative to identity spread")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print("=" * 70)
+    print(f"SEARCH INDEX REPORT (dim={args.dim}, {args.queries} queries per size)")
+    print("=" * 70)
+    print(f"  {'size':>7}  {'mode':<12}  {'ms/query':>9}  {'recall@1':>9}  {'2nd exact':>9}  {'build s':>8}")
+
+    for size in args.sizes:
+        gallery = synthetic_gallery(size, args.dim, rng)
+        targets = rng.integers(0, size, args.queries)
+        queries = gallery[targets] + rng.normal(scale=args.noise, size=(args.queries, args.dim)).astype(np.float32)
+
+        exact = ExactIndex(gallery)
+        exact_rows, exact_dist, exact_ms = run_queries(exact, queries)
+        print(f"  {size:>7}  {'exact':<12}  {exact_ms:>9.2f}  {1.0:>9.3f}  {1.0:>9.3f}  {0.0:>8.2f}")
+
+        start = time.perf_counter()
+        ivf = IVFIndex.train(gallery)
+        build_seconds = time.perf_counter() - start
+        for probes in args.probes:
+            ivf.n_probe = min(probes, len(ivf.centroids))
+            rows, distances, ms = run_queries(ivf, queries)
+            recall = np.mean(rows[:, 0] == exact_rows[:, 0])
+            # Second-best must match too, or the confidence margin would be overestimated
+            second_ok = np.mean(np.isclose(distances[:, 1], exact_dist[:, 1], rtol=1e-5))
+            print(f"  {size:>7}  {f'ivf/{probes}':<12}  {ms:>9.2f}  {recall:>9.3f}  {second_ok:>9.3f}  {build_seconds:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+"""
+BENCHMARK - Offline attendance pipeline (no webcam, no model download)
+Feeds frames in real time (--fps, like a camera) to the real
+RecognitionPipeline - detection/tracking thread, scheduler, batched
+embedding service - and logs its results through the service's
+handle_face (confidence check, cooldown, attendance store in a temporary
+folder).
+
+Frames are synthetic (people walking past the door as coloured face
+patches) or read from recorded videos. The model is replaced by a
+deterministic stub embedder: a synthetic face maps to its identity's
+gallery embedding plus fixed noise, anything else to a random projection
+of the crop. Galleries are synthetic (100 to 100k identities) and use the
+configured search index. Each gallery size runs in its own process so
+peak RSS is per run.
+
+Reports per-stage latency percentiles (detect/embed/match calls made by the
+pipeline, log = handle_face, result = job queued -> matched), detection
+passes, CPU time per frame and peak RSS, and writes everything as JSON for
+comparing runs across changes.
+
+Usage: python benchmarks/bench_pipeline.py [--sizes 100 1000 10000] [--frames 600]
+       [--video recordings/gate.mp4] [--embed-ms 0] [--output bench_pipeline.json]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ultra_cooldown import CooldownTracker  # noqa: E402
+from ultra_detector import FaceDetector, create_detector, DETECT_WIDTH, DETECT_ROI  # noqa: E402
+from ultra_index import build_index  # noqa: E402
+from ultra_matcher import GalleryMatcher  # noqa: E402
+from ultra_pipeline import RecognitionPipeline  # noqa: E402
+from ultra_recognition import is_confident, COOLDOWN_MINUTES  # noqa: E402
+from ultra_scheduler import AdaptiveScheduler  # noqa: E402
+from ultra_service import handle_face  # noqa: E402
+from ultra_store import CsvSink, SqliteSink  # noqa: E402
+
+STAGES = ("detect", "embed", "match", "log", "result")
+DRAIN_SECONDS = 2.0     # After the last frame: wait this long at most for queued faces
+FACE_PIXELS = 160       # Synthetic face patch size in the frame
+QUERY_NOISE = 0.15      # Distance of a stub embedding from its gallery entry (threshold is 0.35)
+
+
+def synthetic_gallery(count, dim, seed=0, chunk=8192):
+    """Unit-length identities, generated in chunks (100k x 4096 fits as float32 only)"""
+    rng = np.random.default_rng(seed)
+    gallery = np.empty((count, dim), dtype=np.float32)
+    for start in range(0, count, chunk):
+        block = rng.standard_normal((min(chunk, count - start), dim), dtype=np.float32)
+        block /= np.linalg.norm(block, axis=1, keepdims=True)
+        gallery[start:start + len(block)] = block
+    return gallery
+
+
+def identity_color(identity):
+    """Identity number (1-based) encoded in a BGR colour; 0 = background"""
+    return (identity & 255, (identity >> 8) & 255, (identity >> 16) & 255)
+
+
+def color_identity(pixel):
+    b, g, r = (int(v) for v in pixel)
+    return b | (g << 8) | (r << 16)
+
+
+class StubEmbedder:
+    """Deterministic stand-in for the model: embed_faces(crops) -> (N, dim) float32"""
+
+    kind = "stub"
+
+    def __init__(self, gallery, embed_ms=0.0, seed=1):
+        self.gallery = gallery
+        self.dim = gallery.shape[1]
+        self.embed_ms = embed_ms
+        self.projection = np.random.default_rng(seed).standard_normal((16 * 16, self.dim)).astype(np.float32)
+        self.projection /= np.linalg.norm(self.projection, axis=0, keepdims=True)
+
+    def embed_faces(self, face_imgs):
+        embeddings = np.empty((len(face_imgs), self.dim), dtype=np.float32)
+        for i, face_img in enumerate(face_imgs):
+            identity = color_identity(face_img[face_img.shape[0] // 2, face_img.shape[1] // 2])
+            if 1 <= identity <= len(self.gallery):
+                noise = np.random.default_rng(identity).standard_normal(self.dim).astype(np.float32)
+                embeddings[i] = self.gallery[identity - 1] + noise * (QUERY_NOISE / np.sqrt(self.dim))
+            else:
+                small = cv2.resize(cv2.cvtColor(face_img, cv2.COLOR_BGR2GRAY), (16, 16)).astype(np.float32)
+                vector = (small.ravel() - small.mean()) @ self.projection
+                embeddings[i] = vector / max(float(np.linalg.norm(vector)), 1e-6)
+        if self.embed_ms:
+            time.sleep(self.embed_ms * len(face_imgs) / 1000.0)  # Simulated model cost
+        return embeddings
+
+
+class PatchBackend:
+    """Detector backend for synthetic frames: every non-black patch is a face"""
+
+    kind = "synthetic"
+
+    def detect(self, image, min_size):
+        mask = (image.max(axis=2) > 0).astype(np.uint8)
+        count, _, stats, _ = cv2.connectedComponentsWithStats(mask)
+        return [tuple(int(v) for v in stats[i][:4]) for i in range(1, count)
+                if stats[i][2] >= min_size and stats[i][3] >= min_size]
+
+
+def synthetic_frames(frames, gallery_size, width, height, crowd, dwell, unknown, seed=2):
+    """People cross the frame left to right, `crowd` at a time, each visible for `dwell` frames"""
+    rng = np.random.default_rng(seed)
+    walkers = []  # [identity, first frame, lane]
+    lanes = max(1, height // (FACE_PIXELS + 20))
+    for frame_index in range(frames):
+        walkers = [walker for walker in walkers if frame_index - walker[1] < dwell]
+        while len(walkers) < crowd:
+            # Unknown visitors get identities past the end of the gallery
+            identity = int(rng.integers(1, gallery_size + 1)) if rng.random() >= unknown else \
+                gallery_size + 1 + int(rng.integers(0, 1000))
+            used = {walker[2] for walker in walkers}
+            lane = next((lane for lane in range(lanes) if lane not in used), len(walkers) % lanes)
+            walkers.append([identity, frame_index, lane])
+
+        frame = np.zeros((height, width, 3), dtype=np.uint8)
+        for identity, first, lane in walkers:
+            x = int((frame_index - first) / dwell * (width - FACE_PIXELS))
+            y = 10 + lane * (FACE_PIXELS + 20)
+            frame[y:y + FACE_PIXELS, x:x + FACE_PIXELS] = identity_color(identity)
+        yield frame
+
+
+def video_frames(paths, limit):
+    count = 0
+    for path in paths:
+        cam = cv2.VideoCapture(path)
+        while count < limit:
+            ok, frame = cam.read()
+            if not ok:
+                break
+            count += 1
+            yield frame
+        cam.release()
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None  # Windows
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+
+def percentiles(samples):
+    if not samples:
+        return {'count': 0}
+    values = np.asarray(samples) * 1000
+    return {'count': len(values), 'mean_ms': round(float(values.mean()), 3),
+            **{f'p{p}_ms': round(float(np.percentile(values, p)), 3) for p in (50, 90, 99)},
+            'max_ms': round(float(values.max()), 3)}
+
+
+def timed(function, samples):
+    """Wrap a pipeline callback so each call's duration is appended to samples"""
+    def wrapper(*args):
+        start = time.perf_counter()
+        try:
+            return function(*args)
+        finally:
+            samples.append(time.perf_counter() - start)
+    return wrapper
+
+
+def run_benchmark(config):
+    """One gallery size through the real pipeline, in the current process"""
+    size = config['gallery_size']
+    gallery = synthetic_gallery(size, config['dim'])
+    started = time.perf_counter()
+    index = build_index(gallery)
+    index_seconds = time.perf_counter() - started
+    ids = [f"{i + 1:06d}" for i in range(size)]
+    matcher = GalleryMatcher(ids, {person_id: f"Student {person_id}" for person_id in ids}, gallery, index=index)
+    embedder = StubEmbedder(gallery, config['embed_ms'])
+
+    if config['video']:
+        detect = create_detector()
+        frames = video_frames(config['video'], config['frames'])
+    else:
+        detect = FaceDetector(PatchBackend(), DETECT_WIDTH, DETECT_ROI, min_face_size=FACE_PIXELS // 2)
+        frames = synthetic_frames(config['frames'], size, config['width'], config['height'],
+                                  config['crowd'], config['dwell'], config['unknown'])
+
+    timings = {stage: [] for stage in STAGES}
+    faces_seen = []
+
+    def detect_fn(frame):
+        boxes = detect(frame)
+        faces_seen.append(len(boxes))
+        return boxes
+
+    pipeline = RecognitionPipeline(timed(detect_fn, timings['detect']),
+                                   embed_fn=timed(embedder.embed_faces, timings['embed']),
+                                   match_fn=timed(matcher.match, timings['match']),
+                                   confirm_fn=is_confident, scheduler=AdaptiveScheduler(name="bench"))
+    camera = SimpleNamespace(name="bench", mode="ENTRY", cooldown_minutes=COOLDOWN_MINUTES, logged=0)
+    base_time = datetime(2025, 1, 6, 8, 0, 0)
+    counts = {'frames': 0, 'confident': 0}
+
+    with tempfile.TemporaryDirectory() as folder, contextlib.redirect_stdout(io.StringIO()):
+        # (scheduler decision lines stay out of the report)
+        store = (SqliteSink(os.path.join(folder, "attendance.db")) if config['store'] == "sqlite"
+                 else CsvSink(os.path.join(folder, "attendance_log.csv")))
+        cooldowns = {"ENTRY": CooldownTracker("ENTRY", COOLDOWN_MINUTES, path=os.path.join(folder, "cooldown.log"))}
+
+        def drain():
+            for result in pipeline.poll_results():
+                timings['result'].append(result.latency)
+                # Recording time of the frame, so cooldowns are repeatable
+                now = base_time + timedelta(seconds=result.frame_id / config['fps'])
+                for _, match in result.faces:
+                    counts['confident'] += is_confident(match)
+                    start = time.perf_counter()
+                    handle_face(camera, match, cooldowns, store, matcher.names, now=now)
+                    timings['log'].append(time.perf_counter() - start)
+
+        pipeline.start()
+        run_started, cpu_started = time.perf_counter(), time.process_time()
+        next_frame = time.monotonic()
+        for frame_id, frame in enumerate(frames, 1):
+            pipeline.submit(frame_id, frame)
+            counts['frames'] += 1
+            drain()
+            next_frame += 1.0 / config['fps']
+            time.sleep(max(0.0, next_frame - time.monotonic()))
+
+        deadline = time.monotonic() + DRAIN_SECONDS
+        while len(pipeline.embed_queue) and time.monotonic() < deadline:
+            drain()
+            time.sleep(0.01)
+        pipeline.stop()  # Joins the embedding thread, so its last batch is finished
+        drain()
+        wall_seconds = time.perf_counter() - run_started
+        cpu_seconds = time.process_time() - cpu_started
+
+        start = time.perf_counter()
+        store.close()  # Pending SQLite batches are committed here
+        cooldowns["ENTRY"].close()
+        close_seconds = time.perf_counter() - start
+
+    stats = pipeline.stats()
+    return {
+        'gallery_size': size,
+        'index': index.kind,
+        'index_build_s': round(index_seconds, 3),
+        **counts,
+        'detect_passes': len(faces_seen),
+        'faces': sum(faces_seen),
+        'embedded': stats['faces_embedded'],
+        'logged': camera.logged,
+        'frames_dropped': stats['frames_dropped'],
+        'jobs_dropped': stats['embed_dropped'],
+        'fps_wall': round(counts['frames'] / max(wall_seconds, 1e-9), 1),
+        'cpu_per_frame_ms': round(cpu_seconds / max(counts['frames'], 1) * 1000, 3),
+        'stages': {stage: percentiles(values) for stage, values in timings.items()},
+        'store_close_ms': round(close_seconds * 1000, 3),
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {'commit': commit, 'python': platform.python_version(), 'numpy': np.__version__,
+            'opencv': cv2.__version__, 'platform': platform.platform(), 'cpus': os.cpu_count(),
+            'time': datetime.now().isoformat(timespec='seconds')}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000],
+                        help="gallery sizes (identities), up to 100000")
+    parser.add_argument("--dim", type=int, default=4096, help="embedding size (VGG-Face: 4096)")
+    parser.add_argument("--frames", type=int, default=600)
+    parser.add_argument("--fps", type=float, default=30.0, help="frames fed per second (real time, like a camera)")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--crowd", type=int, default=3, help="people in view at once (synthetic)")
+    parser.add_argument("--dwell", type=int, default=45, help="frames each person stays in view (synthetic)")
+    parser.add_argument("--unknown", type=float, default=0.1, help="fraction of unregistered visitors (synthetic)")
+    parser.add_argument("--video", nargs="+", help="recorded videos instead of synthetic frames")
+    parser.add_argument("--embed-ms", type=float, default=0.0, help="simulated model time per face")
+    parser.add_argument("--store", choices=["sqlite", "csv"], default="sqlite")
+    parser.add_argument("--output", default="bench_pipeline.json")
+    args = parser.parse_args()
+
+    base = {key: getattr(args, key) for key in ('dim', 'frames', 'fps', 'width', 'height', 'crowd', 'dwell',
+                                                 'unknown', 'video', 'embed_ms', 'store')}
+    print("=" * 70)
+    print(f"PIPELINE REPORT ({'video' if args.video else 'synthetic'} frames, dim={args.dim}, "
+          f"stub embedder{f' +{args.embed_ms} ms/face' if args.embed_ms else ''})")
+    print("=" * 70)
+
+    runs = []
+    for size in args.sizes:
+        # Fresh process per size: peak RSS belongs to that gallery only
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            run = pool.submit(run_benchmark, dict(base, gallery_size=size)).result()
+        runs.append(run)
+
+        print(f"\n  Gallery {size} ({run['index']}, built in {run['index_build_s']} s) - "
+              f"{run['frames']} frames, {run['detect_passes']} detection passes, {run['faces']} faces, "
+              f"{run['embedded']} embedded, {run['logged']} logged")
+        print(f"  {run['fps_wall']} frames/s fed | {run['cpu_per_frame_ms']} ms CPU/frame | "
+              f"dropped {run['frames_dropped']} frames, {run['jobs_dropped']} jobs | "
+              f"peak RSS {run['peak_rss_mb']} MB")
+        print(f"    {'stage':<8}{'calls':>7}{'mean':>9}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}  (ms)")
+        for stage, stats in run['stages'].items():
+            if stats['count']:
+                print(f"    {stage:<8}{stats['count']:>7}{stats['mean_ms']:>9.3f}{stats['p50_ms']:>9.3f}"
+                      f"{stats['p90_ms']:>9.3f}{stats['p99_ms']:>9.3f}{stats['max_ms']:>9.3f}")
+
+    with open(args.output, 'w') as f:
+        json.dump({'environment': environment(), 'config': base, 'runs': runs}, f, indent=2)
+    print(f"\n✓ Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
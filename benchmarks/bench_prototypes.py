@@ -0,0 +1,88 @@
+"""
+BENCHMARK - Multi-prototype matching (k = 1 mean, 3 k-means, 10 all samples)
+Synthetic identities registered with 10 posed samples (like ultra_register.py).
+Every sample has its own random pose; queries are held-out samples of each
+person that no gallery row was built from.
+
+Usage: python benchmarks/bench_prototypes.py [--persons 2000] [--dim 4096] [--ks 1 3 10] [--held-out 2]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ultra_matcher import GalleryMatcher  # noqa: E402
+from ultra_train import make_prototypes  # noqa: E402
+
+SAMPLES_PER_PERSON = 10
+
+
+def synthetic_samples(persons, dim, rng, held_out, pose_dims=4, pose_scale=0.8, noise=0.2):
+    """
+    Identity centre + a random mix of shared pose directions (yaw, pitch...)
+    + noise, per sample. Returns (registered, held-out) samples per person.
+    """
+    count = SAMPLES_PER_PERSON + held_out
+    centres = rng.normal(size=(persons, dim)).astype(np.float32)
+    # Scaled so one sample's pose offset is as large as a single pose direction
+    directions = rng.normal(scale=pose_scale / np.sqrt(pose_dims), size=(pose_dims, dim)).astype(np.float32)
+    poses = rng.normal(size=(persons, count, pose_dims)).astype(np.float32)
+    samples = centres[:, None, :] + poses @ directions + \
+        rng.normal(scale=noise, size=(persons, count, dim)).astype(np.float32)
+    return samples[:, :SAMPLES_PER_PERSON], samples[:, SAMPLES_PER_PERSON:]
+
+
+def build_matcher(registered, k):
+    prototypes = "mean" if k == 1 else ("all" if k >= registered.shape[1] else k)
+    rows, owners = [], []
+    for person, samples in enumerate(registered):
+        person_rows = make_prototypes(samples, samples.mean(axis=0), prototypes)
+        rows.append(person_rows)
+        owners.extend([person] * len(person_rows))
+    ids = [str(person) for person in range(len(registered))]
+    names = {person_id: person_id for person_id in ids}
+    return GalleryMatcher(ids, names, np.ascontiguousarray(np.vstack(rows)), owners=np.array(owners))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--persons", type=int, default=2000)
+    parser.add_argument("--dim", type=int, default=4096)
+    parser.add_argument("--ks", type=int, nargs="+", default=[1, 3, 10])
+    parser.add_argument("--queries", type=int, default=200, help="persons queried")
+    parser.add_argument("--held-out", type=int, default=2, help="query samples per person, never registered")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    registered, held_out = synthetic_samples(args.persons, args.dim, rng, args.held_out)
+    people = rng.choice(args.persons, min(args.queries, args.persons), replace=False)
+    targets = np.repeat(people, args.held_out)
+    queries = held_out[people].reshape(-1, args.dim)
+
+    print("=" * 70)
+    print(f"MULTI-PROTOTYPE MATCHING ({args.persons} persons, dim={args.dim}, "
+          f"{len(queries)} held-out queries)")
+    print("=" * 70)
+    print(f"  {'k':>3}  {'rows':>7}  {'memory MB':>9}  {'ms/face':>8}  {'top-1':>6}  "
+          f"{'genuine d':>9}  {'margin':>7}  {'margin/d':>8}")
+
+    for k in args.ks:
+        matcher = build_matcher(registered, k)
+        start = time.perf_counter()
+        results = [matcher.match(query)[0] for query in queries]  # One face at a time, like the live loop
+        ms = (time.perf_counter() - start) / len(targets) * 1000
+
+        correct = np.mean([best_id == str(t) for (best_id, _, _), t in zip(results, targets)])
+        best = np.array([r[1] for r in results])
+        margin = np.array([r[2] - r[1] for r in results])
+        print(f"  {k:>3}  {len(matcher.embeddings):>7}  {matcher.embeddings.nbytes / 1e6:>9.1f}  {ms:>8.2f}  "
+              f"{correct:>6.3f}  {best.mean():>9.3f}  {margin.mean():>7.3f}  {np.mean(margin / best):>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
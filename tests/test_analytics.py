@@ -0,0 +1,61 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ultra_analytics import AttendanceAnalytics  # noqa: E402
+
+
+class ListStore:
+    """Rows in append order; the cursor is the number of rows read"""
+    location = "memory"
+
+    def __init__(self, rows=()):
+        self.rows = list(rows)
+
+    def iter_rows_since(self, cursor):
+        for i in range(cursor, len(self.rows)):
+            yield i + 1, self.rows[i]
+
+
+def row(student_id, clock, kind, date="2025-02-13"):
+    return [student_id, "Name " + student_id, date, clock, kind]
+
+
+def test_entry_logged_after_exit_is_paired_by_time(tmp_path):
+    store = ListStore([row("S1", "17:00:00", "EXIT"), row("S1", "08:10:00", "ENTRY")])
+    analytics = AttendanceAnalytics(store, cache_path=str(tmp_path / "analytics"))
+    analytics.update()
+
+    record = analytics.day_records("2025-02-13")[0]
+    assert record['first_entry'] == 8 * 3600 + 600 and record['last_exit'] == 17 * 3600
+    assert record['on_site'] == 17 * 3600 - (8 * 3600 + 600)
+    report = analytics.day_report("2025-02-13")
+    assert report['missing_exit'] == [] and report['exit_without_entry'] == 0
+
+
+def test_late_rows_reopen_a_cached_day(tmp_path):
+    cache_path = str(tmp_path / "analytics")
+    store = ListStore([row("S1", "08:00:00", "ENTRY"), row("S1", "17:00:00", "EXIT")])
+    analytics = AttendanceAnalytics(store, cache_path=cache_path)
+    analytics.update()
+
+    # A batch run appends an earlier visit after the day was cached
+    store.rows += [row("S1", "07:00:00", "EXIT"), row("S1", "06:00:00", "ENTRY")]
+    analytics = AttendanceAnalytics(store, cache_path=cache_path)
+    analytics.update()
+
+    record = analytics.day_records("2025-02-13")[0]
+    assert record['last_exit'] == 17 * 3600, "an earlier EXIT must not replace the last one"
+    assert record['on_site'] == 3600 + 9 * 3600 and record['pairs'] == 2
+
+
+def test_mean_on_site_ignores_unpaired_exits(tmp_path):
+    store = ListStore([row("S1", "08:00:00", "ENTRY"), row("S1", "10:00:00", "EXIT"),
+                       row("S2", "12:00:00", "EXIT")])
+    analytics = AttendanceAnalytics(store, cache_path=str(tmp_path / "analytics"))
+    analytics.update()
+
+    report = analytics.day_report("2025-02-13")
+    assert report['exit_without_entry'] == 1
+    assert report['mean_on_site'] == 2 * 3600
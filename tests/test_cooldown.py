@@ -0,0 +1,34 @@
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ultra_cooldown import CooldownTracker  # noqa: E402
+
+
+def test_torn_last_line_is_ignored_on_replay(tmp_path):
+    path = str(tmp_path / "cooldown_entry.log")
+    now = datetime.now().timestamp()
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(f"001\t{now:.3f}\n002\t{now:.3f}"[:-4])  # Crash in the middle of the second line
+
+    tracker = CooldownTracker("ENTRY", 5, path=path)
+    assert list(tracker.last_logged) == ["001"]
+    tracker.close()
+
+
+def test_append_after_torn_line_starts_a_new_line(tmp_path):
+    path = str(tmp_path / "cooldown_entry.log")
+    tracker = CooldownTracker("ENTRY", 5, path=path)
+    tracker.record("001", datetime.now())
+    tracker._journal.close()
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write("002\t17")  # Another writer crashed mid-line
+
+    tracker._journal = tracker._open_journal()
+    tracker.record("003", datetime.now())
+    tracker._journal.close()
+    with open(path, encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    assert [line.split('\t')[0] for line in lines] == ["001", "003"]
@@ -0,0 +1,56 @@
+import os
+import pickle
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ultra_gallery import save_gallery, load_gallery, migrate_pickle, update_gallery_rows  # noqa: E402
+
+
+@pytest.mark.parametrize("dtype", ["float32", "float16", "int8"])
+def test_save_gallery_empty(tmp_path, dtype):
+    path = str(tmp_path / "gallery")
+    header = save_gallery([], [], np.empty((0, 0)), "VGG-Face", path=path, dtype=dtype)
+    assert header['rows'] == 0 and header['count'] == 0 and header['dim'] == 0
+
+    gallery = load_gallery(path)
+    assert len(gallery) == 0
+    assert gallery.embeddings.shape == (0, 0)
+
+
+def test_save_gallery_empty_keeps_dimension(tmp_path):
+    path = str(tmp_path / "gallery")
+    header = save_gallery([], [], np.empty((0, 128), dtype=np.float32), "VGG-Face", path=path)
+    assert header['rows'] == 0 and header['dim'] == 128
+    assert load_gallery(path).embeddings.shape == (0, 128)
+
+
+def test_migrate_pickle_empty(tmp_path):
+    pickle_path = str(tmp_path / "ultra_database.pkl")
+    with open(pickle_path, 'wb') as f:
+        pickle.dump({}, f)
+
+    header = migrate_pickle(pickle_path, path=str(tmp_path / "gallery"))
+    assert header['rows'] == 0 and header['count'] == 0
+    assert len(load_gallery(str(tmp_path / "gallery"))) == 0
+
+
+@pytest.mark.parametrize("dtype", ["float32", "int8"])
+def test_update_rows_leaves_open_galleries_untouched(tmp_path, dtype):
+    path = str(tmp_path / "gallery")
+    rows = np.random.default_rng(0).normal(size=(3, 8)).astype(np.float32)
+    save_gallery(["001", "002", "003"], ["Ann", "Bob", "Cy"], rows, "Facenet", path=path, dtype=dtype)
+    running = load_gallery(path)  # A service holding the memory map
+    before = np.array(running.embeddings[:])
+
+    update_gallery_rows({1: np.ones(8, dtype=np.float32)}, ["001", "002", "003"], ["Ann", "Robert", "Cy"], path=path)
+    assert np.array_equal(np.array(running.embeddings[:]), before)
+
+    updated = load_gallery(path)
+    assert updated.names["002"] == "Robert"
+    assert np.allclose(updated.embeddings[1], 1, atol=0.01)
+    assert np.allclose(updated.sq_norms[1], 8, atol=0.1)
+    assert np.allclose(np.array(updated.embeddings[:])[[0, 2]], before[[0, 2]])
@@ -0,0 +1,53 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ultra_logreader  # noqa: E402
+from ultra_logreader import LogIndex  # noqa: E402
+
+
+def write_log(path, dates):
+    new_file = not os.path.exists(path)
+    with open(path, 'a', newline='') as f:
+        if new_file:
+            f.write("ID,Name,Date,Time,Type,Similarity,Model\r\n")
+        for i, date in enumerate(dates):
+            f.write(f"{i:03d},Name,{date},08:00:00,ENTRY,0.9,Facenet\r\n")
+
+
+def test_sidecar_only_grows_by_closed_segments(tmp_path, monkeypatch):
+    monkeypatch.setattr(ultra_logreader, "SEGMENT_ROWS", 2)
+    log = str(tmp_path / "attendance_log.csv")
+    write_log(log, ["2025-02-13"] * 3)
+    index = LogIndex(log).refresh()
+    with open(index.path) as f:
+        first = f.read()
+    assert first.count("\n") == 1  # [13, 13] is closed, [13] is still open
+
+    write_log(log, ["2025-02-14"])
+    LogIndex(log).refresh()
+    with open(index.path) as f:
+        assert f.read().startswith(first), "closed segments are appended, never rewritten"
+
+    reopened = LogIndex(log)
+    assert reopened.count() == 4
+    assert [r[2] for r in reopened.rows_between("2025-02-14", "2025-02-14")] == ["2025-02-14"]
+    assert [r[0] for r in reopened.page(1, 3)] == ["001", "002", "000"]
+
+
+def test_torn_or_duplicate_records_are_rescanned(tmp_path, monkeypatch):
+    monkeypatch.setattr(ultra_logreader, "SEGMENT_ROWS", 1)
+    log = str(tmp_path / "attendance_log.csv")
+    write_log(log, ["2025-02-13", "2025-02-13", "2025-02-14"])
+    index = LogIndex(log).refresh()
+    with open(index.path) as f:
+        lines = f.readlines()
+    with open(index.path, 'w') as f:
+        f.write(lines[0] + lines[0] + lines[1][:-5])  # Two writers, then a crash mid-line
+
+    reopened = LogIndex(log)
+    assert len(reopened.segments) == 1
+    assert reopened.count() == 3 and [r[2] for r in reopened.rows_from(0, 3)][-1] == "2025-02-14"
+    with open(index.path) as f:
+        assert f.readlines() == lines
@@ -0,0 +1,21 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ultra_metrics import Metrics  # noqa: E402
+
+
+def test_export_and_merge_across_registries():
+    worker, main = Metrics(), Metrics()
+    with worker.time("detect"):
+        pass
+    worker.observe("detect", 0.004)
+    worker.inc("faces_detected", 3)
+
+    main.merge(worker.export(reset=True))
+    main.merge(worker.export(reset=True))  # Nothing new since the reset
+
+    assert main.totals()['detect']['count'] == 2
+    assert main.export()['counters'] == {'faces_detected': 3}
+    assert worker.totals() == {}
@@ -0,0 +1,28 @@
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ultra_pipeline import RecognitionPipeline  # noqa: E402
+
+
+def slow_embed(crops):
+    time.sleep(0.2)  # Still embedding when the stream ends
+    return [np.zeros(4, dtype=np.float32) for _ in crops]
+
+
+def test_drain_returns_faces_queued_before_the_stream_ended():
+    pipeline = RecognitionPipeline(lambda frame: [(10, 10, 40, 40)], slow_embed,
+                                   lambda embeddings: [("001", 0.1, 0.9) for _ in embeddings])
+    pipeline.start()
+    try:
+        pipeline.submit(1, np.zeros((120, 160, 3), dtype=np.uint8))
+        assert not pipeline.idle()
+        results = pipeline.drain(timeout=5)
+        assert pipeline.idle()
+        assert [(result.frame_id, result.faces) for result in results] == [(1, [(1, ("001", 0.1, 0.9))])]
+    finally:
+        pipeline.stop()
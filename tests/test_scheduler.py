@@ -0,0 +1,33 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ultra_scheduler import AdaptiveScheduler  # noqa: E402
+
+
+def scheduler():
+    return AdaptiveScheduler(target_latency_ms=500, cpu_budget=0.5, min_interval_ms=33, max_interval_ms=1000)
+
+
+def test_latency_target_caps_the_interval():
+    slow = scheduler()
+    slow.record_embedding(0.2, 1)                          # 200 ms per face
+    slow.record_detection(0.2, 1, 0, now=100.0)            # CPU budget alone would allow 400 ms
+    assert abs(slow.interval - (0.5 - 0.2 - 0.2)) < 1e-9
+    assert "over CPU budget" in slow.reason
+
+
+def test_unconfirmed_faces_detect_sooner():
+    tracking, identifying = scheduler(), scheduler()
+    tracking.record_detection(0.1, 2, 0, now=100.0)
+    identifying.record_detection(0.1, 2, 1, now=100.0)
+    assert identifying.interval < tracking.interval
+    assert identifying.reason.startswith("identifying")
+
+
+def test_empty_scene_backs_off_to_the_maximum():
+    idle = scheduler()
+    for step in range(20):
+        idle.record_detection(0.01, 0, 0, now=100.0 + step)
+    assert idle.interval == 1.0 and idle.reason == "empty scene"
@@ -0,0 +1,41 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ultra_store import ATTENDANCE_FILE, DATABASE_FILE, CsvSink, SqliteSink, open_store, read_store  # noqa: E402
+
+
+def row(student_id, date, kind):
+    return [student_id, "Name", date, "08:00:00", kind, "90.00%", "VGG-Face"]
+
+
+def test_rows_for_uses_the_indexes(tmp_path):
+    store = SqliteSink(str(tmp_path / "attendance.db"))
+    store.write([row("001", "2025-02-13", "ENTRY"), row("002", "2025-02-13", "ENTRY"),
+                 row("001", "2025-02-13", "EXIT"), row("001", "2025-02-14", "ENTRY")])
+    store.close()
+
+    assert [r[4] for r in store.rows_for(student_id="001", date="2025-02-13")] == ["ENTRY", "EXIT"]
+    assert [r[0] for r in store.rows_for(date="2025-02-13", mode="ENTRY")] == ["001", "002"]
+
+    plans = {
+        "idx_attendance_student_date": "SELECT * FROM attendance WHERE student_id = ? AND date = ?",
+        "idx_attendance_date_type": "SELECT * FROM attendance WHERE date = ? AND type = ?",
+    }
+    for index, sql in plans.items():
+        plan = " ".join(str(step) for step in store._query("EXPLAIN QUERY PLAN " + sql, ("x", "y")))
+        assert index in plan
+
+
+def test_read_store_does_not_migrate_the_csv_log(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assert read_store() is None
+
+    CsvSink().write([row("001", "2025-02-13", "ENTRY")])
+    store = read_store()
+    assert store.count() == 1 and store.location == ATTENDANCE_FILE
+    assert not os.path.exists(DATABASE_FILE), "only the writer imports the old log"
+
+    open_store().close()
+    assert read_store().location == DATABASE_FILE and read_store().count() == 1
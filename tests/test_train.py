@@ -0,0 +1,38 @@
+import os
+import pickle
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ultra_embedder import MODEL_NAME, EMBED_BACKEND  # noqa: E402
+from ultra_gallery import load_gallery  # noqa: E402
+from ultra_train import train  # noqa: E402
+
+
+def write_person(database, folder, person_id, seed):
+    os.makedirs(os.path.join(database, folder), exist_ok=True)
+    embeddings = list(np.random.default_rng(seed).normal(size=(3, 16)).astype(np.float32))
+    with open(os.path.join(database, folder, "embeddings.pkl"), 'wb') as f:
+        pickle.dump({'id': person_id, 'name': folder, 'embeddings': embeddings,
+                     'average_embedding': np.mean(embeddings, axis=0),
+                     'model': MODEL_NAME, 'backend': EMBED_BACKEND}, f)
+
+
+def test_failed_folder_keeps_previous_rows(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_person("face_database", "001_Ann", "001", 1)
+    write_person("face_database", "002_Bob", "002", 2)
+    assert train("face_database", workers=1)['persons'] == 2
+
+    write_person("face_database", "003_Cy", "003", 3)
+    write_person("face_database", "004_Dee", "004", 4)
+    for folder in ("002_Bob", "004_Dee"):  # Bob was in the gallery, Dee is new
+        with open(os.path.join("face_database", folder, "embeddings.pkl"), 'wb') as f:
+            f.write(b"truncated")
+
+    report = train("face_database", workers=1)
+    assert report['failed'] == 2 and report['kept'] == 1
+    assert report['reused'] == 1 and report['rebuilt'] == 1
+    assert sorted(load_gallery().ids) == ["001", "002", "003"]
@@ -0,0 +1,628 @@
+"""
+ATTENDANCE ANALYTICS
+Presence, ENTRY/EXIT pairing and time on site from the attendance store.
+
+The log is read in large blocks (raw CSV lines, or one string per column
+built inside SQLite) and each block is split into columns with numpy - no
+Python object per row. Rows become compact (student, time, kind)
+events of their day. ENTRY and EXIT events are paired per student by time,
+not by log order (batch runs and separate writers append rows out of order),
+into one record per student per day: first entry, last exit, seconds on site,
+open entry.
+
+The cache is a directory (attendance_analytics/): index.pkl holds the store
+cursor, students and the event count of every day, and each day keeps its
+events and records in two .npy files. The next report only reads rows
+appended since, and only the days those rows touch are re-derived and
+rewritten.
+
+    python ultra_analytics.py                        # latest day
+    python ultra_analytics.py day 2025-02-13
+    python ultra_analytics.py students 2025-02-01 2025-02-28
+"""
+
+import argparse
+import csv
+import io
+import os
+import pickle
+import time
+
+import numpy as np
+
+from ultra_store import ATTENDANCE_HEADER, UNIT_SEPARATOR, open_store, read_store
+
+# Settings
+ANALYTICS_CACHE = "attendance_analytics"  # Directory
+CACHE_VERSION = 3
+LATE_AFTER = "09:00"       # First ENTRY after this time counts as a late arrival
+SAVE_EVERY_ROWS = 1000000  # Checkpoint the cache during very long first runs
+BLOCK_ROWS = 100000        # Rows per block for stores without iter_blocks_since()
+MAX_ID_BYTES = 64          # Longer student IDs take the csv module path
+
+# One row per student per day; times are seconds since midnight, -1 = none
+DAY_DTYPE = np.dtype([('student', np.int32), ('first_entry', np.int32), ('last_exit', np.int32),
+                      ('on_site', np.int32), ('open_since', np.int32),
+                      ('entries', np.uint16), ('exits', np.uint16), ('pairs', np.uint16)])
+ENTRY, EXIT = 0, 1  # Event kinds (ENTRY sorts first when both share a second)
+KINDS = {'ENTRY': ENTRY, 'EXIT': EXIT}
+
+
+def seconds_of_day(text):
+    """'HH:MM[:SS]' -> seconds since midnight (settings and arguments)"""
+    parts = text.split(':')
+    seconds = int(parts[0]) * 3600 + int(parts[1]) * 60
+    return seconds + int(parts[2]) if len(parts) > 2 else seconds
+
+
+BYTE_MASKS = np.array([(1 << 8 * i) - 1 for i in range(9)], dtype=np.uint64)  # Low i bytes of a word
+
+
+def _word(text):
+    return int.from_bytes(text, 'little')
+
+
+def _fields(words, starts, stops):
+    """Bytes start:stop of every row as zero-padded 8-byte words, (n, ceil(longest / 8))"""
+    lengths = stops - starts
+    fields = np.empty((len(starts), max(-(-int(lengths.max(initial=0)) // 8), 1)), dtype=np.uint64)
+    for i in range(fields.shape[1]):
+        fields[:, i] = words[np.minimum(starts + 8 * i, len(words) - 1)] & BYTE_MASKS[np.clip(lengths - 8 * i, 0, 8)]
+    return fields
+
+
+def _strings(fields):
+    """Rows of _fields() as bytes objects"""
+    return fields.view(f'S{fields.shape[1] * 8}').ravel().tolist()
+
+
+def _word_view(data):
+    """words[p] = the 8 bytes data[p:p + 8] as a little-endian uint64 (overlapping, zero past the end)"""
+    padded = np.frombuffer(data + bytes(8), dtype=np.uint8)
+    return np.lib.stride_tricks.as_strided(padded, shape=(len(data) + 1, 8), strides=(1, 1)).view('<u8')[:, 0]
+
+
+class LogBlock:
+    """
+    Events of a block of log rows, read with numpy: the (start, stop) byte
+    spans of each row's ID, Name, Date, Time and Type in `data`, then 8 bytes
+    per index from an overlapping uint64 view of it. Fast rows give columns:
+    `ids` (zero-padded ID words), `seconds`, `kinds` and `date_runs`
+    [(date, first row, end row)]; the others (quotes, unusual dates or times)
+    are handed over as field lists in `rows` (parse(row), by default the
+    spans decoded). `lines` and `row_lines` are the row numbers of both.
+    """
+
+    def __init__(self, data, spans, fast, parse=None):
+        self.data, self._spans = data, spans
+        self._words = words = _word_view(data)
+        (id_at, id_end), names, (date_at, date_end), (time_at, time_end), (type_at, type_end) = spans
+        # Fast path: an ID of at most MAX_ID_BYTES, 'YYYY-MM-DD', 'HH:MM:SS'
+        fast = fast & (id_end - id_at <= MAX_ID_BYTES) & (date_end - date_at == 10) & (time_end - time_at == 8)
+        candidates = np.flatnonzero(fast)
+
+        clock = words[np.minimum(time_at[candidates], len(words) - 1)].view(np.uint8).reshape(-1, 8)
+        digits = clock[:, [0, 1, 3, 4, 6, 7]].astype(np.int32) - ord('0')
+        clock_ok = (clock[:, 2] == ord(':')) & (clock[:, 5] == ord(':')) & \
+            ((digits >= 0) & (digits <= 9)).all(axis=1)
+        fast[candidates[~clock_ok]] = False
+        kind = words[np.minimum(type_at[candidates], len(words) - 1)]
+        type_bytes = type_end[candidates] - type_at[candidates]
+        is_entry = (type_bytes == 5) & (kind & BYTE_MASKS[5] == _word(b'ENTRY'))
+        is_exit = (type_bytes == 4) & (kind & BYTE_MASKS[4] == _word(b'EXIT'))
+        keep = clock_ok & (is_entry | is_exit)  # A well-formed row of another type is skipped
+        lines = candidates[keep]
+
+        self.lines = lines
+        self.ids = _fields(words, id_at[lines], id_end[lines])
+        h1, h2, m1, m2, s1, s2 = digits[keep].T
+        self.seconds = (h1 * 10 + h2) * 3600 + (m1 * 10 + m2) * 60 + s1 * 10 + s2
+        self.kinds = np.where(is_entry[keep], ENTRY, EXIT).astype(np.int32)
+        self._names = (names[0][lines], names[1][lines])
+
+        # Logs are written day by day: a block holds a few runs of one date each
+        at = date_at[lines]
+        head, tail = words[at], words[at + 2]  # 10 bytes in two overlapping words
+        changed = (head[1:] != head[:-1]) | (tail[1:] != tail[:-1])
+        runs = np.append(0, np.flatnonzero(changed) + 1)[:max(len(lines), 1)]
+        self.date_runs = [] if not len(lines) else [
+            (data[at[start]:at[start] + 10].decode('utf-8', errors='replace'), start, stop)
+            for start, stop in zip(runs.tolist(), np.append(runs[1:], len(lines)).tolist())]
+
+        self.row_lines = np.flatnonzero(~fast)
+        self.rows = [(parse or self._span_fields)(line) for line in self.row_lines.tolist()]
+
+    def _span_fields(self, line):
+        return [self.data[start[line]:stop[line]].decode('utf-8', errors='replace') for start, stop in self._spans]
+
+    def names(self, rows):
+        """Name words of fast rows, as _fields()"""
+        return _fields(self._words, self._names[0][rows], self._names[1][rows])
+
+    @classmethod
+    def from_csv(cls, data):
+        """CSV log lines (ID,Name,Date,Time,Type[,...]); lines with quotes go through the csv module"""
+        buf = np.frombuffer(data, dtype=np.uint8)
+        ends = np.flatnonzero(buf == ord('\n'))
+        quotes = np.flatnonzero(buf == ord('"')) if b'"' in data else ends[:0]
+        if len(quotes):
+            ends = ends[np.searchsorted(quotes, ends) % 2 == 0]  # Not a newline inside a quoted name
+        starts = np.append(0, ends + 1)[:-1]
+        stops = ends - (buf[ends - 1] == ord('\r'))
+        commas = np.flatnonzero(buf == ord(','))
+
+        width = len(ATTENDANCE_HEADER) - 1
+        if len(commas) == width * len(starts) and len(starts) and \
+                (commas[::width] > starts).all() and (commas[width - 1::width] < stops).all():
+            # Every line has all the columns the writers log: the commas are a (lines, 6) table
+            comma = commas.reshape(-1, width).T
+            fields = np.full(len(starts), width + 1)
+        else:
+            commas = np.append(commas, len(buf))  # Sentinel: no comma past the end
+            first = np.searchsorted(commas, starts)
+            fields = np.searchsorted(commas, stops) - first + 1
+            comma = [commas[np.minimum(first + i, len(commas) - 1)] for i in range(5)]
+        spans = [(starts, comma[0]), (comma[0] + 1, comma[1]), (comma[1] + 1, comma[2]),
+                 (comma[2] + 1, comma[3]), (comma[3] + 1, np.where(fields > 5, comma[4], stops))]
+        fast = fields >= 5
+        if len(quotes):
+            fast &= np.searchsorted(quotes, starts) == np.searchsorted(quotes, stops)
+
+        def parse(line):
+            return next(csv.reader([data[starts[line]:stops[line]].decode('utf-8', errors='replace')]), [])
+        return cls(data, spans, fast, parse)
+
+    @classmethod
+    def from_columns(cls, columns):
+        """Columns ID, Name, Date, Time, Type, each a string of values joined by UNIT_SEPARATOR"""
+        data = UNIT_SEPARATOR.join(columns).encode('utf-8') + UNIT_SEPARATOR.encode()
+        ends = np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == ord(UNIT_SEPARATOR)).reshape(len(columns), -1)
+        starts = np.concatenate([[0], ends.ravel()[:-1] + 1]).reshape(ends.shape)
+        return cls(data, list(zip(starts, ends)), np.ones(ends.shape[1], dtype=bool))
+
+
+def _id_hashes(ids):
+    """One uint64 per zero-padded ID (trailing zero words do not change it; 8-byte IDs are their own hash)"""
+    hashes = ids[:, 0].copy()
+    for i in range(1, ids.shape[1]):
+        hashes ^= ids[:, i] * np.uint64((0x9E3779B97F4A7C15 * i) % 2**64 | 1)
+    return hashes
+
+
+def _same_ids(a, b):
+    """Row-wise equality of two zero-padded ID arrays of any widths"""
+    width = min(a.shape[1], b.shape[1])
+    return (a[:, :width] == b[:, :width]).all(axis=1) & (a[:, width:] == 0).all(axis=1) & \
+        (b[:, width:] == 0).all(axis=1)
+
+
+def _group_rows(rows):
+    """Group number of every row of a 2D uint64 array (equal rows, equal group), and the group count"""
+    if rows.shape[1] == 1:
+        unique, inverse = np.unique(rows[:, 0], return_inverse=True)
+        return inverse, len(unique)
+    order = np.lexsort(rows.T[::-1])
+    ordered = rows[order]
+    new = np.ones(len(order), dtype=bool)
+    new[1:] = (ordered[1:] != ordered[:-1]).any(axis=1)
+    inverse = np.empty(len(order), dtype=np.int64)
+    inverse[order] = np.cumsum(new) - 1
+    return inverse, int(new.sum())
+
+
+def iter_log_blocks(store, cursor):
+    """
+    (cursor, LogBlock) for the rows after cursor: SQLite hands over columns,
+    a CSV log its raw lines, and rows of any other store are written out as
+    CSV, BLOCK_ROWS at a time
+    """
+    if hasattr(store, 'iter_columns_since'):
+        for cursor, columns in store.iter_columns_since(cursor):
+            yield cursor, LogBlock.from_columns(columns)
+        return
+    if hasattr(store, 'iter_blocks_since'):
+        for cursor, data in store.iter_blocks_since(cursor):
+            yield cursor, LogBlock.from_csv(data)
+        return
+    buffer, count = io.StringIO(), 0
+    writer = csv.writer(buffer)
+    for cursor, row in store.iter_rows_since(cursor):
+        writer.writerow(row)
+        count += 1
+        if count == BLOCK_ROWS:
+            yield cursor, LogBlock.from_csv(buffer.getvalue().encode('utf-8'))
+            buffer.seek(0)
+            buffer.truncate()
+            count = 0
+    if count:
+        yield cursor, LogBlock.from_csv(buffer.getvalue().encode('utf-8'))
+
+
+def derive_day(events):
+    """
+    DAY_DTYPE records from one day's (student, seconds, kind) events.
+    Events are sorted by student and time; an EXIT closes the run of ENTRY
+    events just before it (a repeated ENTRY keeps the earliest one open).
+    """
+    if len(events) == 0:
+        return np.empty(0, dtype=DAY_DTYPE)
+    # One int64 sort key: student | seconds (offset to stay positive) | kind
+    key = (events[:, 0].astype(np.int64) << 33) | ((events[:, 1].astype(np.int64) + 2**31) << 1) | events[:, 2]
+    key.sort()
+    student = (key >> 33).astype(np.int32)
+    seconds = ((key >> 1 & 0xFFFFFFFF) - 2**31).astype(np.int32)
+    is_entry = (key & 1) == ENTRY
+    new_student = np.ones(len(events), dtype=bool)
+    new_student[1:] = student[1:] != student[:-1]
+    after_entry = np.zeros(len(events), dtype=bool)
+    after_entry[1:] = is_entry[:-1] & ~new_student[1:]
+
+    # Where each run of consecutive ENTRY events started
+    run_start = np.where(is_entry & ~after_entry, np.arange(len(events)), 0)
+    np.maximum.accumulate(run_start, out=run_start)
+    opened_at = seconds[run_start]
+
+    paired = ~is_entry & after_entry
+    starts = np.flatnonzero(new_student)
+    stops = np.append(starts[1:], len(events))
+
+    def per_student(values):
+        total = np.concatenate(([0], np.cumsum(values, dtype=np.int64)))
+        return total[stops] - total[starts]
+
+    # Sorted by time: the first ENTRY at or after a student's start, the last EXIT before the next student
+    entries = np.append(np.flatnonzero(is_entry), len(events))
+    first = entries[np.searchsorted(entries, starts)]
+    exits = np.append(-1, np.flatnonzero(~is_entry))
+    last_exit = exits[np.searchsorted(exits, stops) - 1]
+
+    records = np.empty(len(starts), dtype=DAY_DTYPE)
+    records['student'] = student[starts]
+    records['first_entry'] = np.where(first < stops, seconds[np.minimum(first, len(events) - 1)], -1)
+    records['last_exit'] = np.where(last_exit >= starts, seconds[last_exit], -1)
+    records['on_site'] = per_student(np.where(paired, seconds - opened_at, 0))
+    records['open_since'] = np.where(is_entry[stops - 1], opened_at[stops - 1], -1)
+    entry_count = per_student(is_entry)
+    records['entries'] = entry_count
+    records['exits'] = stops - starts - entry_count
+    records['pairs'] = per_student(paired)
+    return records
+
+
+def format_duration(seconds):
+    return f"{int(seconds) // 3600}h {int(seconds) % 3600 // 60:02d}m"
+
+
+def format_clock(seconds):
+    return "--:--" if seconds < 0 else f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}"
+
+
+class AttendanceAnalytics:
+    """Incremental per-day aggregates over the attendance store"""
+
+    def __init__(self, store=None, cache_path=ANALYTICS_CACHE):
+        self.store = store or read_store() or open_store()
+        self.cache_path = cache_path
+        self._reset()
+        self._load()
+
+    def _reset(self):
+        self.cursor = 0
+        self.student_ids = []   # Index -> student ID
+        self.names = []         # Index -> latest name seen
+        self._index = {}        # Student ID -> index
+        self._lookup = None     # See _id_lookup()
+        self._name_bytes = None # Encoded names, to spot renames without decoding
+        self.days = {}          # Date -> [file number, event count] of the saved day
+        self._records = {}      # Date -> DAY_DTYPE records, loaded or derived
+        self._events = {}       # Date -> (n, 3) int32 events (student, seconds, kind) not saved yet
+        self._open_days = {}    # Date -> event arrays added since the day was last derived
+        self.rows_read = 0      # Rows processed by the last update()
+
+    def _path(self, name):
+        return os.path.join(self.cache_path, name)
+
+    def _load(self):
+        if not os.path.exists(self._path("index.pkl")):
+            return
+        try:
+            with open(self._path("index.pkl"), 'rb') as f:
+                cache = pickle.load(f)  # Local cache written by save()
+        except Exception as e:
+            print(f"⚠ Ignoring unreadable analytics cache: {e}")
+            return
+        if cache.get('version') != CACHE_VERSION or cache.get('location') != self.store.location:
+            return  # Different store or format: rebuild from the start
+        self.cursor = cache['cursor']
+        self.student_ids = cache['student_ids']
+        self.names = cache['names']
+        self._index = {student_id: i for i, student_id in enumerate(self.student_ids)}
+        self.days = cache['days']
+
+    def _write(self, name, array):
+        tmp_path = self._path(name + ".tmp")
+        with open(tmp_path, 'wb') as f:
+            np.save(f, array)
+        os.replace(tmp_path, self._path(name))
+
+    def save(self):
+        """
+        Write the days changed since the last save, then the index (atomic
+        replaces). Events are written before records and the index last, so
+        after a crash the index event count tells which files are current.
+        """
+        self._close_days()
+        os.makedirs(self.cache_path, exist_ok=True)
+        for date, events in self._events.items():
+            number = self.days[date][0] if date in self.days else len(self.days)
+            self._write(f"{number}.events.npy", events)
+            self._write(f"{number}.days.npy", self._records[date])
+            self.days[date] = [number, len(events)]
+            del self._records[date]  # Loaded again on demand: a first run does not hold a year in memory
+        self._events = {}
+        tmp_path = self._path("index.pkl.tmp")
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({'version': CACHE_VERSION, 'location': self.store.location, 'cursor': self.cursor,
+                         'student_ids': self.student_ids, 'names': self.names, 'days': self.days},
+                        f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self._path("index.pkl"))
+
+    def _saved_events(self, date):
+        """Events of a saved day (a longer file is a save the index never recorded)"""
+        if date not in self.days:
+            return np.empty((0, 3), dtype=np.int32)
+        number, count = self.days[date]
+        return np.array(np.load(self._path(f"{number}.events.npy"), mmap_mode='r')[:count])
+
+    def _close_days(self):
+        """Merge new events into their days and re-pair those days by time"""
+        for date, parts in self._open_days.items():
+            previous = self._events.get(date)
+            if previous is None:
+                previous = self._saved_events(date)
+            events = np.concatenate([previous] + parts)
+            self._events[date] = events
+            self._records[date] = derive_day(events)
+        self._open_days = {}
+
+    def _student(self, student_id, name):
+        index = self._index.get(student_id)
+        if index is None:
+            index = self._index[student_id] = len(self.student_ids)
+            self.student_ids.append(student_id)
+            self.names.append(name)
+            self._name_bytes = self._lookup = None
+        elif self.names[index] != name:
+            self.names[index] = name
+            self._name_bytes = None
+        return index
+
+    def _id_lookup(self):
+        """(sorted ID hashes, student index of each, ID words of every student), rebuilt after new students"""
+        if self._lookup is None:
+            encoded = [student_id.encode('utf-8') for student_id in self.student_ids]
+            stops = np.cumsum([len(student_id) for student_id in encoded])
+            words = _fields(_word_view(b''.join(encoded)), stops - [len(student_id) for student_id in encoded], stops)
+            order = np.argsort(_id_hashes(words))
+            self._lookup = (_id_hashes(words)[order], order, words)
+        return self._lookup
+
+    def _add_block(self, block):
+        """Events of one LogBlock into their open days; returns rows added"""
+        students = np.full(len(block.lines), -1, dtype=np.int32)
+        if len(block.lines) and self.student_ids:
+            hashes, order, words = self._id_lookup()
+            ids, inverse = np.unique(_id_hashes(block.ids), return_inverse=True)  # Sorted: a fast search
+            at = np.minimum(np.searchsorted(hashes, ids), len(hashes) - 1)
+            candidates = np.where(hashes[at] == ids, order[at], 0)[inverse]
+            found = _same_ids(words[candidates], block.ids)
+            students[found] = candidates[found]
+
+        # Renamed and new students plus every slow row: (line, ID, name, what), applied in log order
+        seen = []
+        found = np.flatnonzero(students >= 0)
+        if len(found):
+            last = np.full(len(self.student_ids), -1, dtype=np.int64)
+            np.maximum.at(last, students[found], found)  # Each student's latest row in the block
+            present = np.flatnonzero(last >= 0)
+            names = np.array(_strings(block.names(last[present])))
+            if self._name_bytes is None:
+                self._name_bytes = np.array([name.encode('utf-8') for name in self.names])
+            renamed = self._name_bytes[present] != names
+            if block.rows:  # A quoted row of the same student may rename it first
+                renamed |= np.isin(present, [self._index.get(row[0], -1) for row in block.rows if row])
+            for i in np.flatnonzero(renamed).tolist():
+                seen.append((block.lines[last[present[i]]], self.student_ids[present[i]],
+                             names[i].decode('utf-8', errors='replace'), None))
+
+        missing = np.flatnonzero(students < 0)  # New IDs (or IDs that are not valid UTF-8)
+        if len(missing):
+            group, count = _group_rows(block.ids[missing])
+            last = np.zeros(count, dtype=np.int64)
+            np.maximum.at(last, group, np.arange(len(group)))
+            rows = missing[last]
+            for i, (key, name) in enumerate(zip(_strings(block.ids[rows]), _strings(block.names(rows)))):
+                seen.append((block.lines[rows[i]], key.decode('utf-8', errors='replace'),
+                             name.decode('utf-8', errors='replace'), i))
+            new = np.empty(count, dtype=np.int32)
+
+        for line, row in zip(block.row_lines, block.rows):
+            try:
+                student_id, name, date, clock, kind = row[:5]
+                seconds = seconds_of_day(clock)
+            except (ValueError, IndexError):
+                continue  # Short or malformed row
+            if kind in KINDS:
+                seen.append((line, student_id, name, (date, seconds, KINDS[kind])))
+
+        added = {}  # Date -> event arrays
+        slow = {}   # Date -> flat [student, seconds, kind, ...]
+        for _, student_id, name, what in sorted(seen, key=lambda item: item[0]):  # Latest name wins
+            index = self._student(student_id, name)
+            if isinstance(what, tuple):
+                date, seconds, kind = what
+                slow.setdefault(date, []).extend((index, seconds, kind))
+            elif what is not None:
+                new[what] = index
+        if len(missing):
+            students[missing] = new[group]
+
+        if len(block.lines):
+            events = np.column_stack((students, block.seconds, block.kinds))
+            for date, start, stop in block.date_runs:
+                added.setdefault(date, []).append(events[start:stop])
+        for date, flat in slow.items():
+            added.setdefault(date, []).append(np.array(flat, dtype=np.int32).reshape(-1, 3))
+
+        for date, parts in added.items():
+            self._open_days.setdefault(date, []).extend(parts)
+        return sum(len(part) for parts in added.values() for part in parts)
+
+    def update(self):
+        """
+        Fold in every row appended since the last run; returns rows read.
+        Rows are split into events a whole block at a time; pairing happens
+        per day, vectorized, when the days are closed, and save() rewrites
+        only the days that received rows.
+        """
+        started = time.perf_counter()
+        self.rows_read = saved_at = 0
+        for cursor, block in iter_log_blocks(self.store, self.cursor):
+            self.rows_read += self._add_block(block)
+            self.cursor = cursor
+            if self.rows_read - saved_at >= SAVE_EVERY_ROWS:
+                self.save()
+                saved_at = self.rows_read
+
+        if self.rows_read or self._open_days:
+            self.save()
+        self.update_seconds = time.perf_counter() - started
+        return self.rows_read
+
+    def dates(self):
+        return sorted(set(self.days) | set(self._events) | set(self._open_days))
+
+    def day_records(self, date):
+        self._close_days()
+        records = self._records.get(date)
+        if records is None:
+            if date not in self.days:
+                return np.empty(0, dtype=DAY_DTYPE)
+            number, count = self.days[date]
+            try:
+                events_saved = len(np.load(self._path(f"{number}.events.npy"), mmap_mode='r'))
+                records = np.load(self._path(f"{number}.days.npy")) if events_saved == count else None
+            except (OSError, ValueError):
+                records = None
+            if records is None:
+                records = derive_day(self._saved_events(date))  # Records file from an unfinished save
+            self._records[date] = records
+        return records
+
+    def day_report(self, date, late_after=LATE_AFTER):
+        """Summary of one day: who came, who was late, whose EXIT is missing"""
+        records = self.day_records(date)
+        late_limit = seconds_of_day(late_after)
+        entered = records['first_entry'] >= 0
+        late = entered & (records['first_entry'] > late_limit)
+        missing_exit = records['open_since'] >= 0
+        exited = records['exits'] > 0
+        paired = records['pairs'] > 0
+        return {
+            'date': date,
+            'present': int(entered.sum()),
+            'late': [(self.student_ids[i], self.names[i], int(t))
+                     for i, t in zip(records['student'][late], records['first_entry'][late])],
+            'missing_exit': [(self.student_ids[i], self.names[i], int(t))
+                             for i, t in zip(records['student'][missing_exit], records['open_since'][missing_exit])],
+            'exit_without_entry': int((~entered & exited).sum()),
+            'mean_on_site': float(records['on_site'][paired].mean()) if paired.any() else 0.0,  # Matched pairs only
+        }
+
+    def student_report(self, start_date, end_date, late_after=LATE_AFTER):
+        """Per-student totals over start_date..end_date (inclusive), sorted by ID"""
+        self._close_days()
+        late_limit = seconds_of_day(late_after)
+        count = len(self.student_ids)
+        days_present = np.zeros(count, dtype=np.int64)
+        late_days = np.zeros(count, dtype=np.int64)
+        on_site = np.zeros(count, dtype=np.int64)
+        missing_exits = np.zeros(count, dtype=np.int64)
+
+        for date in self.dates():
+            if not start_date <= date <= end_date:
+                continue
+            records = self.day_records(date)
+            if len(records) == 0:
+                continue
+            students = records['student']
+            entered = records['first_entry'] >= 0
+            days_present += np.bincount(students, weights=entered, minlength=count).astype(np.int64)
+            late_days += np.bincount(students, weights=entered & (records['first_entry'] > late_limit),
+                                     minlength=count).astype(np.int64)
+            on_site += np.bincount(students, weights=records['on_site'], minlength=count).astype(np.int64)
+            missing_exits += np.bincount(students, weights=records['open_since'] >= 0,
+                                         minlength=count).astype(np.int64)
+
+        report = []
+        for i in np.flatnonzero(days_present):
+            report.append({'id': self.student_ids[i], 'name': self.names[i], 'days': int(days_present[i]),
+                           'late': int(late_days[i]), 'on_site': int(on_site[i]),
+                           'missing_exits': int(missing_exits[i])})
+        return sorted(report, key=lambda entry: entry['id'])
+
+
+def print_day_report(report, limit=20):
+    print(f"📅 {report['date']}")
+    print(f"  Present: {report['present']} | Late (after {LATE_AFTER}): {len(report['late'])} | "
+          f"Missing EXIT: {len(report['missing_exit'])} | "
+          f"Average time on site: {format_duration(report['mean_on_site'])}")
+    if report['exit_without_entry']:
+        print(f"  EXIT without ENTRY: {report['exit_without_entry']}")
+    for title, people in (("Late arrivals", report['late']), ("Missing EXIT (entered at)", report['missing_exit'])):
+        if not people:
+            continue
+        print(f"\n  {title}:")
+        for student_id, name, seconds in sorted(people, key=lambda person: person[2])[:limit]:
+            print(f"    {format_clock(seconds)}  {student_id} - {name}")
+        if len(people) > limit:
+            print(f"    ... and {len(people) - limit} more")
+
+
+def print_student_report(report, start_date, end_date, limit=None):
+    print(f"👥 {start_date} to {end_date}: {len(report)} student(s)")
+    print("-"*70)
+    print(f"{'ID':<12}{'Name':<24}{'Days':>6}{'Late':>6}{'No EXIT':>9}{'On site':>12}")
+    print("-"*70)
+    for entry in report[:limit]:
+        print(f"{entry['id']:<12}{entry['name'][:23]:<24}{entry['days']:>6}{entry['late']:>6}"
+              f"{entry['missing_exits']:>9}{format_duration(entry['on_site']):>12}")
+    print("-"*70)
+    if limit is not None and len(report) > limit:
+        print(f"... and {len(report) - limit} more")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("report", nargs="?", choices=["day", "students"], default="day")
+    parser.add_argument("dates", nargs="*", help="YYYY-MM-DD (day: one date; students: from [to])")
+    args = parser.parse_args()
+
+    analytics = AttendanceAnalytics()
+    rows = analytics.update()
+    print(f"✓ {rows} new row(s) analysed in {analytics.update_seconds:.2f} s ({analytics.store.location})")
+    dates = analytics.dates()
+    if not dates:
+        print("❌ No attendance records found.")
+        return
+
+    if args.report == "day":
+        print_day_report(analytics.day_report(args.dates[0] if args.dates else dates[-1]))
+    else:
+        start_date = args.dates[0] if args.dates else dates[0]
+        end_date = args.dates[1] if len(args.dates) > 1 else dates[-1]
+        print_student_report(analytics.student_report(start_date, end_date), start_date, end_date)
+
+
+if __name__ == "__main__":
+    main()
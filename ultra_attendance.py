@@ -1,23 +1,23 @@
 """
 UNIVERSITY SMART ATTENDANCE SYSTEM
 Entry & Exit Tracking with Face Recognition
-Uses DeepFace with VGG-Face for extreme precision
+Uses DeepFace (MODEL_NAME in ultra_embedder.py, VGG-Face by default) for extreme precision
 """
 import cv2
-import pickle
-import numpy as np
-from deepface import DeepFace
 from datetime import datetime
-import csv
 import os
-import tempfile
-
-# Settings
-DATABASE_FILE = "ultra_database.pkl"
-ATTENDANCE_FILE = "attendance_log.csv"
-COOLDOWN_TRACKER_FILE = "cooldown_tracker.pkl"
-SIMILARITY_THRESHOLD = 0.35
-CONFIDENCE_MARGIN = 0.12
+import time
+from ultra_recognition import (build_matcher, create_face_detector, is_confident, attendance_row,
+                               similarity_percent, SIMILARITY_THRESHOLD, CONFIDENCE_MARGIN,
+                               COOLDOWN_MINUTES)
+from ultra_cooldown import CooldownTracker
+from ultra_gallery import load_gallery, gallery_exists, migrate_pickle, GALLERY_DIR, LEGACY_DATABASE_FILE
+from ultra_embedder import get_embedder, MODEL_NAME
+from ultra_pipeline import FrameGrabber, RecognitionPipeline
+from ultra_store import open_store
+from ultra_metrics import metrics, start_metrics_server, draw_overlay, METRICS_OVERLAY
+
+# Settings (thresholds, cooldown and log file are shared - see ultra_recognition.py)
 
 # Attendance Mode Selection
 print("="*70)
@@ -45,8 +45,16 @@ else:
     mode_color = (0, 255, 0)
     mode_emoji = "📥"
 
-# Load database with error handling
-if not os.path.exists(DATABASE_FILE):
+# Load gallery with error handling (one-shot migration of an old pickle database)
+if not gallery_exists() and os.path.exists(LEGACY_DATABASE_FILE):
+    print(f"↻ Migrating {LEGACY_DATABASE_FILE} to the new gallery format...")
+    try:
+        migrate_pickle(LEGACY_DATABASE_FILE, model_name=MODEL_NAME)
+        print(f"✓ Migrated to {GALLERY_DIR}/")
+    except Exception as e:
+        print(f"✗ Migration failed: {e}")
+
+if not gallery_exists():
     print("✗ Database not found!")
     print("\nPlease run training first:")
     print("  python ultra_train.py")
@@ -55,9 +63,8 @@ if not os.path.exists(DATABASE_FILE):
     exit()
 
 try:
-    with open(DATABASE_FILE, 'rb') as f:
-        database = pickle.load(f)
-    if not database or len(database) == 0:
+    gallery = load_gallery()  # Memory-mapped: no full read before the first frame
+    if len(gallery) == 0:
         print("✗ Database is empty!")
         print("\nPlease run:")
         print("  1. python ultra_register.py (register people)")
@@ -74,15 +81,30 @@ except Exception as e:
 
 print("="*70)
 print(f"   UNIVERSITY ATTENDANCE - {ATTENDANCE_MODE} MODE {mode_emoji}")
-print("   Deep Learning Recognition (VGG-Face)")
+print(f"   Deep Learning Recognition ({MODEL_NAME})")
 print("="*70)
 print(f"✓ Database loaded successfully!")
-print(f"✓ Registered students: {len(database)}")
+print(f"✓ Registered students: {len(gallery)}")
+
+# The matcher works directly on the memory-mapped gallery matrix, using the
+# search index saved by training (exact scan if missing or out of date).
+# A gallery from another embedding backend/model is refused.
+try:
+    matcher = build_matcher(gallery)
+except ValueError as e:
+    print(f"✗ {e}")
+    input("\nPress Enter to exit...")
+    exit()
+print(f"✓ Search index: {matcher.index.kind}")
+
+# Warm model server if one is running (instant start), else load the model here
+embedder = get_embedder()
+print(f"✓ Embedding model: {MODEL_NAME} ({embedder.kind})")
 
 # Show who is registered
 print("\nRegistered students:")
-for person_id, person_data in database.items():
-    print(f"  - {person_data['name']} (ID: {person_id})")
+for person_id in gallery.ids:
+    print(f"  - {gallery.names[person_id]} (ID: {person_id})")
 
 print(f"\nMode: {ATTENDANCE_MODE}")
 print(f"Similarity threshold: {SIMILARITY_THRESHOLD}")
@@ -92,239 +114,241 @@ print("  ✓ Background-independent")
 print("  ✓ Works in different locations")
 print("  ✓ Won't mix similar students")
 print(f"  ✓ Logging {ATTENDANCE_MODE} times")
+metrics_url = start_metrics_server()
+if metrics_url:
+    print(f"\n📈 Metrics: {metrics_url} (M = on-screen overlay)")
 print("\nPress ESC to exit")
 print("="*70 + "\n")
 
-# Create attendance file
-if not os.path.exists(ATTENDANCE_FILE):
-    with open(ATTENDANCE_FILE, 'w', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow(['ID', 'Name', 'Date', 'Time', 'Type', 'Similarity', 'Model'])
+# Attendance store (rows are committed in batches by a background writer)
+store = open_store()
 
 # Load cooldown tracker (remembers last login times across sessions)
-last_logged_time = {}
-cooldown_file_mode = f"cooldown_{ATTENDANCE_MODE.lower()}.pkl"
+cooldowns = CooldownTracker(ATTENDANCE_MODE, COOLDOWN_MINUTES)
 
-if os.path.exists(cooldown_file_mode):
-    try:
-        with open(cooldown_file_mode, 'rb') as f:
-            last_logged_time = pickle.load(f)
-        print(f"✓ Loaded previous {ATTENDANCE_MODE} session data")
+if cooldowns.restored:
+    print(f"✓ Loaded previous {ATTENDANCE_MODE} session data")
 
-        # Show who is still in cooldown
-        current_time = datetime.now()
-        in_cooldown = []
-        for person_id, last_time in last_logged_time.items():
-            time_since = (current_time - last_time).total_seconds() / 60
-            if time_since < COOLDOWN_MINUTES:
-                person_name = database[person_id]['name'] if person_id in database else person_id
-                remaining = COOLDOWN_MINUTES - time_since
-                in_cooldown.append(f"  - {person_name}: {remaining:.1f} min remaining")
-
-        if in_cooldown:
-            print(f"\n⏱ Students in {ATTENDANCE_MODE} cooldown:")
-            for msg in in_cooldown:
-                print(msg)
-        print()
-    except Exception as e:
-        print(f"⚠ Could not load cooldown data: {e}")
-        last_logged_time = {}
+    # Show who is still in cooldown (expired entries were already dropped)
+    in_cooldown = cooldowns.active(datetime.now())
+    if in_cooldown:
+        print(f"\n⏱ Students in {ATTENDANCE_MODE} cooldown:")
+        for person_id, remaining in in_cooldown:
+            person_name = gallery.names.get(person_id, person_id)
+            print(f"  - {person_name}: {remaining:.1f} min remaining")
+    print()
 
 logged_today = set()
-COOLDOWN_MINUTES = 5  # Cooldown period in minutes
+
+
+def handle_face(match):
+    """
+    Apply the match decision for one recognized track: cooldown check,
+    logging and console output. Returns the drawing operations the render
+    loop applies to the track's box on every frame.
+    """
+    ops = []
+
+    if match is None:
+        # Error in recognition
+        metrics.inc("recognition_errors")
+        ops.append(('rect', (0, 0, 255), 2))
+        ops.append(('text', ("Processing...", 'top', -10, 0.6, (0, 0, 255), 2)))
+        return ops
+
+    best_match_id, best_similarity, second_best_similarity = match
+
+    # Check if match is good enough AND significantly better than second best
+    # This helps distinguish between similar people (siblings, twins)
+    margin = second_best_similarity - best_similarity
+
+    if is_confident(match):
+        # MATCH FOUND with high confidence!
+        person_name = gallery.names[best_match_id]
+
+        # Check cooldown
+        metrics.inc("recognized")
+        current_time = datetime.now()
+        with metrics.time("cooldown"):
+            remaining = cooldowns.remaining(best_match_id, current_time)
+        can_log = remaining == 0
+
+        # Visual feedback - ALWAYS show recognition
+        if can_log:
+            color = mode_color  # Use mode color (green for entry, orange for exit)
+            status = f"READY {mode_emoji}"
+        else:
+            color = (128, 128, 128)  # Gray - cooldown
+            status = "COOLDOWN"
+
+        ops.append(('rect', color, 3))
+
+        label = f"{person_name} [{status}]"
+        ops.append(('text', (label, 'top', -40, 0.8, color, 2)))
+
+        similarity_pct = similarity_percent(best_similarity)
+        ops.append(('text', (f"Match: {similarity_pct:.1f}%", 'top', -10, 0.6, color, 2)))
+
+        # Debug: Show confidence margin
+        ops.append(('text', (f"Confidence: {margin:.3f}", 'bottom', 50, 0.5, (255, 255, 255), 1)))
+
+        # Show cooldown timer if in cooldown
+        if not can_log:
+            ops.append(('text', (f"Next log in: {remaining:.1f} min", 'bottom', 25, 0.6, color, 2)))
+
+        # Log attendance ONLY if cooldown passed
+        if can_log:
+            with metrics.time("log_write"):
+                store.write([attendance_row(best_match_id, person_name, current_time,
+                                            ATTENDANCE_MODE, best_similarity, MODEL_NAME)])
+
+                logged_today.add(best_match_id)
+
+                # Append to the cooldown journal (persistent across sessions)
+                try:
+                    cooldowns.record(best_match_id, current_time)
+                except Exception as e:
+                    print(f"⚠ Warning: Could not save cooldown data: {e}")
+            metrics.inc("logged")
+
+            print(f"✓ {ATTENDANCE_MODE}: {person_name} (Similarity: {similarity_pct:.1f}%, Confidence: {margin:.3f})")
+        else:
+            # Still recognized, just not logged
+            metrics.inc("skipped_cooldown")
+            print(f"↻ Recognized: {person_name} (Cooldown: {remaining:.1f} min remaining, Margin: {margin:.3f})")
+
+    else:
+        # NO MATCH - Unknown person or not confident enough
+        color = (0, 0, 255)  # Red
+        ops.append(('rect', color, 2))
+
+        if best_similarity < SIMILARITY_THRESHOLD:
+            # Close match but not confident (too similar to multiple people)
+            metrics.inc("uncertain")
+            ops.append(('text', ("UNCERTAIN - Too Similar", 'top', -10, 0.6, color, 2)))
+            ops.append(('text', (f"Margin too low: {margin:.3f}", 'bottom', 25, 0.5, color, 1)))
+            print(f"⚠ UNCERTAIN: Best={best_similarity:.3f}, 2nd={second_best_similarity:.3f}, Margin={margin:.3f} (need >{CONFIDENCE_MARGIN})")
+        else:
+            # No good match at all
+            metrics.inc("unknown")
+            ops.append(('text', ("UNKNOWN", 'top', -10, 0.7, color, 2)))
+            similarity_pct = similarity_percent(best_similarity)
+            ops.append(('text', (f"Best match: {similarity_pct:.1f}%", 'bottom', 25, 0.5, color, 1)))
+
+    return ops
+
+
+# Shown while a new track waits for its first recognition
+RECOGNIZING_OPS = [('rect', (0, 255, 255), 2),
+                   ('text', ("Recognizing...", 'top', -10, 0.6, (0, 255, 255), 2))]
+
+
+def draw_face(display, box, ops):
+    """Draw the operations produced by handle_face() around a track's box"""
+    x, y, w, h = box
+    for kind, args in ops:
+        if kind == 'rect':
+            color, thickness = args
+            cv2.rectangle(display, (x, y), (x+w, y+h), color, thickness)
+        else:
+            text, anchor, dy, scale, color, thickness = args
+            org = (x, y + dy) if anchor == 'top' else (x, y + h + dy)
+            cv2.putText(display, text, org, cv2.FONT_HERSHEY_SIMPLEX, scale, color, thickness)
+
 
 # Open camera
 cam = cv2.VideoCapture(0)
-face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+detect_faces = create_face_detector()  # Runs on the pipeline's detection thread
 
-frame_skip = 0  # Process every 10th frame (deep learning is slow)
 
-while True:
-    ret, frame = cam.read()
-    if not ret:
-        break
+# Capture thread keeps only the newest frame; detection and embedding run
+# on worker threads so the preview never freezes during inference
+grabber = FrameGrabber(cam)
+pipeline = RecognitionPipeline(
+    detect_faces, embedder.embed_faces, matcher.match,
+    confirm_fn=is_confident
+)
+grabber.start()
+pipeline.start()
+
+track_ops = {}  # track_id -> drawing operations from its latest recognition
+frame_id = 0
+show_overlay = METRICS_OVERLAY
 
-    frame_skip += 1
+while True:
+    frame_id, frame = grabber.latest(after_id=frame_id)
+    if frame is None or grabber.failed:
+        if grabber.failed:
+            break
+        continue
+
+    pipeline.submit(frame_id, frame)
+
+    # Apply any finished recognitions (logging happens here, on one thread)
+    for result in pipeline.poll_results():
+        if result.error is not None:
+            print(f"⚠ Recognition error: {result.error}")
+        for track_id, match in result.faces:
+            track_ops[track_id] = handle_face(match)
+
+    render_start = time.perf_counter()
     display = frame.copy()
 
-    # Process every 10 frames (deep learning is computationally expensive)
-    if frame_skip % 10 == 0:
-        # Detect faces
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        faces = face_cascade.detectMultiScale(gray, 1.2, 5, minSize=(100, 100))
-
-        for (x, y, w, h) in faces:
-            # Extract face with padding reduction to minimize background
-            # Add small margin but crop tighter to avoid background
-            margin = 10  # Small margin (was implicitly larger before)
-
-            # Calculate crop coordinates with margin
-            x1 = max(0, x - margin)
-            y1 = max(0, y - margin)
-            x2 = min(frame.shape[1], x + w + margin)
-            y2 = min(frame.shape[0], y + h + margin)
-
-            # Extract face region
-            face_img = frame[y1:y2, x1:x2]
-
-            # Resize to standard size to reduce background influence
-            face_img = cv2.resize(face_img, (224, 224))  # Standard size
-
-            # Save to temp file for DeepFace
-            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.jpg')
-            cv2.imwrite(temp_file.name, face_img)
-
-            try:
-                # Generate embedding using DeepFace
-                test_embedding = DeepFace.represent(
-                    img_path=temp_file.name,
-                    model_name="VGG-Face",
-                    enforce_detection=False
-                )[0]["embedding"]
-
-                # Find best match
-                best_match_id = None
-                best_similarity = float('inf')
-                second_best_similarity = float('inf')
-
-                for person_id, person_data in database.items():
-                    # Calculate cosine distance
-                    stored_embedding = person_data['embedding']
-
-                    # Cosine distance
-                    distance = np.linalg.norm(np.array(test_embedding) - np.array(stored_embedding))
-
-                    if distance < best_similarity:
-                        second_best_similarity = best_similarity
-                        best_similarity = distance
-                        best_match_id = person_id
-                    elif distance < second_best_similarity:
-                        second_best_similarity = distance
-
-                # Check if match is good enough AND significantly better than second best
-                # This helps distinguish between similar people (siblings, twins)
-                margin = second_best_similarity - best_similarity
-
-                if best_similarity < SIMILARITY_THRESHOLD and margin > CONFIDENCE_MARGIN:
-                    # MATCH FOUND with high confidence!
-                    person_name = database[best_match_id]['name']
-
-                    # Check cooldown
-                    current_time = datetime.now()
-                    can_log = True
-                    remaining = 0
-
-                    if best_match_id in last_logged_time:
-                        time_since_last = (current_time - last_logged_time[best_match_id]).total_seconds() / 60
-                        if time_since_last < COOLDOWN_MINUTES:
-                            can_log = False
-                            remaining = COOLDOWN_MINUTES - time_since_last
-
-                    # Visual feedback - ALWAYS show recognition
-                    if can_log:
-                        color = mode_color  # Use mode color (green for entry, orange for exit)
-                        status = f"READY {mode_emoji}"
-                    else:
-                        color = (128, 128, 128)  # Gray - cooldown
-                        status = "COOLDOWN"
-
-                    cv2.rectangle(display, (x, y), (x+w, y+h), color, 3)
-
-                    label = f"{person_name} [{status}]"
-                    cv2.putText(display, label, (x, y-40),
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.8, color, 2)
-
-                    similarity_pct = (1 - best_similarity) * 100
-                    cv2.putText(display, f"Match: {similarity_pct:.1f}%", (x, y-10),
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
-
-                    # Debug: Show confidence margin
-                    cv2.putText(display, f"Confidence: {margin:.3f}", (x, y+h+50),
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-
-                    # Show cooldown timer if in cooldown
-                    if not can_log:
-                        cv2.putText(display, f"Next log in: {remaining:.1f} min",
-                                   (x, y+h+25),
-                                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
-
-                    # Log attendance ONLY if cooldown passed
-                    if can_log:
-                        with open(ATTENDANCE_FILE, 'a', newline='') as f:
-                            writer = csv.writer(f)
-                            writer.writerow([
-                                best_match_id,
-                                person_name,
-                                current_time.strftime("%Y-%m-%d"),
-                                current_time.strftime("%H:%M:%S"),
-                                ATTENDANCE_MODE,  # ENTRY or EXIT
-                                f"{similarity_pct:.2f}%",
-                                "VGG-Face"
-                            ])
-
-                        logged_today.add(best_match_id)
-                        last_logged_time[best_match_id] = current_time
-
-                        # Save cooldown tracker to file (persistent across sessions)
-                        try:
-                            with open(cooldown_file_mode, 'wb') as f:
-                                pickle.dump(last_logged_time, f)
-                        except Exception as e:
-                            print(f"⚠ Warning: Could not save cooldown data: {e}")
-
-                        print(f"✓ {ATTENDANCE_MODE}: {person_name} (Similarity: {similarity_pct:.1f}%, Confidence: {margin:.3f})")
-                    else:
-                        # Still recognized, just not logged
-                        print(f"↻ Recognized: {person_name} (Cooldown: {remaining:.1f} min remaining, Margin: {margin:.3f})")
-
-                else:
-                    # NO MATCH - Unknown person or not confident enough
-                    color = (0, 0, 255)  # Red
-                    cv2.rectangle(display, (x, y), (x+w, y+h), color, 2)
-
-                    if best_similarity < SIMILARITY_THRESHOLD:
-                        # Close match but not confident (too similar to multiple people)
-                        cv2.putText(display, "UNCERTAIN - Too Similar", (x, y-10),
-                                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
-                        cv2.putText(display, f"Margin too low: {margin:.3f}", (x, y+h+25),
-                                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
-                        print(f"⚠ UNCERTAIN: Best={best_similarity:.3f}, 2nd={second_best_similarity:.3f}, Margin={margin:.3f} (need >{CONFIDENCE_MARGIN})")
-                    else:
-                        # No good match at all
-                        cv2.putText(display, "UNKNOWN", (x, y-10),
-                                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
-                        similarity_pct = (1 - best_similarity) * 100
-                        cv2.putText(display, f"Best match: {similarity_pct:.1f}%",
-                                   (x, y+h+25),
-                                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
-
-            except Exception as e:
-                # Error in recognition
-                cv2.rectangle(display, (x, y), (x+w, y+h), (0, 0, 255), 2)
-                cv2.putText(display, "Processing...", (x, y-10),
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
-
-            finally:
-                # Clean up temp file
-                try:
-                    os.unlink(temp_file.name)
-                except:
-                    pass
+    # Every tracked face gets a box on every frame, labelled with its identity
+    tracks = pipeline.tracks()
+    for track_id, box in tracks:
+        draw_face(display, box, track_ops.get(track_id, RECOGNIZING_OPS))
+    live_ids = {track_id for track_id, _ in tracks}
+    track_ops = {track_id: ops for track_id, ops in track_ops.items() if track_id in live_ids}
 
     # Draw UI
     cv2.putText(display, f"{ATTENDANCE_MODE} Mode - Logged: {len(logged_today)}", (10, 30),
                cv2.FONT_HERSHEY_SIMPLEX, 0.8, mode_color, 2)
-    cv2.putText(display, "University Attendance System (VGG-Face)", (10, 60),
+    cv2.putText(display, f"University Attendance System ({MODEL_NAME})", (10, 60),
                cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
 
+    stats = pipeline.stats()
+    metrics.set_gauge("embed_queue", stats['embed_queue'])
+    metrics.set_gauge("tracks", stats['tracks'])
+    metrics.set_gauge("frames_dropped", stats['frames_dropped'] + grabber.dropped)
+    metrics.set_gauge("jobs_dropped", stats['embed_dropped'])
+    if show_overlay:
+        draw_overlay(display)
+    cv2.putText(display, pipeline.scheduler.describe(),
+               (10, display.shape[0] - 40), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+    cv2.putText(display, f"Tracks: {stats['tracks']}  Embedded: {stats['faces_embedded']}  "
+                         f"Queue: {stats['embed_queue']}  Dropped: {stats['embed_dropped']} jobs, "
+                         f"{stats['frames_dropped'] + grabber.dropped} frames",
+               (10, display.shape[0] - 15), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+
     cv2.imshow(f"University Attendance - {ATTENDANCE_MODE} Mode - ESC to exit", display)
+    metrics.observe("render", time.perf_counter() - render_start)
 
-    if cv2.waitKey(1) & 0xFF == 27:
+    key = cv2.waitKey(1) & 0xFF
+    if key == 27:
         break
-
+    if key in (ord('m'), ord('M')):
+        show_overlay = not show_overlay
+
+if grabber.failed:
+    print("⚠ Camera stream ended - finishing queued faces")
+    for result in pipeline.drain():
+        if result.error is not None:
+            print(f"⚠ Recognition error: {result.error}")
+        for _, match in result.faces:
+            handle_face(match)
+
+grabber.stop()
+pipeline.stop()
 cam.release()
 cv2.destroyAllWindows()
+store.close()
+cooldowns.close()
 
+stats = pipeline.stats()
 print(f"\n✓ {ATTENDANCE_MODE} session ended")
 print(f"  Total logged: {len(logged_today)}")
-print(f"  Attendance file: {ATTENDANCE_FILE}")
\ No newline at end of file
+print(f"  Attendance store: {store.location}")
+print(f"  Faces embedded: {stats['faces_embedded']}")
+print(f"  Scheduler: {pipeline.scheduler.describe()}")
+print(f"  Dropped frames: {stats['frames_dropped'] + grabber.dropped} | Dropped jobs: {stats['embed_dropped']}")
@@ -0,0 +1,282 @@
+"""
+HEADLESS BATCH RECOGNITION
+Runs attendance recognition over recorded video files and folders of images,
+spread across CPU cores (one model per worker process).
+
+    python ultra_batch.py recordings/gate_0800.mp4 photos/ --mode ENTRY
+    python ultra_batch.py recordings/ --mode EXIT --workers 4 --sample-fps 5
+
+Rows are written to the same attendance store as live mode, with the same
+thresholds and cooldown (applied in recording time). Each worker records
+the attendance stage metrics (ultra_metrics.py); they are merged and
+summarised per stage at the end.
+"""
+
+import argparse
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import cv2
+
+from ultra_embedder import crop_face, embed_faces, get_model, check_gallery_model, MODEL_NAME
+from ultra_gallery import load_gallery, gallery_exists
+from ultra_metrics import metrics
+from ultra_recognition import (build_matcher, create_face_detector, is_confident, attendance_row,
+                               COOLDOWN_MINUTES)
+from ultra_store import open_store, CsvSink
+from ultra_tracker import FaceTracker
+
+# Settings
+BATCH_WORKERS = None       # Worker processes (None = one per CPU core)
+SAMPLE_FPS = 5.0           # Video frames analysed per second of footage
+CHUNK_SECONDS = 60         # Footage per work unit (files are split into frame ranges)
+IMAGES_PER_CHUNK = 32      # Images per work unit
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.m4v', '.webm')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+_worker = {}  # Per-process state, filled by init_worker()
+
+
+def init_worker(model_name, threads):
+    """Load gallery, detector and model once per worker process"""
+    cv2.setNumThreads(1)
+
+    _worker['matcher'] = build_matcher(load_gallery())
+    _worker['detect'] = create_face_detector()
+    _worker['model_name'] = model_name
+    get_model(model_name, intra_threads=threads, inter_threads=1)  # Cores are split between workers
+
+
+def recognize(frame, boxes):
+    """Embed and match the given faces of one frame"""
+    with metrics.time("crop"):
+        crops = [crop_face(frame, box) for box in boxes]
+    with metrics.time("embed"):
+        embeddings = embed_faces(crops, _worker['model_name'])
+    with metrics.time("match"):
+        matches = _worker['matcher'].match(embeddings)
+    for match in matches:
+        metrics.inc("recognized" if is_confident(match) else "unrecognized")
+    return matches
+
+
+def detect(frame):
+    with metrics.time("detect"):
+        boxes = [tuple(int(v) for v in box) for box in _worker['detect'](frame)]
+    metrics.inc("faces_detected", len(boxes))
+    return boxes
+
+
+def process_video_chunk(path, start_frame, stop_frame, fps, base_time, sample_fps=SAMPLE_FPS):
+    """
+    Recognize faces in frames [start_frame, stop_frame) of a video.
+    Faces are tracked across sampled frames so each person is embedded
+    once per appearance rather than on every frame.
+    """
+    started = time.perf_counter()
+    cam = cv2.VideoCapture(path)
+    cam.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+    step = max(1, round(fps / sample_fps))
+    tracker = FaceTracker()
+    hits = []
+    frames = faces = embedded = 0
+
+    for frame_index in range(start_frame, stop_frame):
+        if (frame_index - start_frame) % step:
+            if not cam.grab():  # Skipped frames are not decoded
+                break
+            continue
+        with metrics.time("camera_read"):
+            ok, frame = cam.read()
+        if not ok:
+            break
+        frames += 1
+        offset = frame_index / fps
+
+        boxes = detect(frame)
+        faces += len(boxes)
+        need_embedding = tracker.update(boxes, offset)
+        if not need_embedding:
+            continue
+
+        matches = recognize(frame, [track.box for track in need_embedding])
+        embedded += len(matches)
+        for track, match in zip(need_embedding, matches):
+            confirmed = is_confident(match)
+            tracker.assign(track.track_id, match, offset, confirmed)
+            if confirmed:
+                hits.append((base_time + offset, match[0], match[1]))
+
+    cam.release()
+    return {'pid': os.getpid(), 'source': path, 'hits': hits, 'frames': frames, 'faces': faces,
+            'embedded': embedded, 'seconds': time.perf_counter() - started, 'metrics': metrics.export(reset=True)}
+
+
+def process_images(paths):
+    """Recognize every face in a list of still images (timestamped by file mtime)"""
+    started = time.perf_counter()
+    hits = []
+    frames = faces = 0
+
+    for path in paths:
+        frame = cv2.imread(path)
+        if frame is None:
+            continue
+        frames += 1
+        boxes = detect(frame)
+        faces += len(boxes)
+        if not boxes:
+            continue
+        for match in recognize(frame, boxes):
+            if is_confident(match):
+                hits.append((os.path.getmtime(path), match[0], match[1]))
+
+    return {'pid': os.getpid(), 'source': os.path.dirname(paths[0]), 'hits': hits, 'frames': frames,
+            'faces': faces, 'embedded': faces, 'seconds': time.perf_counter() - started,
+            'metrics': metrics.export(reset=True)}
+
+
+def video_units(path, start_time=None, sample_fps=SAMPLE_FPS):
+    """Split one video into frame-range work units"""
+    cam = cv2.VideoCapture(path)
+    if not cam.isOpened():
+        raise ValueError(f"Cannot open video {path}")
+    fps = cam.get(cv2.CAP_PROP_FPS) or 25.0
+    frame_count = int(cam.get(cv2.CAP_PROP_FRAME_COUNT))
+    cam.release()
+
+    # Without an explicit start, the recording is assumed to end at the file's mtime
+    base_time = start_time if start_time is not None else os.path.getmtime(path) - frame_count / fps
+    chunk = max(1, int(CHUNK_SECONDS * fps))
+    return [(process_video_chunk, (path, start, min(start + chunk, frame_count), fps, base_time, sample_fps))
+            for start in range(0, frame_count, chunk)]
+
+
+def collect_units(inputs, start_time=None, sample_fps=SAMPLE_FPS):
+    """Work units for every video file and image found in the inputs"""
+    units, images = [], []
+    for source in inputs:
+        if os.path.isdir(source):
+            paths = sorted(os.path.join(root, name) for root, _, names in os.walk(source) for name in names)
+        else:
+            paths = [source]
+        for path in paths:
+            extension = os.path.splitext(path)[1].lower()
+            if extension in VIDEO_EXTENSIONS:
+                units.extend(video_units(path, start_time, sample_fps))
+            elif extension in IMAGE_EXTENSIONS:
+                images.append(path)
+
+    for start in range(0, len(images), IMAGES_PER_CHUNK):
+        units.append((process_images, (images[start:start + IMAGES_PER_CHUNK],)))
+    return units
+
+
+def attendance_rows(hits, names, mode, cooldown_minutes=COOLDOWN_MINUTES):
+    """Sightings (timestamp, id, distance) -> CSV rows, one per person per cooldown window"""
+    rows = []
+    last_logged = {}
+    for timestamp, person_id, distance in sorted(hits):
+        if person_id in last_logged and (timestamp - last_logged[person_id]) / 60 < cooldown_minutes:
+            continue
+        last_logged[person_id] = timestamp
+        rows.append(attendance_row(person_id, names[person_id], datetime.fromtimestamp(timestamp),
+                                   mode, distance, MODEL_NAME))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="+", help="video files, image files or folders")
+    parser.add_argument("--mode", choices=["ENTRY", "EXIT"], default="ENTRY")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS)
+    parser.add_argument("--sample-fps", type=float, default=SAMPLE_FPS, help="video frames analysed per second")
+    parser.add_argument("--start", help="recording start 'YYYY-MM-DD HH:MM:SS' (default: file mtime - duration)")
+    parser.add_argument("--output", help="write rows to this CSV file instead of the attendance store")
+    args = parser.parse_args()
+
+    print("="*70)
+    print(f"HEADLESS BATCH RECOGNITION - {args.mode}")
+    print("="*70)
+
+    if not gallery_exists():
+        print("✗ Database not found! Run: python ultra_train.py")
+        return
+    gallery = load_gallery()
+    if len(gallery) == 0:
+        print("✗ Database is empty!")
+        return
+    try:
+        check_gallery_model(gallery.header)
+    except ValueError as e:
+        print(f"✗ {e}")
+        return
+
+    start_time = datetime.strptime(args.start, "%Y-%m-%d %H:%M:%S").timestamp() if args.start else None
+    units = collect_units(args.inputs, start_time, args.sample_fps)
+    if not units:
+        print("✗ No videos or images found.")
+        return
+
+    workers = args.workers or os.cpu_count() or 1
+    workers = min(workers, len(units))
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    print(f"Work units: {len(units)} | Workers: {workers} ({threads} thread(s) each)")
+
+    started = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(MODEL_NAME, threads)) as pool:
+        futures = {pool.submit(function, *unit_args): unit_args[0] for function, unit_args in units}
+        for done, future in enumerate(as_completed(futures), 1):
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"  ✗ {futures[future]}: {e}")
+                continue
+            results.append(result)
+            metrics.merge(result['metrics'])
+            print(f"  [{done}/{len(units)}] {result['source']}: {result['frames']} frames, "
+                  f"{result['faces']} faces, {len(result['hits'])} recognitions")
+    elapsed = time.perf_counter() - started
+
+    hits = [hit for result in results for hit in result['hits']]
+    rows = attendance_rows(hits, gallery.names, args.mode)
+    store = CsvSink(args.output) if args.output else open_store()
+    with metrics.time("log_write"):
+        store.write(rows)
+        store.close()
+    metrics.inc("logged", len(rows))
+
+    # Throughput per worker process
+    per_worker = defaultdict(lambda: {'frames': 0, 'faces': 0, 'seconds': 0.0})
+    for result in results:
+        totals = per_worker[result['pid']]
+        for key in totals:
+            totals[key] += result[key]
+
+    print(f"\n✓ Batch complete in {elapsed:.1f} s")
+    for number, (pid, totals) in enumerate(sorted(per_worker.items()), 1):
+        seconds = max(totals['seconds'], 1e-9)
+        print(f"  Worker {number} (pid {pid}): {totals['frames'] / seconds:.1f} frames/s, "
+              f"{totals['faces'] / seconds:.1f} faces/s")
+    frames = sum(result['frames'] for result in results)
+    faces = sum(result['faces'] for result in results)
+    print(f"  Total: {frames} frames, {faces} faces ({frames / elapsed:.1f} frames/s overall)")
+    print(f"  Logged {len(rows)} {args.mode} row(s) to {store.location}")
+
+    stages = metrics.totals()
+    if stages:
+        print(f"\n  {'stage':<12}{'calls':>8}{'mean':>9}{'p50':>9}{'p95':>9}  (ms, all workers)")
+        for stage, stats in stages.items():
+            print(f"  {stage:<12}{stats['count']:>8}{stats['mean_ms']:>9.2f}{stats['p50_ms']:>9.2f}"
+                  f"{stats['p95_ms']:>9.2f}")
+        counters = metrics.export()['counters']
+        print("  " + "  ".join(f"{name}: {value}" for name, value in sorted(counters.items())))
+
+
+if __name__ == "__main__":
+    main()
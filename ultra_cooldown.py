@@ -0,0 +1,139 @@
+"""
+COOLDOWN JOURNAL
+Remembers when each student was last logged, per mode, across sessions.
+
+cooldown_{mode}.log is append-only: one "id<TAB>unix time" line per logged
+event, so a log costs one short write instead of re-pickling every student,
+and a crash can at worst lose the half-written last line (it is ignored on
+replay and cut off before the journal is appended to again). Loading replays
+the journal (latest time per student wins) and keeps only students still in
+cooldown; the journal is compacted to those entries when it grows.
+Expiry uses a min-heap of deadlines, so expired students are dropped
+without scanning the whole map.
+"""
+
+import heapq
+import os
+import pickle
+import time
+
+# Settings
+COMPACT_EVERY = 1000   # Appended records before the journal is rewritten with live entries only
+
+
+def journal_file(mode):
+    return f"cooldown_{mode.lower()}.log"
+
+
+def legacy_file(mode):
+    return f"cooldown_{mode.lower()}.pkl"
+
+
+class CooldownTracker:
+    """Last log time per person for one mode, backed by an append-only journal"""
+
+    def __init__(self, mode, cooldown_minutes, path=None):
+        self.mode = mode
+        self.cooldown_seconds = cooldown_minutes * 60
+        self.path = path or journal_file(mode)
+        self.last_logged = {}   # person_id -> unix time of the last log
+        self._deadlines = []    # Heap of (expires_at, person_id); stale pairs are skipped
+        self._appended = 0
+        self.restored = 0       # Live entries found at startup
+
+        if not os.path.exists(self.path) and os.path.exists(legacy_file(mode)):
+            self._import_legacy(legacy_file(mode))
+        self._replay()
+        self.expire()
+        self.restored = len(self.last_logged)
+        self.compact()
+        self._journal = self._open_journal()
+
+    def _open_journal(self):
+        """Append handle; a torn last line is cut off first so the next record starts a fresh line"""
+        with open(self.path, 'ab+') as f:
+            size = f.seek(0, os.SEEK_END)
+            if size:
+                f.seek(size - 1)
+                if f.read(1) != b'\n':
+                    f.seek(0)
+                    f.truncate(f.read().rfind(b'\n') + 1)
+        return open(self.path, 'a', encoding='utf-8')
+
+    def _import_legacy(self, pickle_path):
+        """One-time import of the old {id: datetime} pickle"""
+        try:
+            with open(pickle_path, 'rb') as f:
+                legacy = pickle.load(f)  # Trusted local file, read once
+        except Exception as e:
+            print(f"⚠ Could not import {pickle_path}: {e}")
+            return
+        for person_id, logged_at in legacy.items():
+            self._remember(person_id, logged_at.timestamp())
+
+    def _replay(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding='utf-8', errors='replace') as f:
+            for line in f:
+                if not line.endswith('\n'):
+                    continue  # Torn write from a crash (a cut-off time may still parse)
+                person_id, _, logged_at = line.rstrip('\n').rpartition('\t')
+                try:
+                    self._remember(person_id, float(logged_at))
+                except ValueError:
+                    continue  # Torn write from a crash
+
+    def _remember(self, person_id, logged_at):
+        if logged_at >= self.last_logged.get(person_id, float('-inf')):
+            self.last_logged[person_id] = logged_at
+            heapq.heappush(self._deadlines, (logged_at + self.cooldown_seconds, person_id))
+
+    def expire(self, now=None):
+        """Forget students whose cooldown is over (pops only expired heap entries)"""
+        if now is None:
+            now = time.time()
+        while self._deadlines and self._deadlines[0][0] <= now:
+            expires_at, person_id = heapq.heappop(self._deadlines)
+            logged_at = self.last_logged.get(person_id)
+            if logged_at is not None and logged_at + self.cooldown_seconds <= now:
+                del self.last_logged[person_id]
+
+    def remaining(self, person_id, now, cooldown_minutes=None):
+        """Minutes until person_id may be logged again (0 = can log now)"""
+        logged_at = self.last_logged.get(person_id)
+        if logged_at is None:
+            return 0
+        cooldown_seconds = self.cooldown_seconds if cooldown_minutes is None else cooldown_minutes * 60
+        return max(0, (logged_at + cooldown_seconds - now.timestamp()) / 60)
+
+    def record(self, person_id, now):
+        """Remember a log event: one appended journal line"""
+        logged_at = now.timestamp()
+        self._remember(person_id, logged_at)
+        self._journal.write(f"{person_id}\t{logged_at:.3f}\n")
+        self._journal.flush()
+        self._appended += 1
+        if self._appended >= COMPACT_EVERY:
+            self.expire(logged_at)
+            self._journal.close()
+            self.compact()
+            self._journal = self._open_journal()
+
+    def active(self, now):
+        """(person_id, remaining minutes) for everyone still in cooldown"""
+        self.expire(now.timestamp())
+        return [(person_id, self.remaining(person_id, now)) for person_id in self.last_logged]
+
+    def compact(self):
+        """Rewrite the journal with only the live entries (atomic replace)"""
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for person_id, logged_at in self.last_logged.items():
+                f.write(f"{person_id}\t{logged_at:.3f}\n")
+        os.replace(tmp_path, self.path)
+        self._appended = 0
+
+    def close(self):
+        self._journal.close()
+        self.compact()
@@ -0,0 +1,156 @@
+"""
+FACE DETECTOR
+Pluggable CPU face detection behind detect(frame) -> [(x, y, w, h), ...]:
+  haar - OpenCV Haar cascade (default, no extra files)
+  dnn  - OpenCV DNN face detector (ResNet-10 SSD, 300x300), more robust to
+         angles and lighting; needs two model files (python ultra_detector.py download)
+
+Detection runs on a downscaled copy of the region of interest (the doorway)
+and the boxes are mapped back to full-resolution frame coordinates, so the
+face crops keep every pixel.
+"""
+
+import os
+import sys
+import urllib.request
+
+import cv2
+
+# Settings
+DETECTOR_BACKEND = "haar"   # "haar" or "dnn"
+DETECT_WIDTH = 640          # Detect on frames at most this wide (0 = full resolution)
+DETECT_ROI = None           # Doorway as fractions of the frame (x, y, w, h), e.g. (0.25, 0.0, 0.5, 1.0)
+MIN_FACE_SIZE = 100         # Smallest face in full-resolution pixels
+HAAR_SCALE_FACTOR = 1.2
+HAAR_MIN_NEIGHBORS = 5
+DNN_CONFIDENCE = 0.6        # Minimum detection score for the DNN backend
+DNN_MODEL_DIR = "models"
+DNN_CONFIG = "deploy.prototxt"
+DNN_WEIGHTS = "res10_300x300_ssd_iter_140000.caffemodel"
+DNN_URLS = {
+    DNN_CONFIG: "https://raw.githubusercontent.com/opencv/opencv/4.8.0/samples/dnn/face_detector/deploy.prototxt",
+    DNN_WEIGHTS: "https://raw.githubusercontent.com/opencv/opencv_3rdparty/"
+                 "dnn_samples_face_detector_20170830/res10_300x300_ssd_iter_140000.caffemodel",
+}
+
+
+class HaarBackend:
+    """Haar cascade on the grayscale image"""
+
+    kind = "haar"
+
+    def __init__(self, scale_factor=HAAR_SCALE_FACTOR, min_neighbors=HAAR_MIN_NEIGHBORS):
+        self.cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+
+    def detect(self, image, min_size):
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        size = max(1, int(min_size))
+        return [tuple(box) for box in self.cascade.detectMultiScale(gray, self.scale_factor, self.min_neighbors,
+                                                                    minSize=(size, size))]
+
+
+class DnnBackend:
+    """OpenCV DNN face detector (ResNet-10 SSD); the network always sees 300x300"""
+
+    kind = "dnn"
+
+    def __init__(self, model_dir=DNN_MODEL_DIR, confidence=DNN_CONFIDENCE):
+        config, weights = os.path.join(model_dir, DNN_CONFIG), os.path.join(model_dir, DNN_WEIGHTS)
+        missing = [path for path in (config, weights) if not os.path.exists(path)]
+        if missing:
+            raise FileNotFoundError(f"DNN face detector files missing: {', '.join(missing)} "
+                                    f"(run: python ultra_detector.py download)")
+        self.net = cv2.dnn.readNet(weights, config)
+        self.confidence = confidence
+
+    def detect(self, image, min_size):
+        height, width = image.shape[:2]
+        blob = cv2.dnn.blobFromImage(image, 1.0, (300, 300), (104.0, 177.0, 123.0))
+        self.net.setInput(blob)
+        detections = self.net.forward()  # (1, 1, N, 7): _, _, score, x1, y1, x2, y2 (relative)
+
+        boxes = []
+        for _, _, score, x1, y1, x2, y2 in detections[0, 0]:
+            if score < self.confidence:
+                continue
+            x1, y1 = max(0, int(x1 * width)), max(0, int(y1 * height))
+            x2, y2 = min(width, int(x2 * width)), min(height, int(y2 * height))
+            if x2 - x1 >= min_size and y2 - y1 >= min_size:
+                boxes.append((x1, y1, x2 - x1, y2 - y1))
+        return boxes
+
+
+BACKENDS = {"haar": HaarBackend, "dnn": DnnBackend}
+
+
+class FaceDetector:
+    """
+    detect(frame) -> list of (x, y, w, h) in full-resolution frame pixels.
+    Only the region of interest is searched, at no more than detect_width
+    pixels wide.
+    """
+
+    def __init__(self, backend, detect_width=DETECT_WIDTH, roi=DETECT_ROI, min_face_size=MIN_FACE_SIZE):
+        self.backend = backend
+        self.detect_width = detect_width
+        self.roi = roi
+        self.min_face_size = min_face_size
+
+    @property
+    def kind(self):
+        return self.backend.kind
+
+    def roi_box(self, frame):
+        """Region of interest in pixels (x, y, w, h): the whole frame without an ROI"""
+        height, width = frame.shape[:2]
+        if self.roi is None:
+            return 0, 0, width, height
+        fx, fy, fw, fh = self.roi
+        x, y = int(fx * width), int(fy * height)
+        return x, y, max(1, min(width - x, int(fw * width))), max(1, min(height - y, int(fh * height)))
+
+    def __call__(self, frame):
+        x0, y0, roi_w, roi_h = self.roi_box(frame)
+        region = frame[y0:y0 + roi_h, x0:x0 + roi_w]
+
+        scale = 1.0
+        if self.detect_width and roi_w > self.detect_width:
+            scale = self.detect_width / roi_w
+            region = cv2.resize(region, (self.detect_width, max(1, round(roi_h * scale))),
+                                interpolation=cv2.INTER_AREA)
+
+        boxes = []
+        for x, y, w, h in self.backend.detect(region, self.min_face_size * scale):
+            boxes.append((x0 + int(x / scale), y0 + int(y / scale), int(w / scale), int(h / scale)))
+        return boxes
+
+
+def create_detector(backend=DETECTOR_BACKEND, detect_width=DETECT_WIDTH, roi=DETECT_ROI,
+                    min_face_size=MIN_FACE_SIZE):
+    """Configured face detector: detect(frame) -> list of (x, y, w, h)"""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown detector backend: {backend} (choose from {', '.join(BACKENDS)})")
+    return FaceDetector(BACKENDS[backend](), detect_width, roi, min_face_size)
+
+
+def download_dnn_model(model_dir=DNN_MODEL_DIR):
+    """Fetch the DNN face detector files into model_dir"""
+    os.makedirs(model_dir, exist_ok=True)
+    for filename, url in DNN_URLS.items():
+        path = os.path.join(model_dir, filename)
+        if os.path.exists(path):
+            print(f"✓ {path} already present")
+            continue
+        print(f"⏳ Downloading {filename}...")
+        urllib.request.urlretrieve(url, path + ".tmp")
+        os.replace(path + ".tmp", path)
+        print(f"✓ Saved {path}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "download":
+        download_dnn_model()
+    else:
+        print(__doc__)
@@ -0,0 +1,205 @@
+"""
+FACE EMBEDDER
+Turns in-memory face crops into deep learning embeddings
+(no temp JPEG files, no second detection pass, batched inference)
+
+Pluggable inference backends behind embed(batch) -> (N, dim):
+  deepface - DeepFace model on TensorFlow (default)
+  onnx     - ONNX Runtime on the CPU with a local model file, no TensorFlow
+             import (export once: python ultra_embedder.py export-onnx)
+
+The gallery records the backend and model it was built with; matching
+queries from a different backend or model is refused.
+"""
+
+import os
+import sys
+
+import cv2
+import numpy as np
+
+# Settings
+EMBED_BACKEND = "deepface"  # "deepface" or "onnx"
+MODEL_NAME = "VGG-Face"
+ONNX_MODEL_DIR = "models"   # ONNX backend: {ONNX_MODEL_DIR}/{MODEL_NAME}.onnx
+INTRA_OP_THREADS = 0        # Threads inside one operation (0 = library default)
+INTER_OP_THREADS = 0        # Operations run in parallel (0 = library default)
+PREPROCESS_VERSION = 1  # Bump when preprocess() changes (invalidates cached embeddings)
+FACE_SIZE = (224, 224)
+CROP_MARGIN = 10  # Small margin to avoid cutting the face, but minimize background
+MAX_BATCH_SIZE = 16  # Faces per model forward pass
+USE_EMBED_SERVER = True  # Use a running ultra_server.py when there is one (warm model)
+
+_models = {}
+
+
+def crop_face(frame, box, margin=CROP_MARGIN, size=FACE_SIZE):
+    """Cut a detected face (x, y, w, h) out of a BGR frame and resize it"""
+    x, y, w, h = box
+    x1 = max(0, x - margin)
+    y1 = max(0, y - margin)
+    x2 = min(frame.shape[1], x + w + margin)
+    y2 = min(frame.shape[0], y + h + margin)
+
+    return cv2.resize(frame[y1:y2, x1:x2], size)
+
+
+class DeepFaceBackend:
+    """DeepFace model on TensorFlow (heavy import, only when this backend is used)"""
+
+    name = "deepface"
+
+    def __init__(self, model_name=MODEL_NAME, intra_threads=INTRA_OP_THREADS, inter_threads=INTER_OP_THREADS):
+        import tensorflow as tf
+        try:  # Only possible before TensorFlow has run anything in this process
+            tf.config.threading.set_intra_op_parallelism_threads(intra_threads)
+            tf.config.threading.set_inter_op_parallelism_threads(inter_threads)
+        except RuntimeError:
+            pass
+        from deepface import DeepFace
+        self.model = DeepFace.build_model(model_name)
+        self.input_size = tuple(self.model.input_shape[1:3][::-1])  # (width, height)
+        self.dim = self.model.output_shape[-1]
+
+    def embed(self, batch):
+        return np.asarray(self.model(batch, training=False), dtype=np.float32)
+
+
+class OnnxBackend:
+    """ONNX Runtime CPU session over {ONNX_MODEL_DIR}/{model}.onnx (NHWC or NCHW input)"""
+
+    name = "onnx"
+
+    def __init__(self, model_name=MODEL_NAME, intra_threads=INTRA_OP_THREADS, inter_threads=INTER_OP_THREADS,
+                 model_dir=ONNX_MODEL_DIR):
+        import onnxruntime as ort
+        path = onnx_model_path(model_name, model_dir)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"ONNX model missing: {path} (run: python ultra_embedder.py export-onnx)")
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_threads
+        options.inter_op_num_threads = inter_threads
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.channels_first = model_input.shape[1] == 3
+        height, width = model_input.shape[2:4] if self.channels_first else model_input.shape[1:3]
+        self.input_size = (width, height)
+        self.dim = self.session.get_outputs()[0].shape[-1]
+
+    def embed(self, batch):
+        if self.channels_first:
+            batch = np.ascontiguousarray(batch.transpose(0, 3, 1, 2))
+        return np.asarray(self.session.run(None, {self.input_name: batch})[0], dtype=np.float32)
+
+
+BACKENDS = {"deepface": DeepFaceBackend, "onnx": OnnxBackend}
+
+
+def onnx_model_path(model_name=MODEL_NAME, model_dir=ONNX_MODEL_DIR):
+    return os.path.join(model_dir, f"{model_name}.onnx")
+
+
+def get_model(model_name=MODEL_NAME, backend=EMBED_BACKEND, intra_threads=INTRA_OP_THREADS,
+              inter_threads=INTER_OP_THREADS):
+    """Load the model once per process (thread counts apply to the first load)"""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend: {backend} (choose from {', '.join(BACKENDS)})")
+    if (backend, model_name) not in _models:
+        _models[backend, model_name] = BACKENDS[backend](model_name, intra_threads, inter_threads)
+    return _models[backend, model_name]
+
+
+def preprocess(face_imgs, size):
+    """
+    Stack BGR crops into one float32 batch scaled to [0, 1], the scaling of
+    DeepFace's extract_faces() path that older galleries were built with.
+    (DeepFace's own detector_backend="skip" path feeds raw 0-255 pixels.)
+    """
+    width, height = size
+    batch = np.empty((len(face_imgs), height, width, 3), dtype=np.float32)
+    for i, face_img in enumerate(face_imgs):
+        if face_img.shape[:2] != (height, width):
+            face_img = cv2.resize(face_img, (width, height))
+        batch[i] = face_img
+    batch /= 255.0
+    return batch
+
+
+def embed_faces(face_imgs, model_name=MODEL_NAME, max_batch_size=MAX_BATCH_SIZE, backend=EMBED_BACKEND):
+    """
+    Embeddings for a list of cropped BGR faces, one forward pass per
+    batch of up to max_batch_size faces. Returns a float32 array (N, dim).
+    The crops already come from our own detector, so detection and
+    alignment are skipped.
+    """
+    model = get_model(model_name, backend)
+
+    results = []
+    for start in range(0, len(face_imgs), max_batch_size):
+        batch = preprocess(face_imgs[start:start + max_batch_size], model.input_size)
+        results.append(model.embed(batch))
+
+    if not results:
+        return np.empty((0, model.dim), dtype=np.float32)
+    return np.vstack(results)
+
+
+def embed_face(face_img, model_name=MODEL_NAME):
+    """Embedding for one cropped BGR face (numpy array)"""
+    return embed_faces([face_img], model_name)[0]
+
+
+class LocalEmbedder:
+    """The model loaded in this process"""
+
+    def __init__(self, model_name=MODEL_NAME, backend=EMBED_BACKEND):
+        self.model_name = model_name
+        self.backend = backend
+        self.kind = f"in-process, {backend}"
+
+    def embed_faces(self, face_imgs):
+        return embed_faces(face_imgs, self.model_name, backend=self.backend)
+
+
+def get_embedder(model_name=MODEL_NAME, use_server=USE_EMBED_SERVER):
+    """
+    Embedder with an embed_faces(crops) method: the warm model server if one
+    is running for this model, otherwise the model loaded in-process.
+    """
+    if use_server:
+        from ultra_server import RemoteEmbedder
+        remote = RemoteEmbedder(model_name=model_name)
+        if remote.available():
+            return remote
+    return LocalEmbedder(model_name)
+
+
+def check_gallery_model(header, model_name=MODEL_NAME, backend=EMBED_BACKEND):
+    """Refuse a gallery built by another backend/model: its distances would be meaningless"""
+    built_with = (header.get('backend', "deepface"), header['model'])  # Older galleries: DeepFace
+    if built_with != (backend, model_name):
+        raise ValueError(f"Gallery was built with {built_with[1]} ({built_with[0]}), but queries use "
+                         f"{model_name} ({backend}) - run: python ultra_reembed.py")
+
+
+def export_onnx(model_name=MODEL_NAME, model_dir=ONNX_MODEL_DIR):
+    """Convert the DeepFace Keras model to {model_dir}/{model_name}.onnx (needs tf2onnx)"""
+    import tensorflow as tf
+    import tf2onnx
+    model = DeepFaceBackend(model_name).model
+    os.makedirs(model_dir, exist_ok=True)
+    path = onnx_model_path(model_name, model_dir)
+    signature = [tf.TensorSpec((None,) + tuple(model.input_shape[1:]), tf.float32, name="input")]
+    print(f"⏳ Exporting {model_name} to {path}...")
+    tf2onnx.convert.from_keras(model, input_signature=signature, opset=13, output_path=path + ".tmp")
+    os.replace(path + ".tmp", path)
+    print(f"✓ Saved {path} - set EMBED_BACKEND = \"onnx\" in ultra_embedder.py, then run: python ultra_reembed.py")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "export-onnx":
+        export_onnx(sys.argv[2] if len(sys.argv) > 2 else MODEL_NAME)
+    else:
+        print(__doc__)
@@ -0,0 +1,261 @@
+"""
+BULK ENROLLMENT
+Registers many students at once from existing photos (e.g. ID-card
+pictures) instead of the webcam, spread across CPU cores.
+
+    python ultra_enroll.py photos/               # photos/{id}_{name}/*.jpg or photos/{id}_{name}.jpg
+    python ultra_enroll.py roster.csv            # rows: id,name,image[;image...]
+    python ultra_enroll.py photos/ --workers 4
+
+Each student gets the same face_database/{id}_{name}/ folder as
+ultra_register.py (face crops + embeddings.pkl). embeddings.pkl is written
+last, so an interrupted run simply continues where it stopped: students
+that already have one are skipped (--force re-enrolls them).
+Then run: python ultra_train.py
+"""
+
+import argparse
+import csv
+import glob
+import os
+import pickle
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+import numpy as np
+
+from ultra_embedder import crop_face, embed_faces, get_model, MODEL_NAME, EMBED_BACKEND, PREPROCESS_VERSION
+from ultra_recognition import create_face_detector
+
+# Settings
+DATABASE_PATH = "face_database"
+ENROLL_WORKERS = None            # Worker processes (None = one per CPU core)
+MIN_FACE_SIZE = 60               # ID-card photos are small; live detection uses 100 px
+FAILURES_FILE = "enroll_failures.csv"
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+_worker = {}  # Per-process state, filled by init_worker()
+
+
+def init_worker(model_name, threads):
+    """Load detector and model once per worker process"""
+    cv2.setNumThreads(1)
+
+    _worker['detect'] = create_face_detector(roi=None, min_face_size=MIN_FACE_SIZE)
+    _worker['model_name'] = model_name
+    get_model(model_name, intra_threads=threads, inter_threads=1)  # Cores are split between workers
+
+
+def largest_face(image):
+    """Biggest detected face (x, y, w, h) in a photo, or None"""
+    faces = _worker['detect'](image)
+    if not faces:
+        return None
+    return max(faces, key=lambda box: box[2] * box[3])
+
+
+def enroll_student(person_id, name, image_paths, database_path=DATABASE_PATH):
+    """
+    Crop, embed and save one student (runs in a worker process).
+    Returns counts, per-image failures and the time spent.
+    """
+    started = time.perf_counter()
+    crops, failures = [], []
+    for path in image_paths:
+        image = cv2.imread(path)
+        if image is None:
+            failures.append((path, "unreadable image"))
+            continue
+        box = largest_face(image)
+        if box is None:
+            failures.append((path, "no face found"))
+            continue
+        crops.append(crop_face(image, box))
+
+    result = {'pid': os.getpid(), 'id': person_id, 'name': name, 'images': len(image_paths),
+              'samples': 0, 'failures': failures, 'error': None}
+    if not crops:
+        result['error'] = "no usable photo"
+    else:
+        try:
+            embeddings = embed_faces(crops, _worker['model_name'])
+            if not np.all(np.isfinite(embeddings)):
+                raise ValueError("non-finite embedding")
+
+            person_folder = os.path.join(database_path, f"{person_id}_{name}")
+            os.makedirs(person_folder, exist_ok=True)
+            # Re-enrolling (--force): older samples must not outlive the new set
+            for old_sample in glob.glob(os.path.join(person_folder, "sample_*.jpg")):
+                os.remove(old_sample)
+            for number, crop in enumerate(crops, 1):
+                cv2.imwrite(os.path.join(person_folder, f"sample_{number}.jpg"), crop)
+
+            # Same layout as ultra_register.py; written last (atomically) = enrolled
+            embedding_file = os.path.join(person_folder, "embeddings.pkl")
+            with open(embedding_file + ".tmp", 'wb') as f:
+                pickle.dump({
+                    'name': name,
+                    'id': person_id,
+                    'embeddings': list(embeddings),
+                    'average_embedding': np.mean(embeddings, axis=0),
+                    'model': _worker['model_name'],
+                    'backend': EMBED_BACKEND,
+                    'preprocess_version': PREPROCESS_VERSION
+                }, f)
+            os.replace(embedding_file + ".tmp", embedding_file)
+            result['samples'] = len(crops)
+        except Exception as e:
+            result['error'] = f"{type(e).__name__}: {e}"
+
+    result['seconds'] = time.perf_counter() - started
+    return result
+
+
+def split_label(label):
+    """'1023_Jane Doe' -> ('1023', 'Jane Doe'); underscores in the name become spaces"""
+    person_id, _, name = label.partition('_')
+    return person_id.strip(), name.replace('_', ' ').strip() or person_id.strip()
+
+
+def roster_from_directory(root):
+    """Students from photos/{id}_{name}/ folders and photos/{id}_{name}.jpg files"""
+    students = defaultdict(lambda: (None, []))
+    for entry in sorted(os.listdir(root)):
+        path = os.path.join(root, entry)
+        if os.path.isdir(path):
+            person_id, name = split_label(entry)
+            images = sorted(os.path.join(folder, f) for folder, _, files in os.walk(path) for f in files
+                            if f.lower().endswith(IMAGE_EXTENSIONS))
+        elif entry.lower().endswith(IMAGE_EXTENSIONS):
+            person_id, name = split_label(os.path.splitext(entry)[0])
+            images = [path]
+        else:
+            continue
+        known_name, known_images = students[person_id]
+        students[person_id] = (known_name or name, known_images + images)
+    return [(person_id, name, images) for person_id, (name, images) in students.items()]
+
+
+def roster_from_csv(path):
+    """Students from CSV rows id,name,image[;image...] (extra columns = more images)"""
+    base = os.path.dirname(os.path.abspath(path))
+    students = {}
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        for row in csv.reader(f):
+            if len(row) < 3 or row[0].strip().lower() == 'id':
+                continue  # Header or incomplete row
+            person_id, name = row[0].strip(), row[1].strip()
+            images = [os.path.join(base, image.strip()) for cell in row[2:] for image in cell.split(';')
+                      if image.strip()]
+            known_name, known_images = students.get(person_id, (name, []))
+            students[person_id] = (known_name, known_images + images)
+    return [(person_id, name, images) for person_id, (name, images) in students.items()]
+
+
+def enrolled_ids(database_path=DATABASE_PATH):
+    """IDs that already have a finished embeddings.pkl"""
+    if not os.path.isdir(database_path):
+        return set()
+    return {split_label(folder)[0] for folder in os.listdir(database_path)
+            if os.path.exists(os.path.join(database_path, folder, "embeddings.pkl"))}
+
+
+def write_failures(results, path=FAILURES_FILE):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['ID', 'Name', 'Image', 'Reason'])
+        for result in results:
+            for image, reason in result['failures']:
+                writer.writerow([result['id'], result['name'], image, reason])
+            if result['error']:
+                writer.writerow([result['id'], result['name'], '', result['error']])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="photo folder or roster CSV")
+    parser.add_argument("--workers", type=int, default=ENROLL_WORKERS)
+    parser.add_argument("--force", action="store_true", help="re-enroll IDs that are already enrolled")
+    args = parser.parse_args()
+
+    print("="*70)
+    print("BULK ENROLLMENT")
+    print("="*70)
+
+    if os.path.isdir(args.source):
+        roster = roster_from_directory(args.source)
+    elif os.path.isfile(args.source) and args.source.lower().endswith('.csv'):
+        roster = roster_from_csv(args.source)
+    else:
+        print(f"✗ Not a photo folder or CSV roster: {args.source}")
+        return
+
+    without_images = [person_id for person_id, _, images in roster if not images]
+    roster = [student for student in roster if student[2]]
+    done = set() if args.force else enrolled_ids()
+    todo = [student for student in roster if student[0] not in done]
+    print(f"Roster: {len(roster) + len(without_images)} student(s) | "
+          f"Already enrolled: {len(roster) - len(todo)} | To enroll: {len(todo)}")
+    if without_images:
+        print(f"⚠ {len(without_images)} student(s) without images, e.g. {', '.join(without_images[:5])}")
+    if not todo:
+        print("✓ Nothing to do.")
+        return
+
+    os.makedirs(DATABASE_PATH, exist_ok=True)
+    workers = min(args.workers or os.cpu_count() or 1, len(todo))
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    print(f"Workers: {workers} ({threads} thread(s) each)\n")
+
+    started = time.perf_counter()
+    results = []
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                 initargs=(MODEL_NAME, threads)) as pool:
+            futures = {pool.submit(enroll_student, *student): student for student in todo}
+            for done_count, future in enumerate(as_completed(futures), 1):
+                person_id, name, images = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {'pid': None, 'id': person_id, 'name': name, 'images': len(images), 'samples': 0,
+                              'failures': [], 'error': f"{type(e).__name__}: {e}", 'seconds': 0.0}
+                results.append(result)
+                if result['error']:
+                    print(f"  [{done_count}/{len(todo)}] ✗ {person_id} {name}: {result['error']}")
+                else:
+                    print(f"  [{done_count}/{len(todo)}] ✓ {person_id} {name}: "
+                          f"{result['samples']}/{result['images']} photo(s)")
+    except KeyboardInterrupt:
+        print("\n⚠ Interrupted - run the same command again to continue")
+    elapsed = time.perf_counter() - started
+
+    enrolled = [result for result in results if not result['error']]
+    images = sum(result['images'] for result in results)
+    print(f"\n✓ Enrolled {len(enrolled)}/{len(todo)} student(s) in {elapsed:.1f} s "
+          f"({len(results) / max(elapsed, 1e-9):.1f} students/s, {images / max(elapsed, 1e-9):.1f} images/s)")
+
+    per_worker = defaultdict(lambda: {'images': 0, 'seconds': 0.0})
+    for result in results:
+        if result['pid'] is not None:
+            per_worker[result['pid']]['images'] += result['images']
+            per_worker[result['pid']]['seconds'] += result['seconds']
+    for number, (pid, totals) in enumerate(sorted(per_worker.items()), 1):
+        print(f"  Worker {number} (pid {pid}): {totals['images'] / max(totals['seconds'], 1e-9):.1f} images/s")
+
+    reasons = Counter(reason for result in results for _, reason in result['failures'])
+    reasons.update(result['error'] for result in results if result['error'])
+    if reasons:
+        write_failures(results)
+        print(f"\n⚠ Problems (details in {FAILURES_FILE}):")
+        for reason, count in reasons.most_common():
+            print(f"  {count:>6} × {reason}")
+
+    if enrolled:
+        print("\nNext: python ultra_train.py")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+"""
+GALLERY FORMAT
+Versioned on-disk gallery replacing ultra_database.pkl:
+
+  ultra_gallery/
+    header.json      format version, embedding backend + model, dimension, person/row counts, dtype
+    embeddings.npy   contiguous (rows, dim) float32/float16/int8 matrix, opened with mmap
+    sq_norms.npy     precomputed squared norms (float32), opened with mmap
+    owners.npy       person index of every row (rows grouped by person), since v2
+    scales.npy       int8 only: one float32 scale per row (value = code * scale), since v3
+    projection.npz   PCA only: mean + components; queries are projected the same way, since v3
+    ids.json         [[id, name], ...] in person order
+
+A person owns one row (the mean embedding) or several prototypes.
+Compare compression levels with benchmarks/bench_compression.py.
+
+Run directly to migrate an old pickle database:
+    python ultra_gallery.py [ultra_database.pkl]
+"""
+
+import json
+import os
+import pickle
+import shutil
+import sys
+
+import numpy as np
+
+# Settings
+GALLERY_DIR = "ultra_gallery"
+LEGACY_DATABASE_FILE = "ultra_database.pkl"
+FORMAT_NAME = "ultra-gallery"
+FORMAT_VERSION = 3
+GALLERY_DTYPE = "float32"  # "float16" halves memory/disk, "int8" quarters it; distances are computed in float32
+GALLERY_PCA_DIM = None     # Project embeddings to this many dimensions (e.g. 256) with PCA fitted at training
+PCA_FIT_ROWS = 10000       # PCA is fitted on at most this many gallery rows (random sample)
+
+
+class Projection:
+    """PCA fitted on the gallery rows: project(x) = (x - mean) @ components.T"""
+
+    def __init__(self, mean, components, explained_variance=None):
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.components = np.ascontiguousarray(components, dtype=np.float32)
+        self.explained_variance = explained_variance
+
+    @property
+    def input_dim(self):
+        return self.components.shape[1]
+
+    @property
+    def dim(self):
+        return self.components.shape[0]
+
+    @classmethod
+    def fit(cls, data, dim, max_rows=PCA_FIT_ROWS, seed=0):
+        data = np.asarray(data, dtype=np.float32)
+        if len(data) > max_rows:
+            data = data[np.sort(np.random.default_rng(seed).choice(len(data), max_rows, replace=False))]
+        mean = data.mean(axis=0)
+        _, singular, components = np.linalg.svd(data - mean, full_matrices=False)
+        variance = singular ** 2
+        explained = float(variance[:dim].sum() / variance.sum()) if variance.sum() > 0 else 1.0
+        return cls(mean, components[:dim], explained)
+
+    def project(self, vectors):
+        return (np.asarray(vectors, dtype=np.float32) - self.mean) @ self.components.T
+
+
+class QuantizedRows:
+    """
+    int8 rows with one float32 scale each. Reads like a float32 matrix:
+    indexing dequantizes only the requested rows (blocks, candidates).
+    """
+
+    dtype = np.dtype(np.float32)
+
+    def __init__(self, codes, scales):
+        self.codes = codes
+        self.scales = scales
+
+    def __len__(self):
+        return len(self.codes)
+
+    @property
+    def shape(self):
+        return self.codes.shape
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + self.scales.nbytes
+
+    def __getitem__(self, key):
+        rows = self.codes[key].astype(np.float32)
+        scales = np.asarray(self.scales[key], dtype=np.float32)
+        rows *= scales[..., None] if scales.ndim else scales
+        return rows
+
+    def __array__(self, dtype=None, copy=None):
+        rows = self[:]
+        return rows if dtype is None else rows.astype(dtype)
+
+
+def quantize_rows(matrix, dtype):
+    """(stored matrix, per-row scales or None) for the gallery dtype"""
+    if dtype != "int8":
+        return matrix.astype(dtype), None
+    scales = np.abs(matrix).max(axis=1) / 127.0 if matrix.size else np.zeros(len(matrix))
+    scales = np.where(scales > 0, scales, 1.0).astype(np.float32)
+    codes = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales
+
+
+def stores_raw_rows(header):
+    """False if the stored rows cannot be reused as embeddings (projected or int8)"""
+    return not header.get('projection') and header.get('dtype') != "int8"
+
+
+class Gallery:
+    """A loaded gallery: person IDs/names plus the (memory-mapped) prototype matrix"""
+
+    def __init__(self, header, ids, names, embeddings, sq_norms, owners, projection=None):
+        self.header = header
+        self.projection = projection  # Applied to query embeddings before matching
+        self.ids = ids
+        self.names = names
+        self.embeddings = embeddings
+        self.sq_norms = sq_norms
+        self.owners = owners
+        # Rows of person i are offsets[i]:offsets[i + 1]
+        self.offsets = np.searchsorted(owners, np.arange(len(ids) + 1))
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def prototypes_per_person(self):
+        return np.diff(self.offsets)
+
+    @property
+    def model_name(self):
+        return self.header['model']
+
+    @property
+    def backend(self):
+        return self.header.get('backend', "deepface")  # Before v3 every gallery came from DeepFace
+
+
+def save_gallery(ids, names, embeddings, model_name, path=GALLERY_DIR, dtype=GALLERY_DTYPE,
+                 owners=None, prototypes="mean", pca_dim=GALLERY_PCA_DIM, backend="deepface"):
+    """
+    Write a gallery atomically (new directory, then swapped into place).
+    ids: list of person IDs, names: list of names, embeddings: (rows, dim) array,
+    owners: person index per row (default: one row per person, in order).
+    pca_dim: fit a PCA projection to this many dimensions (needs more rows than that).
+    """
+    owners = np.arange(len(ids), dtype=np.int32) if owners is None else np.asarray(owners, dtype=np.int32)
+    if np.any(np.diff(owners) < 0):
+        raise ValueError("Gallery rows must be grouped by person (owners sorted)")
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    if len(owners) == 0:
+        # Empty gallery: (0, dim) when the caller knows the dimension, else (0, 0)
+        matrix = matrix.reshape(0, matrix.shape[-1] if matrix.ndim == 2 else 0)
+    matrix = np.ascontiguousarray(matrix.reshape(len(owners), -1) if len(owners) else matrix)
+    input_dim = int(matrix.shape[1])
+
+    projection = None
+    if pca_dim and pca_dim < input_dim and len(matrix) > pca_dim:
+        projection = Projection.fit(matrix, pca_dim)
+        matrix = projection.project(matrix)
+    codes, scales = quantize_rows(matrix, dtype)
+    stored = codes.astype(np.float32) if scales is None else QuantizedRows(codes, scales)[:]  # As matched
+
+    header = {
+        'format': FORMAT_NAME,
+        'version': FORMAT_VERSION,
+        'backend': backend,
+        'model': model_name,
+        'dim': int(matrix.shape[1]),
+        'input_dim': input_dim,
+        'count': len(ids),
+        'rows': len(owners),
+        'prototypes': prototypes,
+        'dtype': dtype,
+        'projection': {'explained_variance': round(projection.explained_variance, 6)} if projection else None,
+    }
+
+    tmp_path = path + ".tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    np.save(os.path.join(tmp_path, "embeddings.npy"), codes)
+    np.save(os.path.join(tmp_path, "sq_norms.npy"), np.einsum('ij,ij->i', stored, stored).astype(np.float32))
+    np.save(os.path.join(tmp_path, "owners.npy"), owners)
+    if scales is not None:
+        np.save(os.path.join(tmp_path, "scales.npy"), scales)
+    if projection is not None:
+        np.savez(os.path.join(tmp_path, "projection.npz"), mean=projection.mean, components=projection.components)
+    with open(os.path.join(tmp_path, "ids.json"), 'w', encoding='utf-8') as f:
+        json.dump([[str(person_id), name] for person_id, name in zip(ids, names)], f, ensure_ascii=False)
+    # Header last: a directory without it is never treated as a valid gallery
+    with open(os.path.join(tmp_path, "header.json"), 'w') as f:
+        json.dump(header, f, indent=2)
+
+    swap_in(tmp_path, path)
+    return header
+
+
+def swap_in(tmp_path, path):
+    """Replace the gallery at path with the finished directory tmp_path"""
+    old_path = path + ".old"
+    shutil.rmtree(old_path, ignore_errors=True)
+    if os.path.exists(path):
+        os.replace(path, old_path)
+    os.replace(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+
+def update_gallery_rows(updates, ids, names, path=GALLERY_DIR):
+    """
+    Replace existing rows (same IDs, same number of rows each) without re-embedding the rest.
+    updates: {row: embedding}; names are rewritten for all rows.
+    New rows go through the gallery's existing projection and dtype.
+    The updated gallery is written to a new directory and swapped in like
+    save_gallery(), so running services keep their memory-mapped copy intact.
+    """
+    with open(os.path.join(path, "header.json")) as f:
+        header = json.load(f)
+    projection = load_projection(path) if header.get('projection') else None
+    embeddings = np.load(os.path.join(path, "embeddings.npy"))
+    sq_norms = np.load(os.path.join(path, "sq_norms.npy"))
+    scales = np.load(os.path.join(path, "scales.npy")) if header['dtype'] == "int8" else None
+    for row, embedding in updates.items():
+        embedding = np.asarray(embedding, dtype=np.float32).reshape(1, -1)
+        if projection is not None:
+            embedding = projection.project(embedding)
+        codes, row_scales = quantize_rows(embedding, header['dtype'])
+        embeddings[row] = codes[0]
+        if scales is not None:
+            scales[row] = row_scales[0]
+            embedding = QuantizedRows(codes, row_scales)[:]
+        sq_norms[row] = embedding[0] @ embedding[0]
+
+    tmp_path = path + ".tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    np.save(os.path.join(tmp_path, "embeddings.npy"), embeddings)
+    np.save(os.path.join(tmp_path, "sq_norms.npy"), sq_norms)
+    if scales is not None:
+        np.save(os.path.join(tmp_path, "scales.npy"), scales)
+    for name in ("owners.npy", "projection.npz"):
+        if os.path.exists(os.path.join(path, name)):
+            shutil.copy2(os.path.join(path, name), os.path.join(tmp_path, name))
+    with open(os.path.join(tmp_path, "ids.json"), 'w', encoding='utf-8') as f:
+        json.dump([[str(person_id), name] for person_id, name in zip(ids, names)], f, ensure_ascii=False)
+    with open(os.path.join(tmp_path, "header.json"), 'w') as f:
+        json.dump(header, f, indent=2)
+    swap_in(tmp_path, path)
+
+
+def load_projection(path=GALLERY_DIR):
+    with np.load(os.path.join(path, "projection.npz"), allow_pickle=False) as data:
+        return Projection(data['mean'], data['components'])
+
+
+def load_gallery(path=GALLERY_DIR, mmap=True):
+    """Open a gallery; the embedding matrix is memory-mapped (zero-copy) by default"""
+    header_file = os.path.join(path, "header.json")
+    if not os.path.exists(header_file):
+        raise FileNotFoundError(f"No gallery found at {path}")
+
+    with open(header_file) as f:
+        header = json.load(f)
+    if header.get('format') != FORMAT_NAME:
+        raise ValueError(f"{path} is not a gallery directory")
+    if header.get('version', 0) > FORMAT_VERSION:
+        raise ValueError(f"Gallery version {header['version']} is newer than supported ({FORMAT_VERSION})")
+
+    mmap_mode = 'r' if mmap else None
+    embeddings = np.load(os.path.join(path, "embeddings.npy"), mmap_mode=mmap_mode)
+    sq_norms = np.load(os.path.join(path, "sq_norms.npy"), mmap_mode=mmap_mode)
+    with open(os.path.join(path, "ids.json"), encoding='utf-8') as f:
+        table = json.load(f)
+
+    if header['version'] >= 2:
+        owners = np.load(os.path.join(path, "owners.npy"))
+    else:
+        owners = np.arange(header['count'], dtype=np.int32)  # v1: one row per person
+        header = dict(header, rows=header['count'], prototypes="mean")
+
+    projection = None
+    if header['version'] >= 3:
+        if header['dtype'] == "int8":
+            embeddings = QuantizedRows(embeddings, np.load(os.path.join(path, "scales.npy"), mmap_mode=mmap_mode))
+        if header.get('projection'):
+            projection = load_projection(path)
+            projection.explained_variance = header['projection'].get('explained_variance')
+
+    if len(table) != header['count'] or embeddings.shape[0] != header['rows'] or len(owners) != header['rows']:
+        raise ValueError(f"Gallery at {path} is inconsistent (header says {header['count']} persons, "
+                         f"{header['rows']} rows)")
+
+    ids = [person_id for person_id, _ in table]
+    names = {person_id: name for person_id, name in table}
+    return Gallery(header, ids, names, embeddings, sq_norms, owners, projection)
+
+
+def gallery_exists(path=GALLERY_DIR):
+    return os.path.exists(os.path.join(path, "header.json"))
+
+
+def migrate_pickle(pickle_path=LEGACY_DATABASE_FILE, path=GALLERY_DIR, model_name="VGG-Face"):
+    """One-shot conversion of an old {id: {'name', 'embedding'}} pickle database"""
+    with open(pickle_path, 'rb') as f:
+        database = pickle.load(f)  # Trusted local file, read once
+
+    ids = list(database.keys())
+    names = [database[person_id]['name'] for person_id in ids]
+    embeddings = [np.asarray(database[person_id]['embedding'], dtype=np.float32).ravel() for person_id in ids]
+    return save_gallery(ids, names, np.stack(embeddings) if embeddings else np.empty((0, 0)), model_name, path)
+
+
+if __name__ == "__main__":
+    source = sys.argv[1] if len(sys.argv) > 1 else LEGACY_DATABASE_FILE
+    if not os.path.exists(source):
+        print(f"✗ {source} not found - nothing to migrate")
+        sys.exit(1)
+
+    header = migrate_pickle(source)
+    print(f"✓ Migrated {source} -> {GALLERY_DIR}/")
+    print(f"  Persons: {header['count']} | Dimension: {header['dim']} | dtype: {header['dtype']}")
+    print(f"  You can delete {source} once attendance works with the new gallery.")
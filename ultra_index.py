@@ -0,0 +1,201 @@
+"""
+SEARCH INDEX
+Pluggable nearest-neighbour search behind the gallery matcher:
+  exact - brute-force scan of the whole gallery (default for small galleries)
+  ivf   - inverted-file index: k-means clusters, only the closest lists are scanned
+"""
+
+import os
+
+import numpy as np
+
+# Settings
+INDEX_FILE = "ultra_index.npz"
+INDEX_TYPE = "auto"          # "exact", "ivf" or "auto"
+IVF_MIN_GALLERY = 10000      # "auto" switches to IVF from this many gallery rows
+IVF_PROBES = 8               # Clusters scanned per query (higher = better recall, slower)
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE_PER_LIST = 64  # Training rows per cluster (k-means runs on a sample)
+CHUNK_ROWS = 8192            # Rows per block when scanning large matrices
+
+
+def squared_norms(matrix):
+    return np.einsum('ij,ij->i', matrix, matrix)
+
+
+def squared_distances(queries, matrix, matrix_sq_norms):
+    """Coarse squared L2 distances (num_queries, num_rows) with one matrix product"""
+    sq_dist = queries @ matrix.T
+    sq_dist *= -2.0
+    sq_dist += squared_norms(queries)[:, None]
+    sq_dist += matrix_sq_norms[None, :]
+    return sq_dist
+
+
+def exact_distances(query, matrix, rows):
+    """Exact L2 distances from one query to the given rows (no float32 cancellation)"""
+    diffs = matrix[rows] - query
+    return np.sqrt(np.einsum('ij,ij->i', diffs, diffs))
+
+
+def top_k(query, matrix, rows, k):
+    """Sorted (rows, distances) of the k nearest among the candidate rows"""
+    distances = exact_distances(query, matrix, rows)
+    if len(rows) > k:
+        keep = np.argpartition(distances, k - 1)[:k]
+        rows, distances = rows[keep], distances[keep]
+    order = np.argsort(distances)
+    return rows[order], distances[order]
+
+
+class ExactIndex:
+    """Brute-force scan - exactly today's results"""
+
+    kind = "exact"
+
+    def __init__(self, embeddings, sq_norms=None):
+        self.embeddings = embeddings
+        self.sq_norms = squared_norms(embeddings) if sq_norms is None else sq_norms
+
+    def search(self, queries, k):
+        """Returns (rows, distances) shaped (num_queries, k); missing rows are -1 / inf"""
+        count = len(self.embeddings)
+        k_found = min(k, count)
+
+        rows = np.full((len(queries), k), -1, dtype=np.int64)
+        distances = np.full((len(queries), k), np.inf)
+
+        for start in range(0, count, CHUNK_ROWS):
+            block = slice(start, min(start + CHUNK_ROWS, count))
+            sq_dist = squared_distances(queries, self.embeddings[block], self.sq_norms[block])
+            block_k = min(k_found, sq_dist.shape[1])
+            if block_k < sq_dist.shape[1]:
+                candidates = np.argpartition(sq_dist, block_k - 1, axis=1)[:, :block_k] + start
+            else:
+                candidates = np.tile(np.arange(block.start, block.stop), (len(queries), 1))
+
+            # Merge the block's candidates with the best found so far
+            for i, query in enumerate(queries):
+                merged = np.concatenate([rows[i][rows[i] >= 0], candidates[i]])
+                best_rows, best_dist = top_k(query, self.embeddings, merged, k_found)
+                rows[i, :k_found], distances[i, :k_found] = best_rows, best_dist
+
+        return rows, distances
+
+
+def kmeans(data, num_clusters, iterations=KMEANS_ITERATIONS, seed=0):
+    """Plain Lloyd's k-means on float32 rows; returns the centroids"""
+    rng = np.random.default_rng(seed)
+    centroids = data[rng.choice(len(data), num_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        labels = assign_clusters(data, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, data)
+        counts = np.bincount(labels, minlength=num_clusters)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+        # Re-seed empty clusters with random rows
+        if not filled.all():
+            centroids[~filled] = data[rng.choice(len(data), (~filled).sum(), replace=False)]
+    return centroids
+
+
+def assign_clusters(data, centroids):
+    """Nearest centroid for every row, in blocks to bound memory"""
+    centroid_norms = squared_norms(centroids)
+    labels = np.empty(len(data), dtype=np.int32)
+    for start in range(0, len(data), CHUNK_ROWS):
+        block = np.asarray(data[start:start + CHUNK_ROWS], dtype=np.float32)
+        labels[start:start + len(block)] = squared_distances(block, centroids, centroid_norms).argmin(axis=1)
+    return labels
+
+
+class IVFIndex:
+    """
+    Inverted-file index: gallery rows are grouped by their nearest k-means
+    centroid and a query only scans the n_probe closest groups. Candidates
+    are re-scored exactly, so best/second-best distances stay comparable
+    with the exact mode for the confidence-margin test.
+    """
+
+    kind = "ivf"
+
+    def __init__(self, embeddings, centroids, assignments, n_probe=IVF_PROBES):
+        self.embeddings = embeddings
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.centroid_norms = squared_norms(self.centroids)
+        self.assignments = np.asarray(assignments, dtype=np.int32)
+        self.n_probe = min(n_probe, len(self.centroids))
+
+        # Rows sorted by cluster, with offsets into each cluster's list
+        self.order = np.argsort(self.assignments, kind='stable')
+        self.offsets = np.searchsorted(self.assignments[self.order], np.arange(len(self.centroids) + 1))
+
+    @classmethod
+    def train(cls, embeddings, num_lists=None, n_probe=IVF_PROBES, seed=0):
+        count = len(embeddings)
+        num_lists = num_lists or max(1, int(4 * np.sqrt(count)))
+        num_lists = min(num_lists, count)
+
+        rng = np.random.default_rng(seed)
+        sample_size = min(count, num_lists * KMEANS_SAMPLE_PER_LIST)
+        sample = np.asarray(embeddings[np.sort(rng.choice(count, sample_size, replace=False))], dtype=np.float32)
+        centroids = kmeans(sample, num_lists, seed=seed)
+        return cls(embeddings, centroids, assign_clusters(embeddings, centroids), n_probe)
+
+    def search(self, queries, k):
+        """Returns (rows, distances) shaped (num_queries, k); missing rows are -1 / inf"""
+        rows = np.full((len(queries), k), -1, dtype=np.int64)
+        distances = np.full((len(queries), k), np.inf)
+
+        centroid_dist = squared_distances(queries, self.centroids, self.centroid_norms)
+        probes = np.argsort(centroid_dist, axis=1)[:, :self.n_probe]
+
+        for i, query in enumerate(queries):
+            candidates = np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in probes[i]])
+            if len(candidates) == 0:
+                continue
+            found = min(k, len(candidates))
+            rows[i, :found], distances[i, :found] = top_k(query, self.embeddings, candidates, found)
+
+        return rows, distances
+
+
+def build_index(embeddings, index_type=INDEX_TYPE):
+    """Exact or IVF index for the gallery matrix ("auto" picks by gallery size)"""
+    if index_type == "auto":
+        index_type = "ivf" if len(embeddings) >= IVF_MIN_GALLERY else "exact"
+    if index_type == "ivf":
+        return IVFIndex.train(embeddings)
+    if index_type == "exact":
+        return ExactIndex(embeddings)
+    raise ValueError(f"Unknown index type: {index_type}")
+
+
+def save_index(index, ids, path=INDEX_FILE):
+    """Persist the index structure (not the embeddings) next to the gallery"""
+    if index.kind == "ivf":
+        np.savez(path, kind=index.kind, ids=np.asarray(ids, dtype=str), rows=len(index.embeddings),
+                 centroids=index.centroids, assignments=index.assignments,
+                 n_probe=index.n_probe)
+    else:
+        np.savez(path, kind=index.kind, ids=np.asarray(ids, dtype=str), rows=len(index.embeddings))
+
+
+def load_index(embeddings, ids, path=INDEX_FILE, sq_norms=None):
+    """
+    Load a saved index for this gallery. Returns None if there is no index
+    file or it was built for a different gallery (caller falls back to exact).
+    """
+    if not os.path.exists(path):
+        return None
+
+    with np.load(path, allow_pickle=False) as data:
+        if list(data['ids']) != [str(person_id) for person_id in ids]:
+            return None
+        if 'rows' not in data or int(data['rows']) != len(embeddings):
+            return None
+        kind = str(data['kind'])
+        if kind == "ivf":
+            return IVFIndex(embeddings, data['centroids'], data['assignments'], int(data['n_probe']))
+    return ExactIndex(embeddings, sq_norms)
@@ -0,0 +1,207 @@
+"""
+ATTENDANCE LOG READER
+Constant-time reads of large CSV attendance logs:
+  - the last N rows are found by seeking backwards from the end of the file
+  - a sidecar index (attendance_log.csv.idx.jsonl) holds the byte offset
+    where each run of same-day rows starts (split every SEGMENT_ROWS rows).
+    It is append-only: one line per segment once the segment is closed, so a
+    write costs one short append instead of rewriting the whole index, and a
+    reader only scans the still-open last segment plus any newer bytes
+Paging and date-range lookups seek straight to those offsets.
+"""
+
+import bisect
+import csv
+import json
+import os
+
+# Settings
+INDEX_SUFFIX = ".idx.jsonl"
+READ_BLOCK = 64 * 1024   # Bytes per backwards read
+DATE_COLUMN = 2          # ID, Name, Date, ...
+SEGMENT_ROWS = 1000      # Longest segment, so a page lookup skips at most this many rows
+
+
+def parse_line(line):
+    return next(csv.reader([line.decode('utf-8', errors='replace')]), [])
+
+
+def tail_rows(path, count, has_header=True):
+    """Last `count` rows of a CSV file, reading backwards in blocks"""
+    if count <= 0 or not os.path.exists(path):
+        return []
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        data = b''
+        # count + 2 newlines: the rows, an incomplete last line, a partial first line
+        while position > 0 and data.count(b'\n') < count + 2:
+            step = min(READ_BLOCK, position)
+            position -= step
+            f.seek(position)
+            data = f.read(step) + data
+
+    lines = data.split(b'\n')
+    lines.pop()  # Empty after the final newline, or a row still being written
+    if position > 0:
+        lines = lines[1:]  # Started mid-line
+    elif has_header and lines:
+        lines = lines[1:]
+    return [parse_line(line) for line in lines[-count:] if line.strip()]
+
+
+def read_rows(path, offset, limit, skip=0):
+    """Up to `limit` complete rows starting at byte offset, after skipping `skip` rows"""
+    rows = []
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        for line in iter(f.readline, b''):
+            if not line.endswith(b'\n') or len(rows) >= limit:
+                break
+            if skip:
+                skip -= 1
+                continue
+            rows.append(parse_line(line))
+    return rows
+
+
+class LogIndex:
+    """
+    Sidecar index of a CSV log: row count plus segments [date, offset, rows]
+    for every run of consecutive rows with the same date (at most SEGMENT_ROWS
+    rows each). Closed segments are appended to the sidecar as
+    [date, offset, rows, end] lines; the last, still-open segment lives in
+    memory only and is rescanned by the next process.
+    """
+
+    def __init__(self, csv_path):
+        self.csv_path = csv_path
+        self.path = csv_path + INDEX_SUFFIX
+        self._reset()
+        self._load()
+
+    def _reset(self):
+        self.size = 0        # Bytes of the log covered by the index
+        self.rows = 0
+        self.segments = []
+        self._starts = []    # Row number where each segment begins
+        self._saved = 0      # Segments already in the sidecar
+
+    def _load(self):
+        """Replay closed segments; anything unusable is dropped and rescanned from the log"""
+        if not os.path.exists(self.path):
+            return
+        clean = True
+        with open(self.path, 'rb') as f:
+            for line in f:
+                try:
+                    if not line.endswith(b'\n'):
+                        raise ValueError("torn write")
+                    date, offset, count, end = json.loads(line)
+                    if self.segments and offset < self.size:
+                        clean = False
+                        continue  # Also appended by another process
+                    if self.segments and offset != self.size:
+                        raise ValueError("gap")
+                except (ValueError, TypeError):
+                    clean = False
+                    break  # Later lines cannot be trusted to follow on
+                self._starts.append(self.rows)
+                self.segments.append([date, offset, count])
+                self.rows += count
+                self.size = end
+        self._saved = len(self.segments)
+        if not clean:
+            self._rewrite()
+
+    def _rewrite(self):
+        """Replace the sidecar with the closed segments held in memory"""
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(self._records(0, self._saved))
+        os.replace(tmp_path, self.path)
+
+    def _records(self, first, last):
+        lines = []
+        for i in range(first, last):
+            date, offset, count = self.segments[i]
+            end = self.segments[i + 1][1] if i + 1 < len(self.segments) else self.size
+            lines.append(json.dumps([date, offset, count, end]) + "\n")
+        return "".join(lines)
+
+    def _append_closed(self):
+        """Append segments closed since the last call (all but the open last one)"""
+        closed = max(len(self.segments) - 1, 0)
+        if closed <= self._saved:
+            return
+        records = self._records(self._saved, closed)
+        with open(self.path, 'ab+') as f:
+            size = f.seek(0, os.SEEK_END)
+            if size:
+                f.seek(size - 1)
+                if f.read(1) != b'\n':  # Torn write from a crash: cut it off
+                    f.seek(0)
+                    f.truncate(f.read().rfind(b'\n') + 1)
+                    f.seek(0, os.SEEK_END)
+            f.write(records.encode())
+        self._saved = closed
+
+    def refresh(self):
+        """Index rows appended since the last refresh (reads only the new bytes)"""
+        file_size = os.path.getsize(self.csv_path) if os.path.exists(self.csv_path) else 0
+        if file_size < self.size:
+            self._reset()  # Log was truncated or replaced
+            self._rewrite()
+        if file_size == self.size:
+            return self
+
+        with open(self.csv_path, 'rb') as f:
+            f.seek(self.size)
+            offset = self.size
+            if offset == 0:
+                offset += len(f.readline())  # Header
+            for line in iter(f.readline, b''):
+                if not line.endswith(b'\n'):
+                    break  # Row still being written
+                fields = parse_line(line)
+                date = fields[DATE_COLUMN] if len(fields) > DATE_COLUMN else ""
+                if self.segments and self.segments[-1][0] == date and self.segments[-1][2] < SEGMENT_ROWS:
+                    self.segments[-1][2] += 1
+                else:
+                    self._starts.append(self.rows)
+                    self.segments.append([date, offset, 1])
+                self.rows += 1
+                offset += len(line)
+        self.size = offset
+        self._append_closed()
+        return self
+
+    def count(self):
+        return self.refresh().rows
+
+    def rows_from(self, start_row, limit):
+        """Rows start_row .. start_row + limit - 1 (0 = oldest), via the segment offsets"""
+        self.refresh()
+        if start_row >= self.rows or limit <= 0:
+            return []
+        segment = bisect.bisect_right(self._starts, start_row) - 1
+        _, offset, _ = self.segments[segment]
+        return read_rows(self.csv_path, offset, limit, skip=start_row - self._starts[segment])
+
+    def page(self, number, size):
+        """Page `number` counting back from the newest rows (1 = latest `size` rows)"""
+        self.refresh()
+        end = self.rows - (number - 1) * size
+        if end <= 0:
+            return []
+        start = max(0, end - size)
+        return self.rows_from(start, end - start)
+
+    def rows_between(self, start_date, end_date):
+        """All rows dated start_date..end_date (YYYY-MM-DD, inclusive), in log order"""
+        self.refresh()
+        rows = []
+        for date, offset, count in self.segments:
+            if start_date <= date <= end_date:
+                rows.extend(read_rows(self.csv_path, offset, count))
+        return rows
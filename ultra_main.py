@@ -5,7 +5,13 @@ Main Menu - Central Control Panel
 
 import os
 import sys
+import time
 import subprocess
+from ultra_store import read_store, store_exists, export_csv, ATTENDANCE_HEADER
+
+SERVER_LOG = "ultra_server.log"
+EXPORT_FILE = "attendance_export.csv"
+PAGE_SIZE = 20
 
 def clear_screen():
     """Clear console screen"""
@@ -37,6 +43,8 @@ def print_menu():
     print("  [5] 📊 View Attendance Records")
     print("  [6] 👥 List Registered People")
     print("  [7] 🔄 Reset System (Delete All Data)")
+    print("  [8] 🔥 Start Model Server (faster start-up)")
+    print("  [9] 📈 Attendance Analytics")
     print("  [0] ❌ Exit")
     print()
     print("="*70)
@@ -55,47 +63,166 @@ def run_script(script_name):
         print(f"\n❌ Error running {script_name}: {e}")
         input("\n\nPress Enter to continue...")
 
-def view_attendance():
-    """View attendance records"""
+def model_server():
+    """Running embedding server (RemoteEmbedder) or None"""
+    try:
+        from ultra_server import RemoteEmbedder
+    except ImportError:
+        return None
+    server = RemoteEmbedder()
+    return server if server.available() else None
+
+def start_model_server():
+    """Start ultra_server.py in the background (model stays loaded between tools)"""
     clear_screen()
     print_header()
-    print("\n📊 ATTENDANCE RECORDS\n")
+    print("\n🔥 MODEL SERVER\n")
+
+    server = model_server()
+    if server is not None:
+        stats = server.stats()
+        print(f"✓ Already running at {server.url} ({stats['model']})")
+        print(f"  Requests: {stats['requests']} | Faces: {stats['faces']} | "
+              f"Faces/batch: {stats['mean_batch_faces']} | p95: {stats['latency_ms']['p95']} ms")
+        input("\n\nPress Enter to continue...")
+        return
+
+    options = {'start_new_session': True} if os.name != 'nt' else \
+        {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP}
+    with open(SERVER_LOG, 'a') as log:
+        process = subprocess.Popen([sys.executable, 'ultra_server.py'], stdout=log,
+                                   stderr=subprocess.STDOUT, **options)
+
+    print("⏳ Loading model (one time only)...")
+    deadline = time.time() + 300
+    while time.time() < deadline and process.poll() is None:
+        if model_server() is not None:
+            print("✓ Model server running - register and attendance now start instantly")
+            print(f"  Log: {SERVER_LOG} | Stop it with: kill {process.pid}")
+            break
+        time.sleep(1)
+    else:
+        print(f"❌ Model server did not start - see {SERVER_LOG}")
+    input("\n\nPress Enter to continue...")
 
-    if not os.path.exists('ultra_attendance.csv'):
+def print_rows(rows):
+    """Print attendance rows under the CSV header"""
+    print("-"*70)
+    print(",".join(ATTENDANCE_HEADER))
+    print("-"*70)
+    for row in rows:
+        print(",".join(str(value) for value in row))
+    print("-"*70)
+
+def view_attendance():
+    """View attendance records (newest first, page by page)"""
+    try:
+        store = read_store()
+    except Exception as e:
+        print(f"❌ Error opening attendance records: {e}")
+        input("\n\nPress Enter to continue...")
+        return
+    if store is None:
+        clear_screen()
+        print_header()
+        print("\n📊 ATTENDANCE RECORDS\n")
         print("❌ No attendance records found.")
         print("   Run 'Start Attendance' first to create records.")
-    else:
-        try:
-            with open('ultra_attendance.csv', 'r') as f:
-                lines = f.readlines()
+        input("\n\nPress Enter to continue...")
+        return
 
-            if len(lines) <= 1:
-                print("📝 Attendance file exists but is empty.")
-            else:
-                print(f"Total entries: {len(lines) - 1}\n")
-                print("-"*70)
+    try:
+        browse_attendance(store)
+    finally:
+        store.close()
 
-                # Print header
-                print(lines[0].strip())
-                print("-"*70)
+def browse_attendance(store):
+    """Page through an open attendance store"""
+    page = 1
+    while True:
+        clear_screen()
+        print_header()
+        print("\n📊 ATTENDANCE RECORDS\n")
 
-                # Print last 20 entries
-                display_lines = lines[-20:] if len(lines) > 20 else lines[1:]
+        try:
+            total = store.count()
+            if total == 0:
+                print(f"📝 Attendance store ({store.location}) exists but is empty.")
+                input("\n\nPress Enter to continue...")
+                return
+
+            pages = (total + PAGE_SIZE - 1) // PAGE_SIZE
+            page = min(max(page, 1), pages)
+            print(f"Total entries: {total} ({store.location}) - page {page} of {pages}, newest first\n")
+            print_rows(store.page(page, PAGE_SIZE))
+        except Exception as e:
+            print(f"❌ Error reading attendance records: {e}")
+            input("\n\nPress Enter to continue...")
+            return
+
+        choice = input("\n[N] Older  [P] Newer  [D] Date range  [E] Export CSV  [Enter] Back: ").strip().upper()
+        if choice == 'N':
+            page += 1
+        elif choice == 'P':
+            page -= 1
+        elif choice == 'D':
+            start_date = input("From date (YYYY-MM-DD): ").strip()
+            end_date = input("To date (YYYY-MM-DD, Enter = same day): ").strip() or start_date
+            rows = store.rows_between(start_date, end_date)
+            print(f"\n{len(rows)} entries from {start_date} to {end_date}:\n")
+            print_rows(rows)
+            input("\nPress Enter to continue...")
+        elif choice == 'E':
+            exported = export_csv(store, EXPORT_FILE)
+            print(f"✓ Exported {exported} entries to {EXPORT_FILE}")
+            input("\nPress Enter to continue...")
+        else:
+            return
 
-                if len(lines) > 21:
-                    print(f"... (showing last 20 of {len(lines)-1} entries) ...")
-                    print()
+def attendance_analytics():
+    """Daily presence, late arrivals, missing exits and time on site"""
+    clear_screen()
+    print_header()
+    print("\n📈 ATTENDANCE ANALYTICS\n")
 
-                for line in display_lines:
-                    if line.strip():
-                        print(line.strip())
+    if not store_exists():
+        print("❌ No attendance records found.")
+        print("   Run 'Start Attendance' first to create records.")
+        input("\n\nPress Enter to continue...")
+        return
 
-                print("-"*70)
+    try:
+        from ultra_analytics import AttendanceAnalytics, print_day_report, print_student_report
+        analytics = AttendanceAnalytics()
+        print("⏳ Reading new attendance rows...")
+        rows = analytics.update()
+        print(f"✓ {rows} new row(s) analysed in {analytics.update_seconds:.2f} s\n")
+    except Exception as e:
+        print(f"❌ Error analysing attendance records: {e}")
+        input("\n\nPress Enter to continue...")
+        return
 
-        except Exception as e:
-            print(f"❌ Error reading attendance file: {e}")
+    dates = analytics.dates()
+    if not dates:
+        print("📝 No attendance rows yet.")
+        input("\n\nPress Enter to continue...")
+        return
 
-    input("\n\nPress Enter to continue...")
+    print_day_report(analytics.day_report(dates[-1]))
+    while True:
+        choice = input("\n[D] Another day  [S] Student summary  [Enter] Back: ").strip().upper()
+        if choice == 'D':
+            date = input(f"Date (YYYY-MM-DD, Enter = {dates[-1]}): ").strip() or dates[-1]
+            print()
+            print_day_report(analytics.day_report(date))
+        elif choice == 'S':
+            start_date = input(f"From date (YYYY-MM-DD, Enter = {dates[0]}): ").strip() or dates[0]
+            end_date = input(f"To date (YYYY-MM-DD, Enter = {dates[-1]}): ").strip() or dates[-1]
+            print()
+            print_student_report(analytics.student_report(start_date, end_date), start_date, end_date,
+                                 limit=PAGE_SIZE * 5)
+        else:
+            return
 
 def list_registered_people():
     """List all registered people"""
@@ -141,8 +268,8 @@ def list_registered_people():
             print("-"*70)
 
             # Check if trained database exists
-            if os.path.exists('ultra_database.pkl'):
-                print("\n✓ Trained database file (ultra_database.pkl) exists")
+            if os.path.exists(os.path.join('ultra_gallery', 'header.json')):
+                print("\n✓ Trained gallery (ultra_gallery/) exists")
             else:
                 print("\n⚠ Trained database not found - Run option [3] to train")
 
@@ -157,8 +284,8 @@ def confirm_reset():
     print()
     print("This includes:")
     print("  - All registered people (face_database/)")
-    print("  - Trained model (ultra_database.pkl)")
-    print("  - Attendance records (ultra_attendance.csv)")
+    print("  - Trained model (ultra_gallery/, ultra_index.npz)")
+    print("  - Attendance records (attendance.db, attendance_log.csv)")
     print()
     print("-"*70)
 
@@ -179,8 +306,8 @@ def check_system_status():
         'attendance_script': os.path.exists('ultra_attendance.py'),
         'reset_script': os.path.exists('ultra_reset.py'),
         'database_folder': os.path.exists('face_database'),
-        'trained_model': os.path.exists('ultra_database.pkl'),
-        'attendance_file': os.path.exists('ultra_attendance.csv')
+        'trained_model': os.path.exists(os.path.join('ultra_gallery', 'header.json')),
+        'attendance_file': store_exists()
     }
 
     print("\n📊 System Status:")
@@ -218,14 +345,23 @@ def check_system_status():
     # Check attendance
     if status['attendance_file']:
         try:
-            with open('ultra_attendance.csv', 'r') as f:
-                entry_count = len(f.readlines()) - 1
-            print(f"  ✓ Attendance file exists ({entry_count} entries)")
-        except:
-            print("  ✓ Attendance file exists")
+            store = read_store()
+            try:
+                print(f"  ✓ Attendance records exist ({store.count()} entries)")
+            finally:
+                store.close()
+        except Exception:
+            print("  ✓ Attendance records exist")
     else:
         print("  • No attendance records yet")
 
+    # Check model server
+    server = model_server()
+    if server is not None:
+        print(f"  ✓ Model server running ({server.model_name})")
+    else:
+        print("  • Model server not running (option [8] for faster start-up)")
+
     print()
 
 def main():
@@ -236,7 +372,7 @@ def main():
         check_system_status()
         print_menu()
 
-        choice = input("Enter your choice [0-7]: ").strip()
+        choice = input("Enter your choice [0-9]: ").strip()
 
         if choice == '1':
             run_script('test_installation.py')
@@ -259,6 +395,12 @@ def main():
         elif choice == '7':
             confirm_reset()
 
+        elif choice == '8':
+            start_model_server()
+
+        elif choice == '9':
+            attendance_analytics()
+
         elif choice == '0':
             clear_screen()
             print("\n👋 Thank you for using Ultra-Accurate Face Attendance System!")
@@ -266,7 +408,7 @@ def main():
             sys.exit(0)
 
         else:
-            print("\n❌ Invalid choice. Please enter a number from 0 to 7.")
+            print("\n❌ Invalid choice. Please enter a number from 0 to 9.")
             input("\nPress Enter to continue...")
 
 if __name__ == "__main__":
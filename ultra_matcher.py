@@ -0,0 +1,118 @@
+"""
+GALLERY MATCHER
+Vectorized nearest-neighbour search over the trained database
+"""
+
+import numpy as np
+
+from ultra_index import ExactIndex
+
+
+class GalleryMatcher:
+    """Matches query embeddings against every registered student in one call"""
+
+    def __init__(self, ids, names, embeddings, sq_norms=None, index=None, owners=None, projection=None):
+        """
+        ids: person IDs, names: {id: name},
+        embeddings: (rows, dim) matrix - a float32 memmap is used as-is (zero-copy).
+        index: search index over that matrix (ultra_index); exact scan if None.
+        owners: person index of every row when persons have several prototypes
+                (rows grouped by person); None means row i belongs to person i.
+        projection: PCA projection of a compressed gallery (ultra_gallery), applied
+                    to every query; None when the gallery stores full embeddings.
+        """
+        if len(ids) == 0:
+            raise ValueError("Cannot build a matcher from an empty gallery")
+
+        self.ids = np.array(ids, dtype=object)
+        self.names = names
+        self.embeddings = embeddings
+        self.projection = projection
+        self.index = index or ExactIndex(self.embeddings, sq_norms)
+
+        self.owners = None
+        self.max_prototypes = 1
+        if owners is not None and len(owners) != len(ids):
+            self.owners = np.asarray(owners)
+            self.max_prototypes = int(np.bincount(self.owners, minlength=len(ids)).max())
+
+    @classmethod
+    def from_database(cls, database, index=None):
+        """Stack a {id: {'name', 'embedding'}} dict into one contiguous float32 matrix"""
+        if not database:
+            raise ValueError("Cannot build a matcher from an empty database")
+        embeddings = np.ascontiguousarray(np.stack([
+            np.asarray(data['embedding'], dtype=np.float32).ravel()
+            for data in database.values()
+        ]))
+        names = {person_id: data['name'] for person_id, data in database.items()}
+        return cls(list(database.keys()), names, embeddings, index=index)
+
+    @classmethod
+    def from_gallery(cls, gallery, index=None):
+        """Match directly against a memory-mapped ultra_gallery (no copy)"""
+        return cls(gallery.ids, gallery.names, gallery.embeddings, gallery.sq_norms, index, gallery.owners,
+                   gallery.projection)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def dimension(self):
+        """Expected query embedding size (before any projection)"""
+        return self.projection.input_dim if self.projection is not None else self.embeddings.shape[1]
+
+    def use_index(self, index):
+        """Swap the search index (e.g. one loaded from disk by ultra_index.load_index)"""
+        self.index = index
+
+    def search(self, queries, k=2):
+        """
+        Find the k nearest gallery entries for each query embedding.
+        Returns (ids, distances), both shaped (num_queries, k), sorted by distance.
+        Missing neighbours (k larger than the gallery) are None / inf.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if queries.shape[1] != self.dimension:
+            raise ValueError(f"Query dimension {queries.shape[1]} does not match "
+                             f"gallery dimension {self.dimension}")
+        if self.projection is not None:
+            queries = self.projection.project(queries)
+
+        if self.owners is None:
+            rows, distances = self.index.search(queries, k)
+            ids = np.where(rows >= 0, self.ids[np.maximum(rows, 0)], None)
+            return ids, distances
+
+        # Several prototypes per person: all prototypes are scored in one pass,
+        # k * max_prototypes rows are always enough to contain k distinct persons
+        rows, row_distances = self.index.search(queries, k * self.max_prototypes)
+        return self._reduce_per_person(rows, row_distances, k)
+
+    def _reduce_per_person(self, rows, row_distances, k):
+        """Per-person minimum distance over prototypes, then the k closest persons"""
+        ids = np.full((len(rows), k), None, dtype=object)
+        distances = np.full((len(rows), k), np.inf)
+        for i in range(len(rows)):
+            valid = rows[i] >= 0
+            # Rows are sorted by distance, so each person's first row is its minimum
+            persons, first = np.unique(self.owners[rows[i][valid]], return_index=True)
+            person_distances = row_distances[i][valid][first]
+            closest = np.argsort(person_distances)[:k]
+            ids[i, :len(closest)] = self.ids[persons[closest]]
+            distances[i, :len(closest)] = person_distances[closest]
+        return ids, distances
+
+    def match(self, queries):
+        """
+        Best and second-best match per query embedding.
+        Returns a list of (best_id, best_distance, second_best_distance).
+        """
+        ids, distances = self.search(queries, k=2)
+        return [(ids[i, 0], float(distances[i, 0]), float(distances[i, 1]))
+                for i in range(len(ids))]
+
+
+def is_confident_match(best_distance, second_best_distance, threshold, margin):
+    """Close enough to the best match AND clearly better than the runner-up"""
+    return best_distance < threshold and (second_best_distance - best_distance) > margin
@@ -0,0 +1,314 @@
+"""
+METRICS
+Low-overhead instrumentation of the attendance hot path:
+  - per-stage latency histograms (fixed buckets; lifetime totals for
+    Prometheus plus a rolling window for percentiles)
+  - counters (faces detected, recognized, uncertain, unknown, skipped by cooldown, logged)
+  - gauges (queue depth, live tracks, dropped frames)
+
+Recording costs one bucket lookup and one increment under a lock. With
+METRICS_ENABLED = False every call is a no-op and no server is started.
+
+    GET http://127.0.0.1:8766/metrics        Prometheus text format
+    GET http://127.0.0.1:8766/metrics.json   rolling percentiles, counters, gauges (JSON)
+
+Press M in the attendance window to toggle the on-screen overlay.
+"""
+
+import bisect
+import json
+import threading
+import time
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+
+# Settings
+METRICS_ENABLED = True       # False = instrumentation off completely
+METRICS_HOST = "127.0.0.1"   # Local scrapers only
+METRICS_PORT = 8766          # 0 = no HTTP endpoint
+METRICS_OVERLAY = False      # Start with the on-screen overlay visible
+WINDOW_SECONDS = 60          # Rolling window for percentiles and rates
+WINDOW_SLOTS = 6             # The window advances in WINDOW_SECONDS / WINDOW_SLOTS steps
+BUCKETS_MS = (0.5, 1, 2, 5, 10, 20, 35, 50, 75, 100, 150, 250, 500, 1000, 2500, 5000)
+PREFIX = "attendance"
+
+# Display order of the attendance stages
+STAGES = ("camera_read", "detect", "crop", "embed", "match", "cooldown", "log_write", "render")
+
+
+class Histogram:
+    """Latency histogram with lifetime bucket counts and a rolling window"""
+
+    def __init__(self, bounds_ms=BUCKETS_MS, window_seconds=WINDOW_SECONDS, slots=WINDOW_SLOTS):
+        self.bounds = [bound / 1000.0 for bound in bounds_ms]  # Seconds; last bucket is +Inf
+        self.slot_seconds = window_seconds / slots
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._slots = [[-1, [0] * (len(self.bounds) + 1), 0.0] for _ in range(slots)]  # [epoch, counts, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        bucket = bisect.bisect_left(self.bounds, seconds)
+        epoch = int(time.monotonic() // self.slot_seconds)
+        with self._lock:
+            self.counts[bucket] += 1
+            self.sum += seconds
+            self.count += 1
+            slot = self._slots[epoch % len(self._slots)]
+            if slot[0] != epoch:
+                slot[0], slot[1], slot[2] = epoch, [0] * len(self.counts), 0.0
+            slot[1][bucket] += 1
+            slot[2] += seconds
+
+    def window(self):
+        """(bucket counts, sum) over the rolling window"""
+        oldest = int(time.monotonic() // self.slot_seconds) - len(self._slots) + 1
+        counts, total = [0] * len(self.counts), 0.0
+        with self._lock:
+            for epoch, slot_counts, slot_sum in self._slots:
+                if epoch >= oldest:
+                    counts = [a + b for a, b in zip(counts, slot_counts)]
+                    total += slot_sum
+        return counts, total
+
+    def quantile(self, q, counts):
+        """Approximate quantile from bucket counts (linear within the bucket)"""
+        count = sum(counts)
+        if count == 0:
+            return 0.0
+        rank, seen = q * count, 0
+        for bucket, bucket_count in enumerate(counts):
+            if bucket_count and seen + bucket_count >= rank:
+                lower = self.bounds[bucket - 1] if bucket > 0 else 0.0
+                upper = self.bounds[bucket] if bucket < len(self.bounds) else self.bounds[-1]
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.bounds[-1]
+
+    def summary(self, window_seconds=WINDOW_SECONDS):
+        counts, total = self.window()
+        count = sum(counts)
+        return {
+            'count': count,
+            'rate_per_s': round(count / window_seconds, 2),
+            'mean_ms': round(total / count * 1000, 2) if count else 0.0,
+            'p50_ms': round(self.quantile(0.50, counts) * 1000, 2),
+            'p95_ms': round(self.quantile(0.95, counts) * 1000, 2),
+            'p99_ms': round(self.quantile(0.99, counts) * 1000, 2),
+            'total': self.count,
+        }
+
+
+class _Timer:
+    __slots__ = ("metrics", "stage", "start")
+
+    def __init__(self, metrics, stage):
+        self.metrics, self.stage = metrics, stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+class Metrics:
+    """Registry of stage histograms, counters and gauges (thread-safe)"""
+
+    enabled = True
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds):
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(stage, Histogram())
+        histogram.observe(seconds)
+
+    def time(self, stage):
+        """with metrics.time("detect"): ...  (records the block's duration)"""
+        return _Timer(self, stage)
+
+    def inc(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def set_gauge(self, name, value):
+        self.gauges[name] = value
+
+    def export(self, reset=False):
+        """Lifetime histograms and counters as plain data, for merge() in another process"""
+        stages = {}
+        with self._lock:
+            histograms = dict(self.histograms)
+            counters = dict(self.counters)
+            if reset:
+                self.counters = {}
+        for stage, histogram in histograms.items():
+            with histogram._lock:
+                stages[stage] = (list(histogram.counts), histogram.sum, histogram.count)
+                if reset:
+                    histogram.counts = [0] * len(histogram.counts)
+                    histogram.sum, histogram.count = 0.0, 0
+        return {'stages': stages, 'counters': counters}
+
+    def merge(self, exported):
+        """Add another process's export() to the lifetime totals (not to the rolling window)"""
+        for stage, (counts, total, count) in exported['stages'].items():
+            with self._lock:
+                histogram = self.histograms.setdefault(stage, Histogram())
+            with histogram._lock:
+                histogram.counts = [a + b for a, b in zip(histogram.counts, counts)]
+                histogram.sum += total
+                histogram.count += count
+        for name, amount in exported['counters'].items():
+            self.inc(name, amount)
+
+    def totals(self):
+        """Lifetime count, mean and approximate p50/p95 per stage (batch summaries)"""
+        order = {stage: i for i, stage in enumerate(STAGES)}
+        summary = {}
+        for stage, histogram in sorted(self.histograms.items(),
+                                       key=lambda item: (order.get(item[0], len(order)), item[0])):
+            with histogram._lock:
+                counts, total, count = list(histogram.counts), histogram.sum, histogram.count
+            if count:
+                summary[stage] = {'count': count, 'mean_ms': round(total / count * 1000, 2),
+                                  'p50_ms': round(histogram.quantile(0.50, counts) * 1000, 2),
+                                  'p95_ms': round(histogram.quantile(0.95, counts) * 1000, 2)}
+        return summary
+
+    def snapshot(self):
+        """Rolling percentiles per stage, counters and gauges (JSON-ready)"""
+        order = {stage: i for i, stage in enumerate(STAGES)}
+        stages = sorted(self.histograms.items(), key=lambda item: (order.get(item[0], len(order)), item[0]))
+        return {
+            'uptime_s': round(time.monotonic() - self.started, 1),
+            'window_s': WINDOW_SECONDS,
+            'stages': {stage: histogram.summary() for stage, histogram in stages},
+            'counters': dict(self.counters),
+            'gauges': dict(self.gauges),
+        }
+
+    def prometheus(self):
+        """Lifetime histograms and counters in the Prometheus text format"""
+        lines = [f"# HELP {PREFIX}_stage_seconds Time spent per attendance pipeline stage",
+                 f"# TYPE {PREFIX}_stage_seconds histogram"]
+        for stage, histogram in sorted(self.histograms.items()):
+            with histogram._lock:
+                counts, total, count = list(histogram.counts), histogram.sum, histogram.count
+            cumulative = 0
+            for bound, bucket_count in zip(histogram.bounds + [float('inf')], counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float('inf') else f"{bound:g}"
+                lines.append(f'{PREFIX}_stage_seconds_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+            lines.append(f'{PREFIX}_stage_seconds_sum{{stage="{stage}"}} {total:.6f}')
+            lines.append(f'{PREFIX}_stage_seconds_count{{stage="{stage}"}} {count}')
+        for name, value in sorted(self.counters.items()):
+            lines += [f"# TYPE {PREFIX}_{name}_total counter", f"{PREFIX}_{name}_total {value}"]
+        for name, value in sorted(self.gauges.items()):
+            lines += [f"# TYPE {PREFIX}_{name} gauge", f"{PREFIX}_{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+class NullMetrics:
+    """METRICS_ENABLED = False: same interface, nothing recorded"""
+
+    enabled = False
+    _null_timer = nullcontext()
+
+    def observe(self, stage, seconds):
+        pass
+
+    def time(self, stage):
+        return self._null_timer
+
+    def inc(self, name, amount=1):
+        pass
+
+    def set_gauge(self, name, value):
+        pass
+
+    def export(self, reset=False):
+        return {'stages': {}, 'counters': {}}
+
+    def merge(self, exported):
+        pass
+
+    def totals(self):
+        return {}
+
+    def snapshot(self):
+        return {'stages': {}, 'counters': {}, 'gauges': {}}
+
+    def prometheus(self):
+        return ""
+
+
+metrics = Metrics() if METRICS_ENABLED else NullMetrics()
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def _reply(self, body, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            self._reply(metrics.prometheus().encode(), "text/plain; version=0.0.4")
+        elif self.path == "/metrics.json":
+            self._reply(json.dumps(metrics.snapshot()).encode(), "application/json")
+        else:
+            self.send_error(404)
+
+    def log_message(self, format, *args):
+        pass  # Keep the console for attendance output
+
+
+def start_metrics_server(host=METRICS_HOST, port=METRICS_PORT):
+    """Serve /metrics and /metrics.json on a daemon thread; returns the URL or None"""
+    if not metrics.enabled or not port:
+        return None
+    try:
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+    except OSError as e:
+        print(f"⚠ Metrics endpoint not started ({host}:{port}: {e})")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://{host}:{port}/metrics"
+
+
+def draw_overlay(display, x=10, y=90):
+    """Per-stage p50/p95 and counters in a translucent box on the preview"""
+    if not metrics.enabled:
+        return
+    snapshot = metrics.snapshot()
+    lines = [f"{'stage':<12}{'p50':>8}{'p95':>8}{'/s':>7}"]
+    for stage, stats in snapshot['stages'].items():
+        lines.append(f"{stage:<12}{stats['p50_ms']:>8.1f}{stats['p95_ms']:>8.1f}{stats['rate_per_s']:>7.1f}")
+    counters = snapshot['counters']
+    if counters:
+        lines.append("  ".join(f"{name}:{value}" for name, value in sorted(counters.items())))
+
+    height = 18 * len(lines) + 10
+    width = max(320, 9 * max(len(line) for line in lines))
+    region = display[y:y + height, x:x + width]
+    region[:] = (region * 0.35).astype(region.dtype)  # Darken behind the text
+    for i, line in enumerate(lines):
+        cv2.putText(display, line, (x + 5, y + 18 * (i + 1)), cv2.FONT_HERSHEY_PLAIN, 1.0,
+                    (255, 255, 255), 1)
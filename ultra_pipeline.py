@@ -0,0 +1,405 @@
+"""
+RECOGNITION PIPELINE
+Capture -> detect/track -> embed/match -> render, each on its own thread(s)
+connected by bounded queues that drop stale work instead of adding latency.
+Faces are tracked between frames, so each person is embedded once per pass.
+Several pipelines (cameras) can share one EmbedService: one loaded model and
+one batched queue, served round-robin across cameras.
+"""
+
+import queue
+import threading
+import time
+from collections import defaultdict, deque
+
+from ultra_embedder import crop_face, MAX_BATCH_SIZE
+from ultra_metrics import metrics
+from ultra_tracker import FaceTracker
+from ultra_scheduler import AdaptiveScheduler
+
+# Settings
+EMBED_WORKERS = 1           # Embedding threads sharing the loaded model
+EMBED_QUEUE_SIZE = 4        # Detected frames waiting for embedding
+DRAIN_SECONDS = 10.0        # Longest wait for queued faces when a stream ends
+
+
+class FairQueue:
+    """
+    Bounded per-source FIFOs that drop the oldest item instead of blocking
+    the producer. Batches are taken round-robin across sources, so one busy
+    camera cannot starve the others.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize  # Per source
+        self._items = {}        # source -> deque
+        self._order = deque()   # Round-robin order of sources
+        self._dropped = defaultdict(int)
+        self._pending = 0
+        self._cond = threading.Condition()
+
+    def __len__(self):
+        with self._cond:
+            return self._pending
+
+    def channel(self, source):
+        """put/len/dropped view of one source (what a single pipeline sees)"""
+        with self._cond:
+            if source not in self._items:
+                self._items[source] = deque()
+                self._order.append(source)
+        return QueueChannel(self, source)
+
+    def size(self, source):
+        with self._cond:
+            return len(self._items[source])
+
+    def dropped(self, source):
+        with self._cond:
+            return self._dropped[source]
+
+    def put(self, source, item):
+        with self._cond:
+            items = self._items[source]
+            if len(items) >= self.maxsize:
+                items.popleft()
+                self._dropped[source] += 1
+                self._pending -= 1
+            items.append(item)
+            self._pending += 1
+            self._cond.notify()
+
+    def get_batch(self, max_items, timeout=None):
+        """Wait for at least one item, then take up to max_items, one source at a time"""
+        with self._cond:
+            if not self._pending:
+                self._cond.wait(timeout)
+            batch = []
+            while self._pending and len(batch) < max_items:
+                source = self._order[0]
+                self._order.rotate(-1)
+                if self._items[source]:
+                    batch.append(self._items[source].popleft())
+                    self._pending -= 1
+            return batch
+
+    def wake_all(self):
+        with self._cond:
+            self._cond.notify_all()
+
+
+class QueueChannel:
+    """One source's side of a FairQueue"""
+
+    def __init__(self, fair_queue, source):
+        self.fair_queue = fair_queue
+        self.source = source
+
+    def __len__(self):
+        return self.fair_queue.size(self.source)
+
+    @property
+    def dropped(self):
+        return self.fair_queue.dropped(self.source)
+
+    def put(self, item):
+        self.fair_queue.put(self.source, item)
+
+
+class FrameGrabber(threading.Thread):
+    """Capture thread that always keeps only the newest camera frame"""
+
+    def __init__(self, cam, pace_fps=None):
+        """pace_fps: read at most this many frames/s (video files play in real time)"""
+        super().__init__(daemon=True)
+        self.cam = cam
+        self.pace_fps = pace_fps
+        self.frame_id = 0
+        self.dropped = 0
+        self.failed = False
+        self._frame = None
+        self._consumed = True
+        self._cond = threading.Condition()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        next_read = time.monotonic()
+        while not self._stop_event.is_set():
+            if self.pace_fps:
+                next_read += 1.0 / self.pace_fps
+                if self._stop_event.wait(max(0.0, next_read - time.monotonic())):
+                    return
+            start = time.perf_counter()
+            ret, frame = self.cam.read()
+            metrics.observe("camera_read", time.perf_counter() - start)
+            with self._cond:
+                if not ret:
+                    self.failed = True
+                    self._cond.notify_all()
+                    return
+                if not self._consumed:
+                    self.dropped += 1  # Nobody looked at the previous frame
+                self._frame = frame
+                self._consumed = False
+                self.frame_id += 1
+                self._cond.notify_all()
+
+    def latest(self, after_id=-1, timeout=1.0):
+        """Newest (frame_id, frame), waiting until one newer than after_id arrives"""
+        with self._cond:
+            self._cond.wait_for(lambda: self.frame_id > after_id or self.failed, timeout)
+            self._consumed = True
+            return self.frame_id, self._frame
+
+    def stop(self):
+        self._stop_event.set()
+
+
+class FaceJob:
+    """Tracked faces from one frame, waiting for embedding"""
+
+    def __init__(self, owner, frame_id, track_ids, crops):
+        self.owner = owner  # Pipeline that gets the results
+        self.frame_id = frame_id
+        self.track_ids = track_ids
+        self.crops = crops
+        self.created = time.perf_counter()
+
+
+class FrameResult:
+    """Recognition results for one frame: list of (track_id, match) pairs"""
+
+    def __init__(self, frame_id, faces, latency, error=None):
+        self.frame_id = frame_id
+        self.faces = faces
+        self.latency = latency
+        self.error = error
+
+
+class EmbedService:
+    """
+    Embedding worker pool around one loaded model.
+    embed_fn(crops) -> embeddings, match_fn(embeddings) -> list of
+    (best_id, best, second_best). Faces from all attached pipelines are
+    embedded together, one forward pass per batch.
+    """
+
+    def __init__(self, embed_fn, match_fn, workers=EMBED_WORKERS,
+                 queue_size=EMBED_QUEUE_SIZE, max_batch_size=MAX_BATCH_SIZE):
+        self.embed_fn = embed_fn
+        self.match_fn = match_fn
+        self.workers = workers
+        self.max_batch_size = max_batch_size
+        self.queue = FairQueue(queue_size)
+        self.faces_embedded = 0
+        self._stop_event = threading.Event()
+        self._threads = []
+
+    def start(self):
+        for _ in range(self.workers):
+            thread = threading.Thread(target=self._embed_loop, daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self.queue.wake_all()
+        for thread in self._threads:
+            thread.join(timeout=2)
+
+    def _embed_loop(self):
+        while not self._stop_event.is_set():
+            jobs = self.queue.get_batch(self.max_batch_size, timeout=0.5)
+            if not jobs:
+                continue
+
+            # One forward pass for the faces of several frames (and cameras) at once
+            crops = [crop for job in jobs for crop in job.crops]
+            matches, error, seconds = [], None, 0.0
+            if crops:
+                start = time.perf_counter()
+                try:
+                    embeddings = self.embed_fn(crops)
+                    embedded = time.perf_counter()
+                    matches = self.match_fn(embeddings)
+                    metrics.observe("embed", embedded - start)
+                    metrics.observe("match", time.perf_counter() - embedded)
+                except Exception as e:
+                    matches, error = [None] * len(crops), e
+                seconds = time.perf_counter() - start
+                self.faces_embedded += len(crops)
+
+            # Hand each pipeline its share of the batch
+            start = 0
+            by_owner = defaultdict(list)
+            for job in jobs:
+                by_owner[job.owner].append((job, matches[start:start + len(job.track_ids)]))
+                start += len(job.track_ids)
+            for owner, owner_jobs in by_owner.items():
+                faces = sum(len(job.track_ids) for job, _ in owner_jobs)
+                owner.finish_jobs(owner_jobs, error, seconds * faces / max(len(crops), 1))
+
+
+class RecognitionPipeline:
+    """
+    Detection/tracking thread feeding an embedding service.
+    detect_fn(frame) -> boxes, embed_fn(crops) -> embeddings,
+    match_fn(embeddings) -> list of (best_id, best, second_best),
+    confirm_fn(match) -> True if the match is confident (no fast retry).
+    Pass embed_service to share one model between several cameras
+    (embed_fn/match_fn are then unused); otherwise a private one is created.
+    When detection runs is decided by the AdaptiveScheduler.
+    """
+
+    def __init__(self, detect_fn, embed_fn=None, match_fn=None, confirm_fn=None, tracker=None,
+                 scheduler=None, embed_workers=EMBED_WORKERS,
+                 queue_size=EMBED_QUEUE_SIZE, max_batch_size=MAX_BATCH_SIZE, embed_service=None):
+        self.detect_fn = detect_fn
+        self.confirm_fn = confirm_fn or (lambda match: True)
+        self.tracker = tracker or FaceTracker()
+        self.scheduler = scheduler or AdaptiveScheduler()
+
+        self._owns_service = embed_service is None
+        self.embed_service = embed_service or EmbedService(embed_fn, match_fn, embed_workers,
+                                                           queue_size, max_batch_size)
+        self.embed_queue = self.embed_service.queue.channel(self)
+        self.results = queue.Queue()
+        self.frames_dropped = 0  # Frames replaced while a detection pass was overdue
+        self.faces_embedded = 0
+        self._jobs_put = 0       # Jobs handed to the embedding service ...
+        self._jobs_done = 0      # ... and those whose results are in self.results
+        self._detecting = False
+
+        self._track_lock = threading.Lock()
+
+        self._frame = None
+        self._frame_cond = threading.Condition()
+        self._stop_event = threading.Event()
+        self._threads = []
+
+    def start(self):
+        self._threads.append(threading.Thread(target=self._detect_loop, daemon=True))
+        for thread in self._threads:
+            thread.start()
+        if self._owns_service:
+            self.embed_service.start()
+
+    def stop(self):
+        self._stop_event.set()
+        with self._frame_cond:
+            self._frame_cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=2)
+        if self._owns_service:
+            self.embed_service.stop()
+
+    def submit(self, frame_id, frame):
+        """Hand a captured frame to the detection stage (never blocks)"""
+        with self._frame_cond:
+            if self._frame is not None and self.scheduler.is_due():
+                self.frames_dropped += 1
+            self._frame = (frame_id, frame)
+            self._frame_cond.notify()
+
+    def poll_results(self):
+        """All results finished since the last call (never blocks)"""
+        finished = []
+        while True:
+            try:
+                finished.append(self.results.get_nowait())
+            except queue.Empty:
+                return finished
+
+    def idle(self):
+        """True when every submitted frame is detected and its faces matched (results wait in poll_results())"""
+        with self._frame_cond:
+            if self._frame is not None or self._detecting:
+                return False
+        with self._track_lock:
+            return self._jobs_put == self._jobs_done + self.embed_queue.dropped
+
+    def drain(self, timeout=DRAIN_SECONDS):
+        """Wait (up to timeout) for work already submitted, then return all results"""
+        deadline = time.monotonic() + timeout
+        while not self.idle() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return self.poll_results()
+
+    def tracks(self):
+        """Snapshot of live tracks as (track_id, box) pairs, for rendering"""
+        with self._track_lock:
+            return [(t.track_id, t.box) for t in self.tracker.tracks.values()]
+
+    def stats(self):
+        return {
+            'embed_queue': len(self.embed_queue),
+            'embed_dropped': self.embed_queue.dropped,
+            'frames_dropped': self.frames_dropped,
+            'faces_embedded': self.faces_embedded,
+            'tracks': len(self.tracker.tracks),
+        }
+
+    def _detect_loop(self):
+        while not self._stop_event.is_set():
+            with self._frame_cond:
+                self._frame_cond.wait_for(
+                    lambda: self._frame is not None or self._stop_event.is_set())
+                if self._stop_event.is_set():
+                    return
+
+            # Wait until the scheduler says the next pass is due (newer frames keep replacing)
+            delay = self.scheduler.next_detect - time.monotonic()
+            if delay > 0 and self._stop_event.wait(delay):
+                return
+            with self._frame_cond:
+                frame_id, frame = self._frame
+                self._frame = None
+                self._detecting = True
+
+            start = time.perf_counter()
+            boxes = [tuple(int(v) for v in box) for box in self.detect_fn(frame)]
+            detect_seconds = time.perf_counter() - start
+            metrics.observe("detect", detect_seconds)
+            metrics.inc("faces_detected", len(boxes))
+
+            with self._track_lock:
+                need_embedding = self.tracker.update(
+                    boxes, time.monotonic(),
+                    reverify=self.scheduler.allow_reverify(len(self.embed_queue)))
+                wanted = [(t.track_id, t.box) for t in need_embedding]
+                unconfirmed = sum(1 for t in self.tracker.tracks.values() if t.missed == 0 and not t.confirmed)
+            self.scheduler.record_detection(detect_seconds, len(boxes), unconfirmed)
+
+            # Only new (or re-verified) tracks are sent to the model
+            if wanted:
+                start = time.perf_counter()
+                crops = [crop_face(frame, box) for _, box in wanted]
+                metrics.observe("crop", time.perf_counter() - start)
+                with self._track_lock:
+                    self._jobs_put += 1
+                self.embed_queue.put(FaceJob(self, frame_id, [track_id for track_id, _ in wanted], crops))
+            with self._frame_cond:
+                self._detecting = False
+
+    def finish_jobs(self, jobs, error, seconds):
+        """
+        Called by the embedding service with this pipeline's (job, matches)
+        pairs from one batch and this pipeline's share of its inference time.
+        """
+        faces_count = sum(len(job.track_ids) for job, _ in jobs)
+        if faces_count:
+            self.scheduler.record_embedding(seconds, faces_count)
+            self.faces_embedded += faces_count
+
+        done = time.perf_counter()
+        now = time.monotonic()
+        for job, job_matches in jobs:
+            faces = []
+            with self._track_lock:
+                for track_id, match in zip(job.track_ids, job_matches):
+                    confirmed = match is not None and self.confirm_fn(match)
+                    if self.tracker.assign(track_id, match, now, confirmed):
+                        faces.append((track_id, match))
+            self.results.put(FrameResult(job.frame_id, faces, done - job.created, error))
+            with self._track_lock:
+                self._jobs_done += 1  # Only after the result is visible to poll_results()
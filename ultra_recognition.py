@@ -0,0 +1,53 @@
+"""
+RECOGNITION SETTINGS & HELPERS
+Shared by live attendance (ultra_attendance.py) and headless batch
+processing (ultra_batch.py): detection, match decision, attendance rows
+(written through ultra_store.py)
+"""
+
+from ultra_detector import create_detector
+from ultra_embedder import check_gallery_model
+from ultra_matcher import GalleryMatcher, is_confident_match
+from ultra_index import load_index
+
+# Settings
+SIMILARITY_THRESHOLD = 0.35
+CONFIDENCE_MARGIN = 0.12
+COOLDOWN_MINUTES = 5  # Cooldown period in minutes
+
+
+def build_matcher(gallery):
+    """Matcher over a loaded gallery, using the saved search index if it fits"""
+    check_gallery_model(gallery.header)  # Raises ValueError for another backend/model
+    matcher = GalleryMatcher.from_gallery(gallery)
+    index = load_index(gallery.embeddings, gallery.ids, sq_norms=gallery.sq_norms)
+    if index is not None:
+        matcher.use_index(index)
+    return matcher
+
+
+def create_face_detector(**options):
+    """Detector configured in ultra_detector.py: detect(frame) -> list of (x, y, w, h)"""
+    return create_detector(**options)
+
+
+def is_confident(match):
+    """Match tuple (best_id, best, second_best) passes threshold AND margin"""
+    return match is not None and is_confident_match(match[1], match[2], SIMILARITY_THRESHOLD, CONFIDENCE_MARGIN)
+
+
+def similarity_percent(distance):
+    return (1 - distance) * 100
+
+
+def attendance_row(person_id, person_name, when, mode, distance, model_name):
+    """One CSV row: ID, Name, Date, Time, Type, Similarity, Model"""
+    return [
+        person_id,
+        person_name,
+        when.strftime("%Y-%m-%d"),
+        when.strftime("%H:%M:%S"),
+        mode,  # ENTRY or EXIT
+        f"{similarity_percent(distance):.2f}%",
+        model_name
+    ]
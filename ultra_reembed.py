@@ -0,0 +1,245 @@
+"""
+RE-EMBEDDING (model migration)
+Recomputes every student's embeddings from the face crops already saved in
+face_database/ (sample_*.jpg), so switching models or DeepFace versions
+needs no new webcam session.
+
+    python ultra_reembed.py                          # re-embed with MODEL_NAME, rebuild pkls + gallery
+    python ultra_reembed.py --workers 4
+    python ultra_reembed.py --model Facenet512 --cache-only   # warm the cache for a future switch
+
+Embeddings are cached per (image content hash, backend, model,
+preprocessing version) in embedding_cache/, so reruns, interrupted runs
+and partial migrations only compute what is missing. To switch models or
+backends: set MODEL_NAME / EMBED_BACKEND in ultra_embedder.py, then run
+this script. If a student's crops cannot be re-embedded, the gallery is not
+rebuilt (their old embeddings.pkl would drop them from it) unless
+--drop-failed is given.
+"""
+
+import argparse
+import os
+import pickle
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+import numpy as np
+
+from ultra_embedder import embed_faces, get_model, EMBED_BACKEND, MODEL_NAME, PREPROCESS_VERSION, MAX_BATCH_SIZE
+from ultra_enroll import split_label
+from ultra_train import file_sha256, load_person, train, DATABASE_PATH
+
+# Settings
+CACHE_DIR = "embedding_cache"
+REEMBED_WORKERS = None            # Worker processes (None = one per CPU core)
+CHUNK_SIZE = 2 * MAX_BATCH_SIZE   # Crops per worker task
+
+_worker = {}  # Per-process state, filled by init_worker()
+
+
+def cache_path(sha256, model_name, preprocess_version=PREPROCESS_VERSION, cache_dir=CACHE_DIR,
+               backend=EMBED_BACKEND):
+    """embedding_cache/{backend}-{model}/p{version}/ab/abcdef....npy"""
+    model_dir = re.sub(r'[^A-Za-z0-9._-]', '_', f"{backend}-{model_name}")
+    return os.path.join(cache_dir, model_dir, f"p{preprocess_version}", sha256[:2], sha256 + ".npy")
+
+
+def init_worker(model_name, threads):
+    """Load the model once per worker process"""
+    cv2.setNumThreads(1)
+
+    _worker['model_name'] = model_name
+    get_model(model_name, intra_threads=threads, inter_threads=1)  # Cores are split between workers
+
+
+def embed_chunk(items):
+    """
+    Embed [(sha256, path)] and store each result in the cache (runs in a
+    worker process). Returns (number cached, [(path, reason)]).
+    """
+    model_name = _worker['model_name']
+    crops, readable, failures = [], [], []
+    for sha256, path in items:
+        crop = cv2.imread(path)
+        if crop is None:
+            failures.append((path, "unreadable image"))
+            continue
+        crops.append(crop)
+        readable.append((sha256, path))
+
+    cached = 0
+    embeddings = embed_faces(crops, model_name) if crops else []
+    for (sha256, path), embedding in zip(readable, embeddings):
+        if not np.all(np.isfinite(embedding)) or not np.any(embedding):
+            failures.append((path, "invalid embedding"))
+            continue
+        target = cache_path(sha256, model_name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target + ".tmp", 'wb') as f:
+            np.save(f, np.asarray(embedding, dtype=np.float32))
+        os.replace(target + ".tmp", target)  # A half-written file is never a cache hit
+        cached += 1
+    return cached, failures
+
+
+def sample_number(filename):
+    match = re.match(r'sample_(\d+)\.jpg$', filename)
+    return int(match.group(1)) if match else None
+
+
+def scan_database(database_path=DATABASE_PATH):
+    """[(folder, [(sha256, path)])] for every person folder with sample crops"""
+    people = []
+    for folder in sorted(os.listdir(database_path)):
+        folder_path = os.path.join(database_path, folder)
+        if not os.path.isdir(folder_path):
+            continue
+        numbered = sorted((sample_number(f), f) for f in os.listdir(folder_path) if sample_number(f) is not None)
+        samples = [(file_sha256(os.path.join(folder_path, f)), os.path.join(folder_path, f)) for _, f in numbered]
+        if samples:
+            people.append((folder, samples))
+    return people
+
+
+def write_person(folder_path, folder, samples, model_name):
+    """
+    Rebuild one embeddings.pkl from cached embeddings. Returns "written",
+    "unchanged" or "failed" (no usable sample).
+    """
+    embedding_file = os.path.join(folder_path, "embeddings.pkl")
+    old = {}
+    if os.path.exists(embedding_file):
+        try:
+            with open(embedding_file, 'rb') as f:
+                old = pickle.load(f)
+        except Exception:
+            old = {}
+
+    usable = [(sha256, cache_path(sha256, model_name)) for sha256, _ in samples]
+    usable = [(sha256, path) for sha256, path in usable if os.path.exists(path)]
+    if not usable:
+        return "failed"
+    hashes = [sha256 for sha256, _ in usable]
+    if old.get('model') == model_name and old.get('backend') == EMBED_BACKEND and \
+            old.get('preprocess_version') == PREPROCESS_VERSION and \
+            old.get('sample_hashes') == hashes:
+        return "unchanged"  # Keeps the file (and train's manifest entry) as it is
+
+    embeddings = [np.load(path) for _, path in usable]
+    person_id, name = split_label(folder)
+    with open(embedding_file + ".tmp", 'wb') as f:
+        pickle.dump({
+            'name': old.get('name', name),
+            'id': old.get('id', person_id),
+            'embeddings': embeddings,
+            'average_embedding': np.mean(embeddings, axis=0),
+            'model': model_name,
+            'backend': EMBED_BACKEND,
+            'preprocess_version': PREPROCESS_VERSION,
+            'sample_hashes': hashes
+        }, f)
+    os.replace(embedding_file + ".tmp", embedding_file)
+    return "written"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--workers", type=int, default=REEMBED_WORKERS)
+    parser.add_argument("--cache-only", action="store_true",
+                        help="only fill the cache; leave embeddings.pkl files and the gallery alone")
+    parser.add_argument("--drop-failed", action="store_true",
+                        help="rebuild the gallery even if some students could not be re-embedded (they are left out)")
+    args = parser.parse_args()
+
+    print("="*70)
+    print(f"RE-EMBEDDING ({args.model} via {EMBED_BACKEND}, preprocessing v{PREPROCESS_VERSION})")
+    print("="*70)
+
+    if args.model != MODEL_NAME and not args.cache_only:
+        print(f"✗ Attendance embeds with MODEL_NAME = {MODEL_NAME!r}; a {args.model} gallery would never match.")
+        print(f"  Set MODEL_NAME = {args.model!r} in ultra_embedder.py first, or add --cache-only.")
+        return
+    if not os.path.isdir(DATABASE_PATH):
+        print("✗ No database found. Register people first.")
+        return
+
+    started = time.perf_counter()
+    people = scan_database()
+    unique = {}
+    for _, samples in people:
+        for sha256, path in samples:
+            unique.setdefault(sha256, path)  # Identical crops are embedded once
+    missing = [(sha256, path) for sha256, path in unique.items()
+               if not os.path.exists(cache_path(sha256, args.model))]
+    print(f"Persons: {len(people)} | Crops: {sum(len(s) for _, s in people)} ({len(unique)} unique) | "
+          f"Cached: {len(unique) - len(missing)} | To embed: {len(missing)}")
+
+    failures = []
+    if missing:
+        chunks = [missing[i:i + CHUNK_SIZE] for i in range(0, len(missing), CHUNK_SIZE)]
+        workers = min(args.workers or os.cpu_count() or 1, len(chunks))
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        print(f"Workers: {workers} ({threads} thread(s) each)\n")
+
+        embedded, embed_started = 0, time.perf_counter()
+        try:
+            with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                     initargs=(args.model, threads)) as pool:
+                futures = [pool.submit(embed_chunk, chunk) for chunk in chunks]
+                for future in as_completed(futures):
+                    count, chunk_failures = future.result()
+                    embedded += count
+                    failures += chunk_failures
+                    rate = embedded / max(time.perf_counter() - embed_started, 1e-9)
+                    print(f"  ⏳ {embedded}/{len(missing)} crops ({rate:.1f}/s)", end="\r")
+        except KeyboardInterrupt:
+            print("\n⚠ Interrupted - finished crops are cached; run the same command again to continue")
+            return
+        print(f"\n✓ Embedded {embedded} crop(s) in {time.perf_counter() - embed_started:.1f} s")
+        for path, reason in failures[:10]:
+            print(f"  ✗ {path}: {reason}")
+        if len(failures) > 10:
+            print(f"  ... and {len(failures) - 10} more")
+
+    if args.cache_only:
+        print(f"\n✓ Cache ready for {args.model} ({CACHE_DIR}/)")
+        return
+
+    outcomes = {"written": 0, "unchanged": 0, "failed": 0}
+    stale = []  # Folders whose embeddings.pkl is still from another model/backend
+    for folder, samples in people:
+        folder_path = os.path.join(DATABASE_PATH, folder)
+        outcome = write_person(folder_path, folder, samples, args.model)
+        outcomes[outcome] += 1
+        if outcome == "failed":
+            print(f"  ✗ {folder}: no usable sample, embeddings.pkl left as it was")
+            if load_person(os.path.join(folder_path, "embeddings.pkl"))['error']:
+                stale.append(folder)
+    print(f"✓ embeddings.pkl: {outcomes['written']} rewritten, {outcomes['unchanged']} unchanged, "
+          f"{outcomes['failed']} failed")
+
+    # Training would leave these students out of the gallery: they could no longer check in
+    if stale and not args.drop_failed:
+        print(f"\n✗ {len(stale)} student(s) have no {args.model} embeddings - gallery NOT rebuilt:")
+        for folder in stale:
+            print(f"  - {folder}")
+        print("  Re-register them (python ultra_enroll.py) and run this again, or add --drop-failed")
+        print("  to rebuild without them.")
+        return
+
+    print("\n⏳ Rebuilding gallery...")
+    report = train()
+    header = report['header']
+    print(f"✓ Gallery: {report['persons']} person(s), {header['dim']}-d, {header['model']} "
+          f"(rebuilt {report['rebuilt']}, reused {report['reused']}, failed {report['failed']})")
+    for folder in stale:
+        print(f"  ⚠ Removed from the gallery: {folder} (re-register to restore)")
+    print(f"  Total time: {time.perf_counter() - started:.1f} s")
+    print(f"\nNext: python ultra_attendance.py")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,132 @@
 """
 ULTRA-ACCURATE FACE REGISTRATION
-Uses DeepFace with VGG-Face model for extreme accuracy
+Uses DeepFace (MODEL_NAME in ultra_embedder.py, VGG-Face by default) for extreme accuracy
 Can distinguish twins!
 """
 
 import cv2
 import os
-from deepface import DeepFace
+import queue
+import threading
 import numpy as np
 import pickle
+from ultra_embedder import crop_face, get_embedder, MODEL_NAME, EMBED_BACKEND, PREPROCESS_VERSION
+from ultra_recognition import create_face_detector
 
 # Settings
 DATABASE_PATH = "face_database"
 SAMPLES_PER_PERSON = 10  # Increased to 10 for better accuracy
 
+INSTRUCTIONS = [
+    "Look STRAIGHT, NEUTRAL expression",
+    "Look STRAIGHT, SMILE",
+    "Turn head SLIGHTLY LEFT",
+    "Turn head SLIGHTLY RIGHT",
+    "Look UP slightly",
+    "Look DOWN slightly",
+    "SERIOUS expression, front",
+    "SMILE BIG, front",
+    "Turn LEFT, smile",
+    "Turn RIGHT, smile",
+]
+
+# Sample states (colour of its marker in the preview, BGR)
+EMPTY, EMBEDDING, DONE, FAILED = "empty", "embedding", "done", "failed"
+STATUS_COLORS = {EMPTY: (128, 128, 128), EMBEDDING: (0, 200, 255), DONE: (0, 255, 0), FAILED: (0, 0, 255)}
+
+
+class SampleEmbedder:
+    """
+    Embeds captured crops on a background thread, so the preview never
+    waits for the model. Crops that pile up are embedded in one batch.
+    """
+
+    def __init__(self, embedder, samples):
+        self.embedder = embedder
+        self.status = [EMPTY] * samples
+        self.embeddings = [None] * samples
+        self.ready = False          # Model loaded (or server reached)
+        self._jobs = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, slot, crop):
+        with self._lock:
+            self.status[slot] = EMBEDDING
+            self.embeddings[slot] = None
+        self._jobs.put((slot, crop))
+
+    def next_slot(self):
+        """First sample that still needs a photo (never taken, or failed), else None"""
+        with self._lock:
+            for slot, status in enumerate(self.status):
+                if status in (EMPTY, FAILED):
+                    return slot
+        return None
+
+    def complete(self):
+        with self._lock:
+            return all(status == DONE for status in self.status)
+
+    def counts(self):
+        with self._lock:
+            return {state: self.status.count(state) for state in STATUS_COLORS}
+
+    def _run(self):
+        try:
+            self.embedder.embed_faces([])  # Load the model before the first photo is taken
+        except Exception as e:
+            print(f"    ⚠ Model warm-up failed: {e}")
+        self.ready = True
+
+        while True:
+            jobs = [self._jobs.get()]
+            while True:
+                try:
+                    jobs.append(self._jobs.get_nowait())
+                except queue.Empty:
+                    break
+            # A re-taken photo replaces a crop still waiting for the same sample
+            latest = {slot: crop for slot, crop in jobs}
+            slots = sorted(latest)
+
+            try:
+                embeddings = self.embedder.embed_faces([latest[slot] for slot in slots])
+                error = None
+            except Exception as e:
+                embeddings, error = None, e
+
+            with self._lock:
+                for i, slot in enumerate(slots):
+                    if error is None and np.all(np.isfinite(embeddings[i])) and np.any(embeddings[i]):
+                        self.embeddings[slot] = embeddings[i]
+                        self.status[slot] = DONE
+                    else:
+                        self.status[slot] = FAILED
+            for slot in slots:
+                if self.status[slot] == DONE:
+                    print(f"    ✓ Embedding {slot + 1}/{len(self.status)} generated")
+                else:
+                    print(f"    ✗ Embedding {slot + 1}/{len(self.status)} failed "
+                          f"({error or 'invalid embedding'}) - please retake photo {slot + 1}")
+
+
+def draw_status(display, sample_embedder):
+    """One marker per sample along the bottom edge: grey, orange (embedding), green, red"""
+    height = display.shape[0]
+    for slot, status in enumerate(sample_embedder.status):
+        x = 10 + slot * 28
+        cv2.rectangle(display, (x, height - 34), (x + 22, height - 12), STATUS_COLORS[status], -1)
+        cv2.putText(display, str(slot + 1), (x + 3, height - 17),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 0, 0), 1)
+
+
 os.makedirs(DATABASE_PATH, exist_ok=True)
 
 print("="*70)
 print("ULTRA-ACCURATE FACE REGISTRATION")
-print("Uses Deep Learning (VGG-Face)")
+print(f"Uses Deep Learning ({MODEL_NAME})")
 print("="*70)
 
 person_name = input("\nEnter person's name: ").strip()
@@ -36,50 +144,43 @@ print("  - Different lighting positions")
 print("\nPress SPACE to capture each photo")
 print("Press ESC to cancel\n")
 
+# Warm model server if one is running (no TensorFlow start-up), else the model loads here
+embedder = get_embedder()
+print(f"Embedding backend: {embedder.kind}\n")
+
 cam = cv2.VideoCapture(0)
-face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+detect_faces = create_face_detector(roi=None, min_face_size=60)  # Whole frame: the person sits in front
 
-captured = 0
-embeddings = []
+samples = SampleEmbedder(embedder, SAMPLES_PER_PERSON)
 
-while captured < SAMPLES_PER_PERSON:
+while not samples.complete():
     ret, frame = cam.read()
     if not ret:
         break
 
     # Detect face
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    faces = face_cascade.detectMultiScale(gray, 1.3, 5)
+    faces = detect_faces(frame)
 
     # Draw instructions
     display = frame.copy()
+    slot = samples.next_slot()
 
-    # Updated instructions for 10 photos
-    if captured == 0:
-        instruction = "Photo 1: Look STRAIGHT, NEUTRAL expression"
-    elif captured == 1:
-        instruction = "Photo 2: Look STRAIGHT, SMILE"
-    elif captured == 2:
-        instruction = "Photo 3: Turn head SLIGHTLY LEFT"
-    elif captured == 3:
-        instruction = "Photo 4: Turn head SLIGHTLY RIGHT"
-    elif captured == 4:
-        instruction = "Photo 5: Look UP slightly"
-    elif captured == 5:
-        instruction = "Photo 6: Look DOWN slightly"
-    elif captured == 6:
-        instruction = "Photo 7: SERIOUS expression, front"
-    elif captured == 7:
-        instruction = "Photo 8: SMILE BIG, front"
-    elif captured == 8:
-        instruction = "Photo 9: Turn LEFT, smile"
+    if slot is not None:
+        retake = " (RETAKE)" if samples.status[slot] == FAILED else ""
+        instruction = f"Photo {slot + 1}: {INSTRUCTIONS[slot % len(INSTRUCTIONS)]}{retake}"
+        prompt = f"Photo {slot + 1}/{SAMPLES_PER_PERSON} - Press SPACE"
     else:
-        instruction = "Photo 10: Turn RIGHT, smile"
+        # Every photo taken - preview stays live while the last embeddings finish
+        instruction = "All photos taken - finishing embeddings..."
+        prompt = f"Embedded {samples.counts()[DONE]}/{SAMPLES_PER_PERSON}"
+    if not samples.ready:
+        prompt += " (model loading)"
 
     cv2.putText(display, instruction, (10, 30),
                cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-    cv2.putText(display, f"Photo {captured + 1}/{SAMPLES_PER_PERSON} - Press SPACE", (10, 60),
+    cv2.putText(display, prompt, (10, 60),
                cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+    draw_status(display, samples)
 
     # Draw face rectangle
     for (x, y, w, h) in faces:
@@ -95,45 +196,22 @@ while captured < SAMPLES_PER_PERSON:
         cv2.destroyAllWindows()
         exit()
 
-    elif key == 32:  # SPACE
+    elif key == 32 and slot is not None:  # SPACE
         if len(faces) == 1:  # Only one face
             # Extract ONLY the face region with minimal margin
             (x, y, w, h) = faces[0]
 
-            # Small margin to avoid cutting face, but minimize background
-            margin = 10
-            x1 = max(0, x - margin)
-            y1 = max(0, y - margin)
-            x2 = min(frame.shape[1], x + w + margin)
-            y2 = min(frame.shape[0], y + h + margin)
-
-            # Extract and resize face to standard size
-            face_only = frame[y1:y2, x1:x2]
-            face_resized = cv2.resize(face_only, (224, 224))
+            # Extract and resize face to standard size (small margin, minimal background)
+            face_resized = crop_face(frame, (x, y, w, h))
 
             # Save the cropped face (NOT the whole frame!)
-            filename = os.path.join(person_folder, f"sample_{captured + 1}.jpg")
+            filename = os.path.join(person_folder, f"sample_{slot + 1}.jpg")
             cv2.imwrite(filename, face_resized)
 
-            print(f"  ✓ Captured photo {captured + 1}/{SAMPLES_PER_PERSON} (cropped to face only)")
-
-            # Generate embedding using DeepFace
-            try:
-                print(f"    Generating deep learning embedding...")
-                embedding = DeepFace.represent(
-                    img_path=filename,
-                    model_name="VGG-Face",  # Best for accuracy
-                    enforce_detection=False
-                )[0]["embedding"]
-
-                embeddings.append(embedding)
-                print(f"    ✓ Embedding generated (4096 dimensions)")
-
-            except Exception as e:
-                print(f"    ✗ Error: {e}")
-                continue
+            print(f"  ✓ Captured photo {slot + 1}/{SAMPLES_PER_PERSON} (cropped to face only)")
 
-            captured += 1
+            # Embedding runs in the background (in-memory crop, no re-detection)
+            samples.submit(slot, face_resized)
 
             # Flash effect
             cv2.rectangle(display, (0, 0), (display.shape[1], display.shape[0]),
@@ -146,15 +224,19 @@ while captured < SAMPLES_PER_PERSON:
 cam.release()
 cv2.destroyAllWindows()
 
-if len(embeddings) == SAMPLES_PER_PERSON:
-    # Save embeddings
+if samples.complete():
+    # Save embeddings (only now that every sample has one)
+    embeddings = samples.embeddings
     embedding_file = os.path.join(person_folder, "embeddings.pkl")
     with open(embedding_file, 'wb') as f:
         pickle.dump({
             'name': person_name,
             'id': person_id,
             'embeddings': embeddings,
-            'average_embedding': np.mean(embeddings, axis=0)
+            'average_embedding': np.mean(embeddings, axis=0),
+            'model': MODEL_NAME,
+            'backend': EMBED_BACKEND,
+            'preprocess_version': PREPROCESS_VERSION
         }, f)
 
     print(f"\n✓ Registration complete!")
@@ -164,4 +246,4 @@ if len(embeddings) == SAMPLES_PER_PERSON:
     print(f"  Quality: ULTRA-HIGH (Deep Learning)")
     print(f"\nNext: python ultra_train.py")
 else:
-    print(f"\n✗ Registration incomplete ({len(embeddings)}/{SAMPLES_PER_PERSON})")
\ No newline at end of file
+    print(f"\n✗ Registration incomplete ({samples.counts()[DONE]}/{SAMPLES_PER_PERSON})")
@@ -11,9 +11,9 @@ print("UNIVERSITY ATTENDANCE SYSTEM - RESET")
 print("="*70)
 print("\nThis will DELETE:")
 print("  - All registered students (face_database/)")
-print("  - Trained model (ultra_database.pkl)")
-print("  - Attendance records (attendance_log.csv)")
-print("  - All cooldown trackers (cooldown_*.pkl)")
+print("  - Trained model (ultra_gallery/, ultra_index.npz, ultra_database.pkl, embedding_cache/)")
+print("  - Attendance records (attendance.db, attendance_log.csv)")
+print("  - All cooldown trackers (cooldown_*.log, cooldown_*.pkl)")
 print("\n" + "="*70)
 
 response = input("\nType 'YES' to confirm: ").strip()
@@ -29,24 +29,59 @@ if os.path.exists('face_database'):
     shutil.rmtree('face_database')
     print("✓ Deleted face_database/")
 
-# Delete trained model
+# Delete trained gallery
+if os.path.exists('ultra_gallery'):
+    shutil.rmtree('ultra_gallery')
+    print("✓ Deleted ultra_gallery/")
+
+# Delete old pickle database if it exists
 if os.path.exists('ultra_database.pkl'):
     os.remove('ultra_database.pkl')
-    print("✓ Deleted ultra_database.pkl")
+    print("✓ Deleted ultra_database.pkl (old)")
+
+# Delete training manifest
+if os.path.exists('train_manifest.json'):
+    os.remove('train_manifest.json')
+    print("✓ Deleted train_manifest.json")
+
+# Delete re-embedding cache
+if os.path.exists('embedding_cache'):
+    shutil.rmtree('embedding_cache')
+    print("✓ Deleted embedding_cache/")
+
+# Delete search index
+if os.path.exists('ultra_index.npz'):
+    os.remove('ultra_index.npz')
+    print("✓ Deleted ultra_index.npz")
 
 # Delete attendance
-if os.path.exists('attendance_log.csv'):
-    os.remove('attendance_log.csv')
-    print("✓ Deleted attendance_log.csv")
+for log_file in ('attendance_log.csv', 'attendance_log.csv.idx.jsonl', 'attendance_log.csv.idx.json'):
+    if os.path.exists(log_file):
+        os.remove(log_file)
+        print(f"✓ Deleted {log_file}")
+
+# Delete attendance analytics cache (plus the old single-pickle cache)
+if os.path.exists('attendance_analytics'):
+    shutil.rmtree('attendance_analytics')
+    print("✓ Deleted attendance_analytics/")
+if os.path.exists('attendance_analytics.pkl'):
+    os.remove('attendance_analytics.pkl')
+    print("✓ Deleted attendance_analytics.pkl (old)")
+
+# Delete attendance database (plus SQLite WAL files)
+for db_file in ('attendance.db', 'attendance.db-wal', 'attendance.db-shm'):
+    if os.path.exists(db_file):
+        os.remove(db_file)
+        print(f"✓ Deleted {db_file}")
 
 # Also delete old attendance file if it exists
 if os.path.exists('ultra_attendance.csv'):
     os.remove('ultra_attendance.csv')
     print("✓ Deleted ultra_attendance.csv (old)")
 
-# Delete all cooldown tracker files
+# Delete all cooldown journals (and old pickle trackers)
 import glob
-for cooldown_file in glob.glob('cooldown_*.pkl'):
+for cooldown_file in glob.glob('cooldown_*.log') + glob.glob('cooldown_*.pkl'):
     os.remove(cooldown_file)
     print(f"✓ Deleted {cooldown_file}")
 
@@ -0,0 +1,99 @@
+"""
+ADAPTIVE SCHEDULER
+Decides when to run detection and embedding from measured stage costs,
+instead of a fixed "every 10th frame" rule
+"""
+
+import time
+
+# Settings
+TARGET_LATENCY_MS = 500      # Face appears -> identity shown
+CPU_BUDGET = 0.5             # Fraction of one core the detection stage may use
+MIN_INTERVAL_MS = 33         # Never detect more often than the camera delivers frames
+MAX_INTERVAL_MS = 1000       # Slowest detection rate when the scene is empty
+BACKOFF = 1.5                # Interval growth per empty detection pass
+UNCONFIRMED_FACTOR = 0.5     # Interval scale while a face in view is not yet identified
+LOG_EVERY_SECONDS = 30       # Periodic cost summary in the console (plus every decision change)
+SMOOTHING = 0.2              # Weight of the newest measurement in the running averages
+
+
+class AdaptiveScheduler:
+    """Latency-budgeted detection/embedding scheduling from runtime measurements"""
+
+    def __init__(self, target_latency_ms=TARGET_LATENCY_MS, cpu_budget=CPU_BUDGET,
+                 min_interval_ms=MIN_INTERVAL_MS, max_interval_ms=MAX_INTERVAL_MS, name=None):
+        self.name = name  # Camera name in log lines (multi-camera service)
+        self.target_latency = target_latency_ms / 1000.0
+        self.cpu_budget = cpu_budget
+        self.min_interval = min_interval_ms / 1000.0
+        self.max_interval = max_interval_ms / 1000.0
+
+        self.detect_cost = None     # Seconds per detection pass (running average)
+        self.embed_cost = None      # Seconds per embedded face (running average)
+        self.interval = self.min_interval
+        self.reason = "startup"
+        self.next_detect = 0.0
+        self._last_log = time.monotonic()
+        self._logged_reason = None
+
+    def _smooth(self, old, new):
+        return new if old is None else old + SMOOTHING * (new - old)
+
+    def is_due(self, now=None):
+        return (now or time.monotonic()) >= self.next_detect
+
+    def record_detection(self, seconds, num_faces, unconfirmed_faces, now=None):
+        """
+        Update the detection interval after a pass. unconfirmed_faces: faces
+        in view without a confident identity yet (new or retrying tracks).
+        """
+        now = now or time.monotonic()
+        self.detect_cost = self._smooth(self.detect_cost, seconds)
+
+        # Cheapest interval that keeps detection within the CPU budget
+        budget_interval = self.detect_cost / self.cpu_budget
+        # Longest interval where a face walking in still gets its identity within the target
+        latency_interval = self.target_latency - self.detect_cost - (self.embed_cost or 0.0)
+
+        if num_faces:
+            # Faces in view: the CPU budget, unless that would miss the latency target
+            self.interval = min(budget_interval, latency_interval)
+            self.reason = "identifying" if unconfirmed_faces else "tracking"
+            if unconfirmed_faces:
+                self.interval *= UNCONFIRMED_FACTOR  # Someone is waiting to be recognized
+            if latency_interval < self.min_interval:
+                self.reason += ", latency target unreachable"
+            elif latency_interval < budget_interval:
+                self.reason += ", over CPU budget for latency"
+        else:
+            self.interval = max(self.interval * BACKOFF, budget_interval)
+            self.reason = "empty scene"
+
+        self.interval = min(max(self.interval, self.min_interval), self.max_interval)
+        self.next_detect = now + self.interval
+        self._maybe_log(now)
+
+    def record_embedding(self, seconds, num_faces):
+        if num_faces:
+            self.embed_cost = self._smooth(self.embed_cost, seconds / num_faces)
+
+    def allow_reverify(self, queue_depth):
+        """Skip periodic re-verification when the embedding backlog would blow the latency target"""
+        if self.embed_cost is None:
+            return True
+        return (queue_depth + 1) * self.embed_cost < self.target_latency
+
+    def describe(self):
+        """One-line summary for the on-screen overlay"""
+        detect_ms = (self.detect_cost or 0.0) * 1000
+        embed_ms = (self.embed_cost or 0.0) * 1000
+        return (f"Detect every {self.interval * 1000:.0f} ms ({self.reason}) | "
+                f"detect {detect_ms:.0f} ms, embed {embed_ms:.0f} ms/face")
+
+    def _maybe_log(self, now):
+        """Log decision changes (e.g. empty scene -> identifying) and a periodic summary"""
+        if self.reason != self._logged_reason or now - self._last_log >= LOG_EVERY_SECONDS:
+            self._last_log = now
+            self._logged_reason = self.reason
+            label = f"Scheduler [{self.name}]" if self.name else "Scheduler"
+            print(f"⏱ {label}: {self.describe()}")
@@ -0,0 +1,287 @@
+"""
+WARM MODEL SERVER
+Loads the face model once and serves embeddings over localhost HTTP, so
+register / attendance start instantly instead of re-loading TensorFlow.
+
+    python ultra_server.py [--port 8765]
+
+  POST /embed?model=VGG-Face   body: .npy uint8 crops (N, H, W, 3)  ->  .npy float32 (N, dim)
+  GET  /stats                  queue depth, batch sizes, latency percentiles (JSON)
+  GET  /health                 {"ok": true, "model": ..., "backend": ...}
+
+Requests from concurrent clients are micro-batched into one forward pass.
+Clients use get_embedder() from ultra_embedder, which falls back to the
+in-process model when the server is not running.
+"""
+
+import argparse
+import io
+import json
+import queue
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+import numpy as np
+
+from ultra_embedder import embed_faces, get_model, EMBED_BACKEND, MODEL_NAME, FACE_SIZE, MAX_BATCH_SIZE
+
+# Settings
+SERVER_HOST = "127.0.0.1"   # Local clients only
+SERVER_PORT = 8765
+BATCH_WINDOW_MS = 5         # How long the batcher waits for more requests to join a batch
+CLIENT_TIMEOUT = 30         # Seconds per request before a client gives up
+LATENCY_SAMPLES = 1000      # Recent requests kept for the latency percentiles
+
+
+def encode_array(array):
+    buffer = io.BytesIO()
+    np.save(buffer, array, allow_pickle=False)
+    return buffer.getvalue()
+
+
+def decode_array(data):
+    return np.load(io.BytesIO(data), allow_pickle=False)
+
+
+class EmbedRequest:
+    def __init__(self, crops):
+        self.crops = crops
+        self.result = None
+        self.error = None
+        self.created = time.perf_counter()
+        self.done = threading.Event()
+
+
+class MicroBatcher(threading.Thread):
+    """Collects concurrent requests for up to BATCH_WINDOW_MS, then embeds them together"""
+
+    def __init__(self, model_name=MODEL_NAME, max_batch_size=MAX_BATCH_SIZE, window_ms=BATCH_WINDOW_MS):
+        super().__init__(daemon=True)
+        self.model_name = model_name
+        self.max_batch_size = max_batch_size
+        self.window = window_ms / 1000.0
+        self.requests = queue.Queue()
+        self.started = time.time()
+
+        self.lock = threading.Lock()
+        self.total_requests = 0
+        self.total_faces = 0
+        self.total_batches = 0
+        self.errors = 0
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)     # Request latency (queue + inference)
+        self.batch_seconds = deque(maxlen=LATENCY_SAMPLES)  # Inference time per batch
+
+    def embed(self, crops):
+        """Blocking call used by the HTTP handler threads"""
+        request = EmbedRequest(crops)
+        self.requests.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def run(self):
+        while True:
+            batch = [self.requests.get()]
+            faces = len(batch[0].crops)
+            deadline = time.perf_counter() + self.window
+            while faces < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self.requests.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(request)
+                faces += len(request.crops)
+
+            crops = [crop for request in batch for crop in request.crops]
+            start = time.perf_counter()
+            try:
+                embeddings = embed_faces(crops, self.model_name, self.max_batch_size)
+                error = None
+            except Exception as e:
+                embeddings, error = None, e
+            done = time.perf_counter()
+
+            offset = 0
+            for request in batch:
+                if error is None:
+                    request.result = embeddings[offset:offset + len(request.crops)]
+                else:
+                    request.error = error
+                offset += len(request.crops)
+                request.done.set()
+
+            with self.lock:
+                self.total_requests += len(batch)
+                self.total_faces += len(crops)
+                self.total_batches += 1
+                self.errors += len(batch) if error is not None else 0
+                self.batch_seconds.append(done - start)
+                self.latencies.extend(done - request.created for request in batch)
+
+    def stats(self):
+        with self.lock:
+            latencies = np.array(self.latencies) * 1000
+            batch_ms = np.array(self.batch_seconds) * 1000
+            return {
+                'model': self.model_name,
+                'backend': EMBED_BACKEND,
+                'uptime_seconds': round(time.time() - self.started, 1),
+                'queue': self.requests.qsize(),
+                'requests': self.total_requests,
+                'faces': self.total_faces,
+                'batches': self.total_batches,
+                'errors': self.errors,
+                'mean_batch_faces': round(self.total_faces / self.total_batches, 2) if self.total_batches else 0,
+                'latency_ms': {f"p{p}": round(float(np.percentile(latencies, p)), 2) if len(latencies) else None
+                               for p in (50, 95, 99)},
+                'batch_ms_mean': round(float(batch_ms.mean()), 2) if len(batch_ms) else None,
+            }
+
+
+class EmbedHandler(BaseHTTPRequestHandler):
+    batcher = None  # Set by serve()
+
+    def _reply(self, status, body, content_type="application/json", headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _reply_json(self, status, data):
+        self._reply(status, json.dumps(data).encode())
+
+    def do_GET(self):
+        if self.path == "/stats":
+            self._reply_json(200, self.batcher.stats())
+        elif self.path == "/health":
+            self._reply_json(200, {'ok': True, 'model': self.batcher.model_name, 'backend': EMBED_BACKEND})
+        else:
+            self._reply_json(404, {'error': "not found"})
+
+    def do_POST(self):
+        path, _, query = self.path.partition("?")
+        if path != "/embed":
+            self._reply_json(404, {'error': "not found"})
+            return
+        model = urllib.parse.parse_qs(query).get("model", [None])[0]
+        if model and model != self.batcher.model_name:
+            self._reply_json(409, {'error': f"server runs {self.batcher.model_name}, not {model}"})
+            return
+
+        try:
+            crops = decode_array(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            if crops.ndim != 4 or crops.shape[-1] != 3 or crops.dtype != np.uint8:
+                raise ValueError(f"expected uint8 (N, H, W, 3) crops, got {crops.dtype} {crops.shape}")
+        except Exception as e:
+            self._reply_json(400, {'error': str(e)})
+            return
+
+        try:
+            embeddings = self.batcher.embed(list(crops))
+        except Exception as e:
+            self._reply_json(500, {'error': f"{type(e).__name__}: {e}"})
+            return
+        self._reply(200, encode_array(np.asarray(embeddings, dtype=np.float32)),
+                    "application/octet-stream", {'X-Model': self.batcher.model_name})
+
+    def log_message(self, format, *args):
+        pass  # Keep the console for our own status lines
+
+
+class RemoteEmbedder:
+    """
+    Client for a running server, with the embed_faces(crops) signature.
+    Falls back to the in-process model if the server goes away mid-session.
+    """
+
+    kind = "server"
+
+    def __init__(self, host=SERVER_HOST, port=SERVER_PORT, model_name=MODEL_NAME):
+        self.url = f"http://{host}:{port}"
+        self.model_name = model_name
+        self._fallback = False
+
+    def available(self):
+        """True if a server for our model answers on the configured port"""
+        try:
+            with urllib.request.urlopen(self.url + "/health", timeout=1) as response:
+                health = json.load(response)
+                return (health.get('model'), health.get('backend', "deepface")) == (self.model_name, EMBED_BACKEND)
+        except (OSError, ValueError):
+            return False
+
+    def stats(self):
+        with urllib.request.urlopen(self.url + "/stats", timeout=CLIENT_TIMEOUT) as response:
+            return json.load(response)
+
+    def embed_faces(self, face_imgs):
+        if len(face_imgs) == 0:
+            return np.empty((0, 0), dtype=np.float32)
+        if self._fallback:
+            return embed_faces(face_imgs, self.model_name)
+
+        width, height = FACE_SIZE
+        crops = np.stack([face_img if face_img.shape[:2] == (height, width) else cv2.resize(face_img, FACE_SIZE)
+                          for face_img in face_imgs]).astype(np.uint8)
+        request = urllib.request.Request(
+            f"{self.url}/embed?model={urllib.parse.quote(self.model_name)}", data=encode_array(crops),
+            headers={'Content-Type': "application/octet-stream"}, method="POST")
+        try:
+            with urllib.request.urlopen(request, timeout=CLIENT_TIMEOUT) as response:
+                return decode_array(response.read())
+        except urllib.error.HTTPError as e:
+            raise RuntimeError(f"Embedding server error {e.code}: {e.read().decode(errors='replace')}")
+        except OSError as e:
+            print(f"⚠ Embedding server unavailable ({e}), loading the model in-process...")
+            self._fallback = True
+            return embed_faces(face_imgs, self.model_name)
+
+
+def serve(host=SERVER_HOST, port=SERVER_PORT, model_name=MODEL_NAME):
+    print("="*70)
+    print("WARM MODEL SERVER")
+    print("="*70)
+    print(f"Loading {model_name} ({EMBED_BACKEND})...")
+    start = time.perf_counter()
+    get_model(model_name)
+    embed_faces([np.zeros((FACE_SIZE[1], FACE_SIZE[0], 3), dtype=np.uint8)], model_name)  # Warm-up pass
+    print(f"✓ Model ready in {time.perf_counter() - start:.1f} s")
+
+    batcher = MicroBatcher(model_name)
+    batcher.start()
+    EmbedHandler.batcher = batcher
+    server = ThreadingHTTPServer((host, port), EmbedHandler)
+    server.daemon_threads = True
+
+    print(f"✓ Serving on http://{host}:{port} (POST /embed, GET /stats) - Ctrl+C to stop")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+
+    stats = batcher.stats()
+    print(f"\n✓ Server stopped: {stats['requests']} requests, {stats['faces']} faces, "
+          f"{stats['mean_batch_faces']} faces/batch, p95 {stats['latency_ms']['p95']} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--model", default=MODEL_NAME)
+    args = parser.parse_args()
+    serve(args.host, args.port, args.model)
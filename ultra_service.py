@@ -0,0 +1,257 @@
+"""
+MULTI-CAMERA ATTENDANCE SERVICE
+Every door in one process: the cameras listed in a config file share one
+loaded model, one gallery and one batched embedding queue (served
+round-robin, so a busy door cannot starve the others).
+
+    python ultra_service.py [cameras.json]
+
+See cameras.example.json. Each camera has its own mode (ENTRY/EXIT) and
+detection thread; cooldowns are shared per mode, like live attendance.
+"""
+
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+import cv2
+
+from ultra_embedder import embed_faces, MODEL_NAME
+from ultra_gallery import load_gallery, gallery_exists
+from ultra_pipeline import EmbedService, FrameGrabber, RecognitionPipeline, DRAIN_SECONDS
+from ultra_recognition import (build_matcher, create_face_detector, is_confident, attendance_row,
+                               similarity_percent, COOLDOWN_MINUTES, SIMILARITY_THRESHOLD)
+from ultra_cooldown import CooldownTracker
+from ultra_metrics import metrics, start_metrics_server
+from ultra_scheduler import AdaptiveScheduler
+from ultra_store import open_store
+
+# Settings
+CONFIG_FILE = "cameras.json"
+SERVICE_EMBED_WORKERS = 1    # Embedding threads for all cameras together
+SERVICE_QUEUE_SIZE = 4       # Pending frames per camera before the oldest is dropped
+STATUS_EVERY_SECONDS = 30    # Per-camera status lines in the console
+
+
+class Camera:
+    """One configured door: capture thread + detection pipeline on the shared embedder"""
+
+    def __init__(self, config, embed_service):
+        self.name = config['name']
+        self.mode = config.get('mode', 'ENTRY').upper()
+        if self.mode not in ('ENTRY', 'EXIT'):
+            raise ValueError(f"Camera {self.name}: mode must be ENTRY or EXIT, not {self.mode}")
+        self.cooldown_minutes = config.get('cooldown_minutes', COOLDOWN_MINUTES)
+
+        source = config['source']
+        self.cam = cv2.VideoCapture(source)
+        if not self.cam.isOpened():
+            raise ValueError(f"Camera {self.name}: cannot open source {source!r}")
+
+        # Video files are played back in real time instead of as fast as they decode
+        pace_fps = None
+        if isinstance(source, str) and os.path.isfile(source):
+            pace_fps = self.cam.get(cv2.CAP_PROP_FPS) or 25.0
+        self.grabber = FrameGrabber(self.cam, pace_fps)
+        self.pipeline = RecognitionPipeline(create_face_detector(), confirm_fn=is_confident,
+                                            scheduler=AdaptiveScheduler(name=self.name),
+                                            embed_service=embed_service)
+        self.frame_id = 0
+        self.logged = 0
+        self.finished = False
+        self.ended_at = None  # Stream end: queued faces are still logged before stop()
+
+    def start(self):
+        self.grabber.start()
+        self.pipeline.start()
+
+    def stop(self):
+        self.finished = True
+        self.grabber.stop()
+        self.pipeline.stop()
+        self.cam.release()
+
+    def poll_frame(self):
+        """Submit the newest frame if there is one; returns True if work was done"""
+        frame_id, frame = self.grabber.latest(after_id=self.frame_id, timeout=0)
+        if self.grabber.failed and self.ended_at is None:
+            print(f"⚠ [{self.name}] Stream ended - finishing queued faces")
+            self.ended_at = time.monotonic()
+        if frame is None or frame_id <= self.frame_id:
+            return False
+        self.frame_id = frame_id
+        self.pipeline.submit(frame_id, frame)  # Also the last frame of an ended stream
+        return True
+
+    def drained(self):
+        """True once the stream has ended and every queued face is in poll_results()"""
+        return self.ended_at is not None and (
+            self.pipeline.idle() or time.monotonic() - self.ended_at > DRAIN_SECONDS)
+
+    def status(self):
+        stats = self.pipeline.stats()
+        return (f"📷 {self.name} ({self.mode}): logged {self.logged} | tracks {stats['tracks']} | "
+                f"embedded {stats['faces_embedded']} | queue {stats['embed_queue']} | "
+                f"dropped {stats['embed_dropped']} jobs, {stats['frames_dropped'] + self.grabber.dropped} frames")
+
+
+def handle_face(camera, match, cooldowns, store, names, now=None):
+    """
+    Log one recognized track of a camera: confidence check, cooldown of the
+    camera's mode, attendance row. Returns the row written, or None.
+    """
+    if match is None:
+        metrics.inc("recognition_errors")
+        return None
+    if not is_confident(match):
+        metrics.inc("uncertain" if match[1] < SIMILARITY_THRESHOLD else "unknown")
+        return None
+    metrics.inc("recognized")
+    person_id, distance, _ = match
+    now = now or datetime.now()
+    with metrics.time("cooldown"):
+        remaining = cooldowns[camera.mode].remaining(person_id, now, camera.cooldown_minutes)
+    if remaining > 0:
+        metrics.inc("skipped_cooldown")
+        return None
+
+    row = attendance_row(person_id, names[person_id], now, camera.mode, distance, MODEL_NAME)
+    with metrics.time("log_write"):
+        store.write([row])
+        camera.logged += 1
+        try:
+            cooldowns[camera.mode].record(person_id, now)
+        except Exception as e:
+            print(f"⚠ Warning: Could not save cooldown data: {e}")
+    metrics.inc("logged")
+    return row
+
+
+def load_config(path):
+    with open(path) as f:
+        config = json.load(f)
+    if not config.get('cameras'):
+        raise ValueError(f"{path} lists no cameras")
+    names = [camera['name'] for camera in config['cameras']]
+    if len(set(names)) != len(names):
+        raise ValueError(f"{path}: camera names must be unique")
+    return config
+
+
+def main():
+    config_path = sys.argv[1] if len(sys.argv) > 1 else CONFIG_FILE
+
+    print("="*70)
+    print("   UNIVERSITY ATTENDANCE SERVICE - ALL DOORS")
+    print("="*70)
+
+    if not os.path.exists(config_path):
+        print(f"✗ Config not found: {config_path}")
+        print("  Copy cameras.example.json to cameras.json and list your cameras.")
+        return
+    try:
+        config = load_config(config_path)
+    except (ValueError, KeyError, json.JSONDecodeError) as e:
+        print(f"✗ Invalid config: {e}")
+        return
+
+    if not gallery_exists():
+        print("✗ Database not found! Run: python ultra_train.py")
+        return
+    gallery = load_gallery()
+    if len(gallery) == 0:
+        print("✗ Database is empty!")
+        return
+    try:
+        matcher = build_matcher(gallery)
+    except ValueError as e:
+        print(f"✗ {e}")
+        return
+    print(f"✓ Registered students: {len(gallery)} | Search index: {matcher.index.kind}")
+
+    # One model and one queue for every camera
+    embed_service = EmbedService(embed_faces, matcher.match,
+                                 workers=config.get('embed_workers', SERVICE_EMBED_WORKERS),
+                                 queue_size=config.get('queue_size', SERVICE_QUEUE_SIZE))
+
+    cameras = []
+    for camera_config in config['cameras']:
+        try:
+            cameras.append(Camera(camera_config, embed_service))
+            print(f"✓ Camera {cameras[-1].name}: {camera_config['source']!r} ({cameras[-1].mode})")
+        except (ValueError, KeyError) as e:
+            print(f"✗ {e}")
+    if not cameras:
+        print("✗ No camera could be opened.")
+        return
+
+    # Cooldowns are per mode, shared by all doors of that mode
+    # (kept for the longest cooldown configured on any camera of the mode)
+    cooldowns = {}
+    for mode in {camera.mode for camera in cameras}:
+        longest = max(camera.cooldown_minutes for camera in cameras if camera.mode == mode)
+        cooldowns[mode] = CooldownTracker(mode, longest)
+
+    store = open_store()
+    print(f"\nLogging to {store.location} - press Ctrl+C to stop")
+    metrics_url = start_metrics_server()
+    if metrics_url:
+        print(f"📈 Metrics: {metrics_url}")
+    print("="*70 + "\n")
+
+    embed_service.start()
+    for camera in cameras:
+        camera.start()
+
+    last_status = time.monotonic()
+    try:
+        while any(not camera.finished for camera in cameras):
+            busy = False
+            for camera in cameras:
+                if camera.finished:
+                    continue
+                busy |= camera.poll_frame()
+                drained = camera.drained()  # Before polling, so no result arrives after the last poll
+
+                # Logging happens here, on one thread, for every camera
+                for result in camera.pipeline.poll_results():
+                    if result.error is not None:
+                        print(f"⚠ [{camera.name}] Recognition error: {result.error}")
+                    for _, match in result.faces:
+                        row = handle_face(camera, match, cooldowns, store, gallery.names)
+                        if row is not None:
+                            _, distance, second = match
+                            print(f"✓ [{camera.name}] {camera.mode}: {row[1]} "
+                                  f"(Similarity: {similarity_percent(distance):.1f}%, "
+                                  f"Confidence: {second - distance:.3f})")
+                if drained:
+                    camera.stop()
+
+            if time.monotonic() - last_status >= STATUS_EVERY_SECONDS:
+                last_status = time.monotonic()
+                for camera in cameras:
+                    print(camera.status())
+            if not busy:
+                time.sleep(0.005)
+    except KeyboardInterrupt:
+        print("\nStopping...")
+
+    for camera in cameras:
+        if not camera.finished:
+            camera.stop()
+    embed_service.stop()
+    store.close()
+    for tracker in cooldowns.values():
+        tracker.close()
+
+    print(f"\n✓ Service stopped")
+    for camera in cameras:
+        print(f"  {camera.status()}")
+    print(f"  Faces embedded (all cameras): {embed_service.faces_embedded}")
+    print(f"  Attendance store: {store.location}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,358 @@
+"""
+ATTENDANCE STORE
+Pluggable sink for attendance rows (ID, Name, Date, Time, Type, Similarity, Model):
+  sqlite - attendance.db in WAL mode; a background writer commits rows in batches
+  csv    - attendance_log.csv, one append per batch (the original format)
+
+Everything that logs attendance goes through open_store(); viewers and reports
+go through read_store(), which never creates or migrates anything, so the menu
+sees exactly what attendance writes.
+
+    python ultra_store.py export [attendance_export.csv]   # SQLite -> CSV
+    python ultra_store.py import [attendance_log.csv]      # CSV -> SQLite
+"""
+
+import atexit
+import csv
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+
+from ultra_logreader import LogIndex, tail_rows, READ_BLOCK
+
+# Settings
+STORE_BACKEND = "sqlite"          # "sqlite" or "csv"
+DATABASE_FILE = "attendance.db"
+ATTENDANCE_FILE = "attendance_log.csv"
+ATTENDANCE_HEADER = ['ID', 'Name', 'Date', 'Time', 'Type', 'Similarity', 'Model']
+FLUSH_INTERVAL = 1.0              # Max seconds a logged row waits before it is committed
+FLUSH_ROWS = 200                  # Commit as soon as this many rows are waiting
+SCAN_BLOCK = 16 * 1024 * 1024     # Bytes per iter_blocks_since() block (CSV)
+SCAN_ROWS = 200000                # Rows per iter_columns_since() block (SQLite)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS attendance (
+    id INTEGER PRIMARY KEY,
+    student_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    date TEXT NOT NULL,
+    time TEXT NOT NULL,
+    type TEXT NOT NULL,
+    similarity TEXT,
+    model TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_attendance_student_date ON attendance (student_id, date);
+CREATE INDEX IF NOT EXISTS idx_attendance_date_type ON attendance (date, type);
+"""
+COLUMNS = "student_id, name, date, time, type, similarity, model"
+SCAN_COLUMNS = ("student_id", "name", "date", "time", "type")
+UNIT_SEPARATOR = "\x1f"
+
+
+class CsvSink:
+    """
+    Plain CSV log; cursors are byte offsets into the file. Reads go through
+    the sidecar index (ultra_logreader), so they cost the same at any log size.
+    """
+
+    kind = "csv"
+
+    def __init__(self, path=ATTENDANCE_FILE):
+        self.path = path
+        self.index = LogIndex(path)
+
+    @property
+    def location(self):
+        return self.path
+
+    def write(self, rows):
+        """Append rows (header written on first use)"""
+        new_file = not os.path.exists(self.path)
+        with open(self.path, 'a', newline='') as f:
+            writer = csv.writer(f)
+            if new_file:
+                writer.writerow(ATTENDANCE_HEADER)
+            writer.writerows(rows)
+        self.index.refresh()  # Indexes just the rows written above
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    def iter_blocks_since(self, cursor=0, block_size=SCAN_BLOCK):
+        """Yield (cursor, data): the raw bytes of the complete rows after cursor, block by block"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as f:
+            f.seek(cursor)
+            if cursor == 0:
+                cursor += len(f.readline())  # Header
+            pending = b''
+            for block in iter(lambda: f.read(block_size), b''):
+                pending += block
+                end = pending.rfind(b'\n') + 1
+                if not end:
+                    continue
+                data, pending = pending[:end], pending[end:]
+                cursor += end
+                yield cursor, data
+            # Anything left in `pending` is a row still being written
+
+    def iter_rows_since(self, cursor=0):
+        """Yield (cursor, row) for every row after cursor; resume later from the last cursor"""
+        for end, data in self.iter_blocks_since(cursor, READ_BLOCK):
+            cursor = end - len(data)
+            lines = data.split(b'\n')[:-1]
+            # Whole blocks through one csv.reader: far cheaper than a reader per line
+            reader = csv.reader(line.decode('utf-8', errors='replace') for line in lines)
+            for line, fields in zip(lines, reader):
+                cursor += len(line) + 1
+                if fields:
+                    yield cursor, fields
+
+    def count(self):
+        return self.index.count()
+
+    def tail(self, limit):
+        return tail_rows(self.path, limit)
+
+    def page(self, number, size):
+        """Page `number` back from the newest rows (1 = the latest `size` rows)"""
+        return self.index.page(number, size)
+
+    def rows_between(self, start_date, end_date):
+        return self.index.rows_between(start_date, end_date)
+
+
+class SqliteSink:
+    """
+    SQLite in WAL mode: readers never block the writer. write() only queues
+    rows; a background thread commits them every FLUSH_INTERVAL seconds or
+    FLUSH_ROWS rows, one transaction per batch. Cursors are row ids.
+    """
+
+    kind = "sqlite"
+
+    def __init__(self, path=DATABASE_FILE, flush_interval=FLUSH_INTERVAL, flush_rows=FLUSH_ROWS):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.flush_rows = flush_rows
+        self.errors = 0
+        self._queue = queue.Queue()
+        self._writer = None
+        self._lock = threading.Lock()
+
+        with self._connect() as connection:
+            connection.executescript(SCHEMA)
+        connection.close()
+
+    @property
+    def location(self):
+        return self.path
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")  # Durable at each WAL checkpoint, fast commits
+        return connection
+
+    def write(self, rows):
+        """Queue rows for the background writer (never blocks on disk)"""
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, daemon=True)
+                self._writer.start()
+                atexit.register(self.close)  # Commit what is queued even on a plain exit()
+        for row in rows:
+            self._queue.put(tuple(row))
+
+    def _write_loop(self):
+        connection = self._connect()
+        while True:
+            batch = [self._queue.get()]
+            # Commit FLUSH_INTERVAL after the first queued row at the latest (or at close)
+            deadline = time.monotonic() + self.flush_interval
+            while batch[-1] is not None and len(batch) < self.flush_rows:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            rows = [row for row in batch if row is not None]
+            if rows:
+                try:
+                    with connection:  # One transaction per batch
+                        connection.executemany(
+                            f"INSERT INTO attendance ({COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+                except sqlite3.Error as e:
+                    self.errors += len(rows)
+                    print(f"⚠ Could not store {len(rows)} attendance row(s): {e}")
+            for _ in batch:
+                self._queue.task_done()
+            if None in batch:
+                connection.close()
+                return
+
+    def flush(self):
+        """Block until every queued row is committed"""
+        if self._writer is not None:
+            self._queue.join()
+
+    def close(self):
+        with self._lock:
+            if self._writer is not None:
+                self._queue.put(None)
+                self._writer.join()
+                self._writer = None
+
+    def _query(self, sql, params=()):
+        connection = self._connect()
+        try:
+            return connection.execute(sql, params).fetchall()
+        finally:
+            connection.close()
+
+    def iter_rows_since(self, cursor=0, batch_size=1000):
+        """Yield (cursor, row) for every row after cursor; resume later from the last cursor"""
+        while True:
+            rows = self._query(f"SELECT id, {COLUMNS} FROM attendance WHERE id > ? ORDER BY id LIMIT ?",
+                               (cursor, batch_size))
+            for row in rows:
+                cursor = row[0]
+                yield cursor, list(row[1:])
+            if len(rows) < batch_size:
+                return
+
+    def iter_columns_since(self, cursor=0, block_rows=SCAN_ROWS):
+        """
+        Yield (cursor, columns) for the rows after cursor, block_rows ids at a
+        time: ID, name, date, time and type, each one string of the block's
+        values joined by a unit separator (built in SQLite, no row objects)
+        """
+        last = self.count()
+        while cursor < last:
+            end = min(cursor + block_rows, last)
+            count, *columns = self._query(
+                "SELECT COUNT(*), " + ", ".join(f"group_concat({column}, char(31))" for column in SCAN_COLUMNS) +
+                " FROM attendance WHERE id > ? AND id <= ?", (cursor, end))[0]
+            if count and any(column.count(UNIT_SEPARATOR) != count - 1 for column in columns):
+                # A value holds the separator itself: build this block row by row
+                rows = self._query(f"SELECT {', '.join(SCAN_COLUMNS)} FROM attendance WHERE id > ? AND id <= ?",
+                                   (cursor, end))
+                columns = [UNIT_SEPARATOR.join(value.replace(UNIT_SEPARATOR, " ") for value in values)
+                           for values in zip(*rows)]
+            cursor = end
+            if count:
+                yield cursor, columns
+
+    def count(self):
+        # Rows are never deleted, so the newest row id is the count (one index lookup)
+        return self._query("SELECT COALESCE(MAX(id), 0) FROM attendance")[0][0]
+
+    def tail(self, limit):
+        rows = self._query(f"SELECT {COLUMNS} FROM attendance ORDER BY id DESC LIMIT ?", (limit,))
+        return [list(row) for row in reversed(rows)]
+
+    def page(self, number, size):
+        """Page `number` back from the newest rows (1 = the latest `size` rows)"""
+        newest = self.count() - (number - 1) * size
+        rows = self._query(f"SELECT {COLUMNS} FROM attendance WHERE id > ? AND id <= ? ORDER BY id",
+                           (newest - size, newest))
+        return [list(row) for row in rows]
+
+    def rows_between(self, start_date, end_date):
+        """All rows dated start_date..end_date (YYYY-MM-DD, inclusive), via the date index"""
+        rows = self._query(f"SELECT {COLUMNS} FROM attendance WHERE date BETWEEN ? AND ? ORDER BY id",
+                           (start_date, end_date))
+        return [list(row) for row in rows]
+
+    def rows_for(self, student_id=None, date=None, mode=None):
+        """Indexed lookups: one student's day, or everyone's ENTRY/EXIT rows for a day"""
+        clauses, params = [], []
+        for column, value in (('student_id', student_id), ('date', date), ('type', mode)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return [list(row) for row in self._query(f"SELECT {COLUMNS} FROM attendance {where} ORDER BY id", params)]
+
+
+def open_store(backend=STORE_BACKEND):
+    """The configured attendance sink (a new SQLite store starts with the old CSV log)"""
+    if backend == "sqlite":
+        created = not os.path.exists(DATABASE_FILE)
+        store = SqliteSink()
+        if created and os.path.exists(ATTENDANCE_FILE):
+            imported = import_csv(store, ATTENDANCE_FILE)
+            print(f"✓ Imported {imported} row(s) from {ATTENDANCE_FILE} into {DATABASE_FILE}")
+        return store
+    if backend == "csv":
+        return CsvSink()
+    raise ValueError(f"Unknown attendance store: {backend}")
+
+
+def read_store(backend=STORE_BACKEND):
+    """The attendance store to read, or None if nothing is logged yet (creates and imports nothing)"""
+    if backend not in ("sqlite", "csv"):
+        raise ValueError(f"Unknown attendance store: {backend}")
+    if backend == "sqlite" and os.path.exists(DATABASE_FILE):
+        return SqliteSink()
+    if os.path.exists(ATTENDANCE_FILE):
+        return CsvSink()  # Not migrated yet - the writer imports it into SQLite on first open
+    return None
+
+
+def store_exists(backend=STORE_BACKEND):
+    """Anything logged yet (an old CSV log counts - it is imported on first open)"""
+    return os.path.exists(ATTENDANCE_FILE) or (backend == "sqlite" and os.path.exists(DATABASE_FILE))
+
+
+def export_csv(store, path):
+    """Write every stored row to a CSV file in the original format"""
+    count = 0
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(ATTENDANCE_HEADER)
+        for _, row in store.iter_rows_since():
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def import_csv(store, path):
+    """Copy the rows of an old CSV log into the store"""
+    rows = [row for _, row in CsvSink(path).iter_rows_since() if len(row) == len(ATTENDANCE_HEADER)]
+    store.write(rows)
+    store.flush()
+    return len(rows)
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "export":
+        target = sys.argv[2] if len(sys.argv) > 2 else "attendance_export.csv"
+        store = read_store()
+        if store is None:
+            print("✗ No attendance records found")
+            sys.exit(1)
+        exported = export_csv(store, target)
+        print(f"✓ Exported {exported} row(s) to {target}")
+    elif command == "import":
+        source = sys.argv[2] if len(sys.argv) > 2 else ATTENDANCE_FILE
+        if not os.path.exists(source):
+            print(f"✗ {source} not found")
+            sys.exit(1)
+        store = SqliteSink()  # Not open_store(): on a new database that would import the log twice
+        imported = import_csv(store, source)
+        store.close()
+        print(f"✓ Imported {imported} row(s) from {source} into {store.location}")
+    else:
+        print(__doc__)
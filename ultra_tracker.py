@@ -0,0 +1,129 @@
+"""
+FACE TRACKER
+Lightweight IoU/centroid multi-face tracker, so each person is
+recognized once per pass instead of on every processed frame
+"""
+
+import numpy as np
+
+# Settings
+IOU_THRESHOLD = 0.3       # Minimum overlap to continue a track
+CENTROID_DISTANCE = 0.5   # Fallback: max centre shift, as a fraction of the box size
+MAX_MISSED = 5            # Detection passes a track survives without a matching face
+REVERIFY_SECONDS = 10     # Re-run recognition on a live track (0 = never)
+RETRY_SECONDS = 1.0       # Retry a failed/unconfirmed recognition after this long
+PENDING_TIMEOUT = 5.0     # Re-request an embedding that never came back (dropped job)
+
+
+class Track:
+    """One face followed across frames"""
+
+    def __init__(self, track_id, box, now):
+        self.track_id = track_id
+        self.box = box
+        self.match = None          # (best_id, best, second_best) from the last recognition
+        self.confirmed = False     # Last recognition was a confident match
+        self.missed = 0
+        self.pending_since = None  # Time the embedding was requested, None if idle
+        self.recognized_at = None  # Time the last recognition finished
+        self.created = now
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """Pairwise intersection-over-union of (x, y, w, h) boxes"""
+    a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+    ax2, ay2 = a[:, 0] + a[:, 2], a[:, 1] + a[:, 3]
+    bx2, by2 = b[:, 0] + b[:, 2], b[:, 1] + b[:, 3]
+
+    inter_w = np.clip(np.minimum(ax2[:, None], bx2[None, :]) - np.maximum(a[:, None, 0], b[None, :, 0]), 0, None)
+    inter_h = np.clip(np.minimum(ay2[:, None], by2[None, :]) - np.maximum(a[:, None, 1], b[None, :, 1]), 0, None)
+    inter = inter_w * inter_h
+    union = (a[:, 2] * a[:, 3])[:, None] + (b[:, 2] * b[:, 3])[None, :] - inter
+    return inter / np.maximum(union, 1e-6)
+
+
+class FaceTracker:
+    """Associates detections with existing tracks and decides who needs an embedding"""
+
+    def __init__(self, iou_threshold=IOU_THRESHOLD, max_missed=MAX_MISSED,
+                 reverify_seconds=REVERIFY_SECONDS):
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.reverify_seconds = reverify_seconds
+        self.tracks = {}
+        self._next_id = 1
+
+    def update(self, boxes, now, reverify=True):
+        """
+        Feed the boxes of one detection pass.
+        Returns the tracks that need a (new) embedding; with reverify=False
+        confirmed tracks are not re-checked this pass.
+        """
+        tracks = list(self.tracks.values())
+        unmatched_boxes = set(range(len(boxes)))
+        unmatched_tracks = set(range(len(tracks)))
+
+        if tracks and boxes:
+            # Greedy association, highest overlap first
+            overlap = iou_matrix([t.box for t in tracks], boxes)
+            for ti, bi in zip(*np.unravel_index(np.argsort(-overlap, axis=None), overlap.shape)):
+                if overlap[ti, bi] < self.iou_threshold:
+                    break
+                if ti in unmatched_tracks and bi in unmatched_boxes:
+                    tracks[ti].box = boxes[bi]
+                    tracks[ti].missed = 0
+                    unmatched_tracks.discard(ti)
+                    unmatched_boxes.discard(bi)
+
+            # Centroid fallback for fast movement (no overlap left)
+            for ti in sorted(unmatched_tracks):
+                tx, ty, tw, th = tracks[ti].box
+                best, best_dist = None, CENTROID_DISTANCE * max(tw, th)
+                for bi in unmatched_boxes:
+                    bx, by, bw, bh = boxes[bi]
+                    dist = np.hypot((bx + bw / 2) - (tx + tw / 2), (by + bh / 2) - (ty + th / 2))
+                    if dist < best_dist:
+                        best, best_dist = bi, dist
+                if best is not None:
+                    tracks[ti].box = boxes[best]
+                    tracks[ti].missed = 0
+                    unmatched_tracks.discard(ti)
+                    unmatched_boxes.discard(best)
+
+        # Age out tracks that lost their face
+        for ti in unmatched_tracks:
+            tracks[ti].missed += 1
+            if tracks[ti].missed > self.max_missed:
+                del self.tracks[tracks[ti].track_id]
+
+        for bi in sorted(unmatched_boxes):
+            track = Track(self._next_id, boxes[bi], now)
+            self.tracks[track.track_id] = track
+            self._next_id += 1
+
+        need_embedding = [t for t in self.tracks.values()
+                          if t.missed == 0 and self._needs_embedding(t, now, reverify)]
+        for track in need_embedding:
+            track.pending_since = now
+        return need_embedding
+
+    def _needs_embedding(self, track, now, reverify):
+        if track.pending_since is not None:
+            return now - track.pending_since > PENDING_TIMEOUT
+        if track.recognized_at is None:
+            return True
+        if not track.confirmed:
+            return now - track.recognized_at > RETRY_SECONDS
+        return reverify and self.reverify_seconds > 0 and now - track.recognized_at > self.reverify_seconds
+
+    def assign(self, track_id, match, now, confirmed=True):
+        """Store a finished recognition on its track (if the track still exists)"""
+        track = self.tracks.get(track_id)
+        if track is None:
+            return False
+        track.match = match
+        track.confirmed = confirmed and match is not None
+        track.pending_since = None
+        track.recognized_at = now
+        return True
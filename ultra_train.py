@@ -1,58 +1,305 @@
 """
 ULTRA-ACCURATE TRAINING
-Loads all deep learning embeddings and prepares for recognition
+Loads all deep learning embeddings and prepares for recognition.
+Incremental: only person folders added, changed or removed since the
+last run (tracked in train_manifest.json) are reprocessed.
 """
 
+import hashlib
+import json
 import os
 import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
 import numpy as np
+from ultra_index import build_index, save_index, kmeans, INDEX_FILE, INDEX_TYPE
+from ultra_gallery import (save_gallery, update_gallery_rows, load_gallery, gallery_exists, stores_raw_rows,
+                           GALLERY_DIR, GALLERY_DTYPE, GALLERY_PCA_DIM)
+from ultra_embedder import MODEL_NAME, EMBED_BACKEND
 
 DATABASE_PATH = "face_database"
+MANIFEST_FILE = "train_manifest.json"
+TRAIN_WORKERS = None  # Process pool size (None = one per CPU core)
+PROTOTYPES = "mean"   # Per person: "mean" (1 row), "all" (every sample) or k (k-means centroids)
 
-print("="*70)
-print("ULTRA-ACCURATE TRAINING")
-print("="*70)
-
-# Load all person embeddings
-all_persons = {}
 
-if not os.path.exists(DATABASE_PATH):
-    print("✗ No database found. Register people first.")
-    exit()
+def make_prototypes(samples, average, prototypes=PROTOTYPES):
+    """Gallery rows for one person from their registered sample embeddings"""
+    if prototypes == "mean" or len(samples) == 0:
+        return np.asarray(average, dtype=np.float32).reshape(1, -1)
+    samples = np.asarray(samples, dtype=np.float32).reshape(len(samples), -1)
+    if prototypes == "all" or int(prototypes) >= len(samples):
+        return samples
+    return kmeans(samples, int(prototypes))
 
-person_folders = [f for f in os.listdir(DATABASE_PATH) if os.path.isdir(os.path.join(DATABASE_PATH, f))]
 
-if not person_folders:
-    print("✗ No registered persons found.")
-    exit()
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
 
-print(f"\nLoading {len(person_folders)} person(s)...")
 
-for folder in person_folders:
-    embedding_file = os.path.join(DATABASE_PATH, folder, "embeddings.pkl")
-    
-    if os.path.exists(embedding_file):
+def load_person(embedding_file, prototypes=PROTOTYPES, model_name=MODEL_NAME, backend=EMBED_BACKEND):
+    """
+    Load and validate one embeddings.pkl (runs in a worker process).
+    Returns a dict with id, name, prototype rows and the file hash, or an error.
+    """
+    try:
+        sha256 = file_sha256(embedding_file)
         with open(embedding_file, 'rb') as f:
             data = pickle.load(f)
-            
-            person_id = data['id']
-            person_name = data['name']
-            avg_embedding = data['average_embedding']
-            
-            all_persons[person_id] = {
-                'name': person_name,
-                'embedding': avg_embedding
-            }
-            
-            print(f"  ✓ Loaded: {person_name} (ID: {person_id})")
-
-# Save combined database
-database_file = "ultra_database.pkl"
-with open(database_file, 'wb') as f:
-    pickle.dump(all_persons, f)
-
-print(f"\n✓ Training complete!")
-print(f"  Total persons: {len(all_persons)}")
-print(f"  Database: {database_file}")
-print(f"  Accuracy: ULTRA-HIGH (Can distinguish twins!)")
-print(f"\nNext: python ultra_attendance.py")
+        # Older files do not record model/backend
+        if (data.get('backend', backend), data.get('model', model_name)) != (backend, model_name):
+            raise ValueError(f"embedded with {data.get('model', model_name)} ({data.get('backend', backend)}), "
+                             f"not {model_name} ({backend}) - run: python ultra_reembed.py")
+
+        rows = make_prototypes(data.get('embeddings', []), data['average_embedding'], prototypes)
+        if rows.size == 0 or not np.all(np.isfinite(rows)):
+            raise ValueError("empty or non-finite embedding")
+
+        return {'id': str(data['id']), 'name': data['name'], 'rows': rows,
+                'sha256': sha256, 'error': None}
+    except Exception as e:
+        return {'error': f"{type(e).__name__}: {e}"}
+
+
+def file_stamp(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def load_manifest():
+    if not os.path.exists(MANIFEST_FILE):
+        return {}
+    try:
+        with open(MANIFEST_FILE) as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+def train(database_path=DATABASE_PATH, workers=TRAIN_WORKERS):
+    """Update the gallery from face_database/, reusing rows for unchanged folders"""
+    start_time = time.perf_counter()
+
+    person_folders = sorted(f for f in os.listdir(database_path)
+                            if os.path.isdir(os.path.join(database_path, f)))
+    current = {}
+    for folder in person_folders:
+        embedding_file = os.path.join(database_path, folder, "embeddings.pkl")
+        if os.path.exists(embedding_file):
+            current[folder] = embedding_file
+
+    # Previous run: manifest + gallery rows we can reuse
+    manifest = load_manifest()
+    entries = manifest.get('folders', {})
+    storage = {'dtype': GALLERY_DTYPE, 'pca_dim': GALLERY_PCA_DIM}
+    previous = None
+    if gallery_exists() and manifest.get('model') == MODEL_NAME and \
+            manifest.get('backend', "deepface") == EMBED_BACKEND and \
+            manifest.get('prototypes') == str(PROTOTYPES) and \
+            manifest.get('storage', {'dtype': "float32", 'pca_dim': None}) == storage:
+        try:
+            previous = load_gallery()
+        except Exception as e:
+            print(f"⚠ Existing gallery unreadable, rebuilding everything: {e}")
+    previous_rows = {person_id: row for row, person_id in enumerate(previous.ids)} if previous else {}
+
+    reused, to_load, suspect = {}, [], []
+    for folder, embedding_file in current.items():
+        entry = entries.get(folder)
+        if entry is None or entry.get('id') not in previous_rows:
+            to_load.append(folder)
+        elif [entry['mtime_ns'], entry['size']] == list(file_stamp(embedding_file)):
+            reused[folder] = entry
+        else:
+            suspect.append(folder)  # Timestamp changed - content may still be the same
+
+    # A touched-but-identical file is still reused (content hash check)
+    for folder in suspect:
+        if file_sha256(current[folder]) == entries[folder]['sha256']:
+            mtime_ns, size = file_stamp(current[folder])
+            reused[folder] = dict(entries[folder], mtime_ns=mtime_ns, size=size)
+        else:
+            to_load.append(folder)
+
+    removed = [folder for folder in entries if folder not in current]
+    failed = {}  # Folder -> error of its last load attempt
+
+    def load_folders(folders):
+        """Load and validate folders in parallel"""
+        results_by_folder = {}
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = pool.map(partial(load_person, prototypes=PROTOTYPES),
+                               [current[folder] for folder in folders], chunksize=16)
+            for folder, result in zip(folders, results):
+                if result['error']:
+                    failed[folder] = result['error']
+                    print(f"  ✗ Skipped {folder}: {result['error']}")
+                else:
+                    failed.pop(folder, None)
+                    results_by_folder[folder] = result
+                    print(f"  ✓ Loaded: {result['name']} (ID: {result['id']})")
+        return results_by_folder
+
+    def assemble():
+        """Persons in folder order (later folders win on duplicate IDs)"""
+        persons = {}
+        for folder in current:
+            if folder in reused:
+                entry = reused[folder]
+                person_index = previous_rows[entry['id']]
+                persons[entry['id']] = (entry['name'], ('old', person_index),
+                                        int(previous.offsets[person_index + 1] - previous.offsets[person_index]))
+            elif folder in loaded:
+                result = loaded[folder]
+                persons[result['id']] = (result['name'], ('new', result['rows']), len(result['rows']))
+        return persons
+
+    def person_rows(source):
+        kind, value = source
+        if kind == 'old':
+            return previous.embeddings[previous.offsets[value]:previous.offsets[value + 1]]
+        return value
+
+    loaded = {}
+    if to_load:
+        print(f"\nLoading {len(to_load)} new/changed person(s)...")
+        loaded = load_folders(to_load)
+
+    # A student already in the gallery whose file no longer loads keeps the previous rows.
+    # Their manifest entry keeps the old timestamp, so the next run tries the file again.
+    for folder in failed:
+        entry = entries.get(folder)
+        if entry is not None and entry.get('id') in previous_rows:
+            reused[folder] = entry
+            print(f"  ⚠ Keeping {entry['name']} (ID: {entry['id']}) from the previous gallery "
+                  f"until {folder} loads again")
+    persons = assemble()
+
+    ids = list(persons.keys())
+    row_counts = [persons[person_id][2] for person_id in ids]
+    same_layout = previous is not None and ids == list(previous.ids) and \
+        row_counts == list(previous.prototypes_per_person)
+
+    if previous is not None and not same_layout and reused and not stores_raw_rows(previous.header):
+        # Stored rows are projected/quantized: a full rebuild needs the original embeddings
+        print(f"\nReloading {len(reused)} unchanged person(s) for the compressed gallery...")
+        loaded.update(load_folders(list(reused)))
+        for folder in reused:
+            if folder not in loaded:
+                print(f"  ⚠ Dropped {reused[folder]['name']} (ID: {reused[folder]['id']}): "
+                      f"stored rows are compressed and {folder} does not load")
+        reused = {}
+        persons = assemble()
+        ids = list(persons.keys())
+        row_counts = [persons[person_id][2] for person_id in ids]
+
+    names = [persons[person_id][0] for person_id in ids]
+    dims = {value.shape[1] for _, (kind, value), _ in persons.values() if kind == 'new'}
+    if reused:
+        dims.add(previous.header.get('input_dim', previous.header['dim']))  # Before any projection
+    if len(dims) > 1:
+        raise ValueError(f"Mixed embedding dimensions in face_database: {sorted(dims)}")
+
+    changed = True
+    if same_layout and not loaded and names == [previous.names[person_id] for person_id in ids]:
+        changed = False
+        header = previous.header
+    elif same_layout and dims == {previous.header.get('input_dim', previous.header['dim'])}:
+        # Same students with the same number of rows: replace only the changed rows
+        header = previous.header
+        updates = {}
+        for person_index, person_id in enumerate(ids):
+            kind, value = persons[person_id][1]
+            if kind == 'new':
+                for offset, row in enumerate(value):
+                    updates[int(previous.offsets[person_index]) + offset] = row
+        previous = None  # Release the read-only memory map first
+        update_gallery_rows(updates, ids, names)
+    else:
+        embeddings = np.empty((sum(row_counts), dims.pop() if dims else 0), dtype=np.float32)
+        owners = np.repeat(np.arange(len(ids), dtype=np.int32), row_counts)
+        start = 0
+        for person_id, count in zip(ids, row_counts):
+            embeddings[start:start + count] = person_rows(persons[person_id][1])
+            start += count
+        previous = None  # Release the memory map before the directory is swapped
+        header = save_gallery(ids, names, embeddings, MODEL_NAME, owners=owners, prototypes=str(PROTOTYPES),
+                              dtype=GALLERY_DTYPE, pca_dim=GALLERY_PCA_DIM, backend=EMBED_BACKEND)
+
+    if changed and ids:
+        index = build_index(load_gallery().embeddings, INDEX_TYPE)
+        save_index(index, ids, INDEX_FILE)
+
+    # Record what the gallery was built from
+    new_entries = {}
+    for folder in current:
+        if folder in reused:
+            new_entries[folder] = reused[folder]
+        elif folder in loaded:
+            mtime_ns, size = file_stamp(current[folder])
+            new_entries[folder] = {'id': loaded[folder]['id'], 'name': loaded[folder]['name'],
+                                   'sha256': loaded[folder]['sha256'], 'mtime_ns': mtime_ns, 'size': size}
+    with open(MANIFEST_FILE + ".tmp", 'w') as f:
+        json.dump({'model': MODEL_NAME, 'backend': EMBED_BACKEND, 'prototypes': str(PROTOTYPES), 'storage': storage,
+                   'folders': new_entries}, f, indent=1)
+    os.replace(MANIFEST_FILE + ".tmp", MANIFEST_FILE)
+
+    kept = sum(folder in reused for folder in failed)
+    return {
+        'persons': len(ids),
+        'reused': len(reused) - kept,
+        'rebuilt': len(loaded),
+        'removed': len(removed),
+        'failed': len(failed),
+        'kept': kept,
+        'seconds': time.perf_counter() - start_time,
+        'header': header,
+        'index_rebuilt': changed,
+    }
+
+
+def main():
+    print("="*70)
+    print("ULTRA-ACCURATE TRAINING")
+    print("="*70)
+
+    if not os.path.exists(DATABASE_PATH):
+        print("✗ No database found. Register people first.")
+        return
+
+    if not any(os.path.isdir(os.path.join(DATABASE_PATH, f)) for f in os.listdir(DATABASE_PATH)):
+        print("✗ No registered persons found.")
+        return
+
+    report = train()
+    header = report['header']
+
+    print(f"\n✓ Training complete!")
+    print(f"  Total persons: {report['persons']}")
+    print(f"  Reused: {report['reused']} | Rebuilt: {report['rebuilt']} | "
+          f"Removed: {report['removed']} | Failed: {report['failed']}")
+    if report['kept']:
+        print(f"  ⚠ {report['kept']} failed person(s) kept from the previous gallery - fix or re-register them")
+    print(f"  Time: {report['seconds']:.2f} s")
+    print(f"  Database: {GALLERY_DIR}/ (v{header['version']}, {header['dim']}-d {header['dtype']}, "
+          f"{header['model']} via {header.get('backend', 'deepface')})")
+    if header.get('projection'):
+        print(f"  Compression: PCA {header['input_dim']} -> {header['dim']} dims "
+              f"({header['projection']['explained_variance']:.1%} of the variance kept)")
+    print(f"  Prototypes: {header['prototypes']} ({header['rows']} rows)")
+    if report['index_rebuilt']:
+        print(f"  Search index: rebuilt ({INDEX_FILE})")
+    else:
+        print(f"  Search index: unchanged ({INDEX_FILE})")
+    print(f"  Accuracy: ULTRA-HIGH (Can distinguish twins!)")
+    print(f"\nNext: python ultra_attendance.py")
+
+
+if __name__ == "__main__":
+    main()